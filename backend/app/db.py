@@ -1,5 +1,7 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool
 from .config import Settings
 
 engine = create_engine(Settings.database_url, pool_pre_ping=True)
@@ -7,9 +9,42 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def get_async_database_url(url: str) -> str:
+    """Map a sync database URL to its async driver (asyncpg for PostgreSQL, aiosqlite for SQLite)"""
+    for prefix in ('postgresql+psycopg2://', 'postgresql://', 'postgres://'):
+        if url.startswith(prefix):
+            return 'postgresql+asyncpg://' + url[len(prefix):]
+    for prefix in ('sqlite+pysqlite://', 'sqlite://'):
+        if url.startswith(prefix):
+            return 'sqlite+aiosqlite://' + url[len(prefix):]
+    return url
+
+
+def _create_async_engine():
+    url = get_async_database_url(Settings.database_url)
+    if url.startswith('sqlite'):
+        # SQLite connections cannot be shared between event loops (e.g. test clients)
+        return create_async_engine(url, poolclass=NullPool)
+    return create_async_engine(
+        url,
+        pool_pre_ping=True,
+        pool_size=Settings.db_pool_size,
+        max_overflow=Settings.db_max_overflow,
+    )
+
+
+async_engine = _create_async_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,29 +1,42 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy.orm import Session
-from .db import get_db
 from .models import User
+from .services.admission import Overloaded, admission_controller, overloaded_response
+from .services.principal_cache import principal_cache
 from .utils.security import decode_access_token
 
 security_scheme = HTTPBearer(auto_error=False)
 
 
-def get_current_user(
+async def get_current_user(
     creds: HTTPAuthorizationCredentials | None = Depends(security_scheme),
-    db: Session = Depends(get_db),
 ) -> User:
-    print("get_current_user", creds)
     if creds is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
     try:
         payload = decode_access_token(creds.credentials)
-        print("payload", payload)
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     
-    # Convert string user ID back to integer
-    user_id = int(payload.get("sub"))
-    user = db.query(User).filter(User.id == user_id).first()
+    # Cached by token id; the database is only queried on a cold miss
+    user = await principal_cache.get_user(payload, creds.credentials)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     return user
+
+
+def admission(new_executions: int = 1):
+    """Dependency that sheds the request with 429 when the system or the user's rate limit is saturated"""
+    async def admit(current_user: User = Depends(get_current_user)) -> User:
+        try:
+            admission_controller.admit(current_user.id, new_executions)
+        except Overloaded as e:
+            raise overloaded_response(e)
+        return current_user
+    return admit
+
+
+# Requests that start one execution
+admit_execution = admission(1)
+# Requests whose executions are created later, in batches (batch runs, event ingestion)
+admit_batch = admission(0)
@@ -1,10 +1,25 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
 from .db import engine, Base
 from .services.scheduler import job_scheduler
 from .services.email_monitor import email_monitor
-from .services.ably_service import AblyService
+from .services.ably_service import AblyService, ably_service, job_update_publisher
+from .services.execution_events import execution_events
+from .services.execution_log import execution_log_writer, write_execution_logs
+from .services.retention import log_retention
+from .services.archive import execution_archive
+from .services.invalidation import invalidation_bus
+from .services.workflow_cache import workflow_cache
+from .services.principal_cache import principal_cache
+from .services.password_hasher import password_hasher
+from .services.search_index import ticket_search_index, use_postgres_search
+from .services.event_bus import event_bus, ingest_bus
+from .services.triggers import trigger_dispatcher
+from .services.admission import admission_controller
+from .services.execution_store import execution_store
+from .services.checkpoints import execution_checkpointer
+from .services.cache import async_cache
 from .config import Settings
 
 
@@ -20,13 +35,17 @@ app.add_middleware(
 )
 
 # Include all routers
-from .routers import auth, workflows, me, ws, jobs, tickets, users, emails
+from .routers import auth, workflows, me, ws, jobs, tickets, users, emails, events
+from .routers.ws import manager as ws_manager, broadcast_execution_events
+from .deps import get_current_user
+from .models import User
 
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(workflows.router, prefix="/workflows", tags=["workflows"])
 app.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
 app.include_router(tickets.router, prefix="/tickets", tags=["tickets"])
 app.include_router(users.router, prefix="/users", tags=["users"])
+app.include_router(events.router, prefix="/events", tags=["events"])
 app.include_router(emails.router, prefix="/emails", tags=["emails"])
 app.include_router(ws.router)
 
@@ -47,9 +66,48 @@ async def startup_event():
     # Initialize Ably realtime client
     await AblyService.init_ably_client()
     
+    # Start background job update publisher
+    await job_update_publisher.start()
+    
+    # Start cross-worker WebSocket fan-out
+    await ws_manager.bus.start()
+    
+    # Start cross-worker cache invalidation
+    await invalidation_bus.start()
+    
+    # Start buffered execution log writer
+    await execution_log_writer.start()
+    
+    # Stream execution events to WebSocket, Ably and the execution log
+    execution_events.add_sink('websocket', broadcast_execution_events)
+    execution_events.add_sink('ably', ably_service.publish_execution_events)
+    execution_events.add_sink('execution_log', write_execution_logs)
+    
     # Start job scheduler
     await job_scheduler.start()
     
+    # Resume executions and pending jobs a restart interrupted
+    await execution_checkpointer.start()
+    
+    # Sample load signals for admission control
+    await admission_controller.start()
+    
+    # Start workflows whose triggers match domain events
+    event_bus.add_handler('triggers', trigger_dispatcher.dispatch)
+    await event_bus.start()
+    ingest_bus.add_handler('triggers', trigger_dispatcher.dispatch)
+    await ingest_bus.start()
+    
+    # Start execution log retention
+    await log_retention.start()
+    
+    # Start cold-storage archiver
+    await execution_archive.start()
+    
+    # Build the in-process ticket search index where PostgreSQL full-text search isn't used
+    if not use_postgres_search(engine.dialect.name):
+        await ticket_search_index.start()
+    
     # Start email monitor as a background task
     asyncio.create_task(email_monitor.start_monitoring())
     
@@ -61,15 +119,73 @@ async def shutdown_event():
     """Cleanup services on shutdown"""
     print("🛑 Shutting down Workflow Orchestration Engine...")
     
-    # Stop job scheduler
+    # Dispatch queued domain events, then stop the job scheduler
+    await ingest_bus.stop()
+    await event_bus.stop()
     await job_scheduler.stop()
+    await execution_checkpointer.stop()
+    await admission_controller.stop()
     
     # Stop email monitor
     await email_monitor.stop_monitoring()
     
+    # Stop log retention
+    await log_retention.stop()
+    
+    # Stop cold-storage archiver
+    await execution_archive.stop()
+    
+    # Stop ticket search index warm-up
+    await ticket_search_index.stop()
+    
+    # Drain execution event sinks
+    await execution_events.stop()
+    
+    # Write any buffered execution logs
+    await execution_log_writer.stop()
+    
+    # Publish any queued job updates
+    await job_update_publisher.stop()
+    
+    # Stop WebSocket fan-out
+    await ws_manager.bus.stop()
+    
+    # Stop cache invalidation
+    await invalidation_bus.stop()
+    
+    # Close the pooled Redis connections
+    await async_cache.close()
+    
+    # Stop password hashing workers
+    password_hasher.shutdown()
+    
     print("✅ All services stopped successfully!")
 
 
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "message": "Workflow Orchestration Engine is running"}
+
+
+@app.get("/metrics")
+def metrics(current_user: User = Depends(get_current_user)):
+    return {
+        "job_updates": job_update_publisher.get_metrics(),
+        "websockets": ws_manager.get_metrics(),
+        "execution_events": execution_events.get_metrics(),
+        "execution_log": execution_log_writer.get_metrics(),
+        "log_retention": log_retention.get_metrics(),
+        "archive": execution_archive.get_metrics(),
+        "workflow_cache": workflow_cache.get_metrics(),
+        "principal_cache": principal_cache.get_metrics(),
+        "password_hasher": password_hasher.get_metrics(),
+        "ticket_search": ticket_search_index.get_metrics(),
+        "event_bus": event_bus.get_metrics(),
+        "ingest_bus": ingest_bus.get_metrics(),
+        "triggers": trigger_dispatcher.get_metrics(),
+        "admission": admission_controller.get_metrics(),
+        "scheduler": job_scheduler.get_metrics(),
+        "execution_store": execution_store.get_metrics(),
+        "checkpoints": execution_checkpointer.get_metrics(),
+        "redis_cache": async_cache.get_metrics(),
+    }
@@ -0,0 +1,81 @@
+"""Initial schema, as created by Base.metadata.create_all
+
+Revision ID: 0001_initial
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001_initial'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('email', sa.String(255), nullable=False),
+        sa.Column('password_hash', sa.String(255), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    op.create_table(
+        'workflows',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('name', sa.String(255), nullable=False),
+        sa.Column('definition', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_workflows_id', 'workflows', ['id'])
+
+    op.create_table(
+        'executions',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('workflow_id', sa.Integer(), sa.ForeignKey('workflows.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('status', sa.String(50)),
+        sa.Column('started_at', sa.DateTime()),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('trigger_data', sa.JSON(), nullable=True),
+    )
+    op.create_index('ix_executions_id', 'executions', ['id'])
+    op.create_index('ix_executions_status', 'executions', ['status'])
+
+    op.create_table(
+        'execution_logs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('execution_id', sa.Integer(), sa.ForeignKey('executions.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('node_id', sa.String(100), nullable=False),
+        sa.Column('status', sa.String(50), nullable=False),
+        sa.Column('message', sa.Text(), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_execution_logs_id', 'execution_logs', ['id'])
+
+    op.create_table(
+        'tickets',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('title', sa.String(255), nullable=False),
+        sa.Column('description', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(50)),
+        sa.Column('assigned_to', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_tickets_id', 'tickets', ['id'])
+    op.create_index('ix_tickets_status', 'tickets', ['status'])
+
+
+def downgrade() -> None:
+    op.drop_table('tickets')
+    op.drop_table('execution_logs')
+    op.drop_table('executions')
+    op.drop_table('workflows')
+    op.drop_table('users')
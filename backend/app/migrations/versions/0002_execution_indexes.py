@@ -0,0 +1,34 @@
+"""Composite indexes for execution history and log retention
+
+Revision ID: 0002_execution_indexes
+Revises: 0001_initial
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = '0002_execution_indexes'
+down_revision = '0001_initial'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_executions_workflow_id_started_at', 'executions', ['workflow_id', 'started_at']),
+    ('ix_execution_logs_execution_id_timestamp', 'execution_logs', ['execution_id', 'timestamp']),
+    ('ix_execution_logs_timestamp', 'execution_logs', ['timestamp']),
+]
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        # Build without holding a write lock on large, busy tables
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,35 @@
+"""Composite indexes for keyset-paginated ticket queries
+
+Revision ID: 0003_ticket_indexes
+Revises: 0002_execution_indexes
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = '0003_ticket_indexes'
+down_revision = '0002_execution_indexes'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_tickets_created_at_id', 'tickets', ['created_at', 'id']),
+    ('ix_tickets_status_created_at_id', 'tickets', ['status', 'created_at', 'id']),
+    ('ix_tickets_assigned_to_created_at_id', 'tickets', ['assigned_to', 'created_at', 'id']),
+    ('ix_tickets_user_id_created_at_id', 'tickets', ['user_id', 'created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        # Build without holding a write lock on large, busy tables
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,35 @@
+"""Full-text search vector and GIN index for tickets (PostgreSQL only)
+
+Revision ID: 0004_ticket_search
+Revises: 0003_ticket_indexes
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = '0004_ticket_search'
+down_revision = '0003_ticket_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Other databases search tickets with the in-process index
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # Titles rank above descriptions; the column is kept current by PostgreSQL itself
+    op.execute("""
+        ALTER TABLE tickets ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        ) STORED
+    """)
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tickets_search_vector ON tickets USING GIN (search_vector)")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("DROP INDEX IF EXISTS ix_tickets_search_vector")
+    op.execute("ALTER TABLE tickets DROP COLUMN IF EXISTS search_vector")
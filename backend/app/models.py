@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, JSON, Text
 from sqlalchemy.orm import relationship
 from .db import Base
 
@@ -31,6 +31,9 @@ class Workflow(Base):
 
 class Execution(Base):
     __tablename__ = 'executions'
+    __table_args__ = (
+        Index('ix_executions_workflow_id_started_at', 'workflow_id', 'started_at'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     workflow_id = Column(Integer, ForeignKey('workflows.id', ondelete='CASCADE'), nullable=False)
@@ -45,6 +48,10 @@ class Execution(Base):
 
 class ExecutionLog(Base):
     __tablename__ = 'execution_logs'
+    __table_args__ = (
+        Index('ix_execution_logs_execution_id_timestamp', 'execution_id', 'timestamp'),
+        Index('ix_execution_logs_timestamp', 'timestamp'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     execution_id = Column(Integer, ForeignKey('executions.id', ondelete='CASCADE'), nullable=False)
@@ -59,6 +66,13 @@ class ExecutionLog(Base):
 # Support ticket system models
 class Ticket(Base):
     __tablename__ = 'tickets'
+    # Keyset pagination walks (created_at, id) newest first, optionally within one filter
+    __table_args__ = (
+        Index('ix_tickets_created_at_id', 'created_at', 'id'),
+        Index('ix_tickets_status_created_at_id', 'status', 'created_at', 'id'),
+        Index('ix_tickets_assigned_to_created_at_id', 'assigned_to', 'created_at', 'id'),
+        Index('ix_tickets_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
@@ -1,33 +1,51 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from ..db import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..db import get_async_db
 from ..models import User
 from ..schemas import UserCreate, UserOut, TokenOut
-from ..utils.security import get_password_hash, verify_password, create_access_token
+from ..services.password_hasher import HasherSaturated, password_hasher, saturated_response
+from ..services.principal_cache import principal_cache
+from ..utils.security import create_access_token
 
 router = APIRouter()
 
 
 @router.post('/signup', response_model=UserOut)
-def signup(data: UserCreate, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == data.email).first()
+async def signup(data: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing = await db.scalar(select(User.id).where(User.email == data.email))
     if existing:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Email already registered')
+    try:
+        password_hash = await password_hasher.hash(data.password)
+    except HasherSaturated:
+        raise saturated_response()
     user = User(
         email=data.email, 
-        password_hash=get_password_hash(data.password)
+        password_hash=password_hash
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
 @router.post('/login', response_model=TokenOut)
-def login(data: UserCreate, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == data.email).first()
-    if not user or not verify_password(data.password, user.password_hash):
+async def login(data: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.email == data.email))
+    if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid credentials')
+    try:
+        valid, new_hash = await password_hasher.verify(data.password, user.password_hash)
+    except HasherSaturated:
+        raise saturated_response()
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid credentials')
+    if new_hash:
+        # Stored with an older bcrypt cost: upgrade it now that we know the password
+        user.password_hash = new_hash
+        await db.commit()
+        await principal_cache.invalidate_user(user.id)
     token = create_access_token(subject=user.id)
     return TokenOut(access_token=token, user=user)
 
@@ -1,34 +1,46 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from ..db import get_db
+from ..db import get_async_db
 from ..models import User, Workflow, Execution
 from ..deps import get_current_user
 
 router = APIRouter()
 
 
+@router.get('/status')
+async def get_email_statuses(ids: str, current_user: User = Depends(get_current_user)):
+    """Get the status of several emails, given as comma-separated IDs"""
+    try:
+        from ..services.email import email_service
+        return await email_service.get_email_statuses([email_id for email_id in ids.split(',') if email_id])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get email statuses: {str(e)}")
+
+
 @router.get('/{email_id}/status')
-async def get_email_status(email_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_email_status(email_id: str, current_user: User = Depends(get_current_user)):
     """Get email status by email ID"""
     try:
         from ..services.email import email_service
-        status = email_service.get_email_status(email_id)
+        status = await email_service.get_email_status(email_id)
         return status
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get email status: {str(e)}")
 
 
 @router.get('/workflow/{workflow_id}')
-async def get_workflow_emails(workflow_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_workflow_emails(workflow_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     """Get all emails for a specific workflow execution"""
     try:
-        wf = db.query(Workflow).filter(Workflow.id == workflow_id, Workflow.user_id == current_user.id).first()
+        wf = await db.scalar(select(Workflow.id).where(Workflow.id == workflow_id, Workflow.user_id == current_user.id))
         if not wf:
             raise HTTPException(status_code=404, detail='Workflow not found')
         
         # Get recent executions for this workflow
-        executions = db.query(Execution).filter(Execution.workflow_id == workflow_id).order_by(Execution.started_at.desc()).limit(5).all()
+        result = await db.execute(select(Execution).where(Execution.workflow_id == workflow_id).order_by(Execution.started_at.desc()).limit(5))
+        executions = result.scalars().all()
         
         emails = []
         for execution in executions:
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Union
+from ..config import Settings
+from ..models import User
+from ..schemas import EventIn, EventsAccepted
+from ..deps import admit_batch
+from ..services.event_bus import DomainEvent, ingest_bus
+from ..utils.serialization import FastJSONResponse
+
+router = APIRouter()
+
+
+@router.post('', response_model=EventsAccepted, status_code=status.HTTP_202_ACCEPTED)
+async def ingest_events(body: Union[EventIn, List[EventIn]], current_user: User = Depends(admit_batch)):
+    """Accept one event or an array of events for trigger evaluation.
+
+    Events are queued and the response returns immediately; background consumers match them
+    against the caller's workflow triggers and start executions in batches.
+    """
+    events = body if isinstance(body, list) else [body]
+    if len(events) > Settings.ingest_max_events_per_request:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f'At most {Settings.ingest_max_events_per_request} events per request')
+    # All or nothing, so a client can retry the whole request after a 503
+    if ingest_bus.queue.maxsize - ingest_bus.queue.qsize() < len(events):
+        ingest_bus.metrics['dropped'] += len(events)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='Event queue is full, please retry shortly',
+            headers={'Retry-After': str(Settings.ingest_retry_after_seconds)},
+        )
+
+    event_ids = []
+    for event in events:
+        queued = ingest_bus.publish_event(DomainEvent(
+            name=event.event, payload=event.data, user_id=current_user.id,
+            owner_id=current_user.id, workflow_id=event.workflow_id,
+        ))
+        event_ids.append(queued.id)
+    return FastJSONResponse({'event_ids': event_ids}, status_code=status.HTTP_202_ACCEPTED)
@@ -1,10 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
 from typing import List
-from ..db import get_db
 from ..models import User
 from ..deps import get_current_user
-from ..services.ably_service import ably_service
+from ..services.ably_service import ably_service, job_update_publisher
+from ..utils.serialization import FastJSONResponse
 import asyncio
 
 router = APIRouter()
@@ -49,8 +48,14 @@ async def get_ably_token(current_user: User = Depends(get_current_user)):
         raise HTTPException(status_code=500, detail=f"Failed to get token: {str(e)}")
 
 
+@router.get('/metrics')
+async def get_job_metrics(current_user: User = Depends(get_current_user)):
+    """Get realtime job update publisher metrics"""
+    return {"publisher": job_update_publisher.get_metrics()}
+
+
 @router.get('')
-async def list_jobs(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def list_jobs(current_user: User = Depends(get_current_user)):
     """List all jobs for the current user"""
     from ..services.scheduler import job_scheduler
     
@@ -65,13 +70,13 @@ async def list_jobs(db: Session = Depends(get_db), current_user: User = Depends(
             job_data['job_id'] = job.get('id')  # Ensure job_id is always present
             jobs.append(job_data)
         
-        return jobs
+        return FastJSONResponse(jobs)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list jobs: {str(e)}")
 
 
 @router.get('/{job_id}')
-async def get_job_status(job_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_job_status(job_id: str, current_user: User = Depends(get_current_user)):
     """Get job status by job ID"""
     from ..services.scheduler import job_scheduler
     
@@ -94,7 +99,7 @@ async def get_job_status(job_id: str, db: Session = Depends(get_db), current_use
 
 
 @router.delete('/{job_id}')
-async def cancel_job(job_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def cancel_job(job_id: str, current_user: User = Depends(get_current_user)):
     """Cancel a job"""
     from ..services.scheduler import job_scheduler
     
@@ -119,7 +124,7 @@ async def cancel_job(job_id: str, db: Session = Depends(get_db), current_user: U
 
 
 @router.get('/active')
-async def get_active_jobs(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_active_jobs(current_user: User = Depends(get_current_user)):
     """Get all active jobs (pending or running) for the current user"""
     from ..services.scheduler import job_scheduler
     
@@ -137,6 +142,6 @@ async def get_active_jobs(db: Session = Depends(get_db), current_user: User = De
             job_data['job_id'] = job.get('id')  # Ensure job_id is always present
             jobs.append(job_data)
         
-        return jobs
+        return FastJSONResponse(jobs)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get active jobs: {str(e)}")
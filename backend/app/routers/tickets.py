@@ -1,52 +1,238 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ..db import get_db
+import base64
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, func, literal_column, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional, Tuple
+from ..db import get_async_db, AsyncSessionLocal
 from ..models import User, Ticket
+from ..schemas import TicketPage, TicketSearchResults
 from ..deps import get_current_user
+from ..services.event_bus import event_bus
+from ..services.search_index import ticket_search_index, tsquery, use_postgres_search
+from ..utils.serialization import FastJSONResponse, dumps_bytes, loads
 
 router = APIRouter()
 
+EXPORT_BATCH_SIZE = 500
+
+
+def ticket_rows(tickets) -> List[dict]:
+    """Plain column dicts, so list responses skip FastAPI's jsonable_encoder"""
+    columns = [column.name for column in Ticket.__table__.columns]
+    return [{name: getattr(ticket, name) for name in columns} for ticket in tickets]
+
+
+def ticket_event_payload(ticket: Ticket, actor: User, **changes) -> Dict[str, Any]:
+    """Trigger data for a ticket event; conditions can test e.g. ticket_assigned or status"""
+    row = loads(dumps_bytes(ticket_rows([ticket])[0]))
+    return {
+        'ticket': row,
+        'ticket_id': ticket.id,
+        'status': ticket.status,
+        'ticket_assigned': ticket.assigned_to is not None,
+        'user_id': actor.id,
+        'user_email': actor.email,
+        **changes,
+    }
+
+
+def publish_ticket_changes(ticket: Ticket, actor: User, previous_status: Optional[str], previous_assignee: Optional[int]) -> None:
+    """Queue ticket.assigned / ticket.status_changed for whatever an update changed"""
+    if ticket.assigned_to != previous_assignee and ticket.assigned_to is not None:
+        event_bus.publish('ticket.assigned', ticket_event_payload(ticket, actor, previous_assigned_to=previous_assignee), actor.id)
+    if ticket.status != previous_status:
+        event_bus.publish('ticket.status_changed', ticket_event_payload(ticket, actor, previous_status=previous_status), actor.id)
+
+
+def encode_ticket_cursor(created_at: datetime, ticket_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{ticket_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_ticket_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, ticket_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(ticket_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+
+
+def ticket_filters(status: Optional[str] = None, assigned_to: Optional[int] = None, user_id: Optional[int] = None) -> List[Any]:
+    """WHERE clauses for the ticket filters; each one is served by a (column, created_at, id) index"""
+    filters = []
+    if status and status != 'all':
+        filters.append(Ticket.status == status)
+    if assigned_to is not None:
+        filters.append(Ticket.assigned_to == assigned_to)
+    if user_id is not None:
+        filters.append(Ticket.user_id == user_id)
+    return filters
+
+
+async def fetch_ticket_page(db: AsyncSession, filters: List[Any], limit: int,
+                            cursor: Optional[Tuple[datetime, int]] = None) -> Tuple[List[Ticket], Optional[str]]:
+    """Load one page of tickets, newest first, keyed on (created_at, id)"""
+    query = select(Ticket).where(*filters)
+    if cursor:
+        created_at, ticket_id = cursor
+        query = query.where(or_(
+            Ticket.created_at < created_at,
+            and_(Ticket.created_at == created_at, Ticket.id < ticket_id)
+        ))
+    # One extra row tells us whether another page follows
+    result = await db.execute(query.order_by(Ticket.created_at.desc(), Ticket.id.desc()).limit(limit + 1))
+    tickets = list(result.scalars())
+    next_cursor = encode_ticket_cursor(tickets[limit - 1].created_at, tickets[limit - 1].id) if len(tickets) > limit else None
+    return tickets[:limit], next_cursor
+
+
+async def estimate_ticket_count(db: AsyncSession, filters: List[Any]) -> int:
+    """Approximate number of matching tickets.
+
+    PostgreSQL answers from planner statistics (pg_class.reltuples, or the plan's row
+    estimate when filtered) so the cost doesn't grow with the table; other databases COUNT.
+    """
+    if db.bind.dialect.name != 'postgresql':
+        return await db.scalar(select(func.count()).select_from(Ticket).where(*filters))
+    if not filters:
+        estimate = await db.scalar(text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'tickets'"))
+        # -1 until the table has been analyzed
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+        return await db.scalar(select(func.count()).select_from(Ticket))
+    query = select(Ticket.id).where(*filters).compile(dialect=db.bind.dialect, compile_kwargs={'literal_binds': True})
+    plan = await db.scalar(text(f"EXPLAIN (FORMAT JSON) {query}"))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+async def get_ticket_or_404(db: AsyncSession, ticket_id: int) -> Ticket:
+    ticket = await db.get(Ticket, ticket_id)
+    if not ticket:
+        raise HTTPException(status_code=404, detail='Ticket not found')
+    return ticket
+
 
 @router.post('')
-async def create_ticket(ticket_data: dict, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def create_ticket(ticket_data: dict, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     """Create a new ticket"""
     try:
         ticket = Ticket(
             title=ticket_data.get('title'),
             description=ticket_data.get('description'),
             status=ticket_data.get('status', 'open'),
-            priority=ticket_data.get('priority', 'medium'),
             assigned_to=ticket_data.get('assigned_to'),
-            created_by=current_user.id
+            user_id=current_user.id
         )
         db.add(ticket)
-        db.commit()
-        db.refresh(ticket)
+        await db.commit()
+        await db.refresh(ticket)
+        ticket_search_index.add(ticket)
+        event_bus.publish('ticket.created', ticket_event_payload(ticket, current_user), current_user.id)
         return ticket
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to create ticket: {str(e)}")
 
 
-@router.get('')
-async def list_tickets(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """List all tickets"""
+async def ticket_page_response(db: AsyncSession, filters: List[Any], limit: int, cursor: Optional[str], include_total: bool) -> FastJSONResponse:
+    position = decode_ticket_cursor(cursor) if cursor else None
+    tickets, next_cursor = await fetch_ticket_page(db, filters, limit, position)
+    page: Dict[str, Any] = {'items': ticket_rows(tickets), 'next_cursor': next_cursor, 'total_estimate': None}
+    # Only the first page pays for the estimate unless asked otherwise
+    if (position is None) if include_total is None else include_total:
+        page['total_estimate'] = await estimate_ticket_count(db, filters)
+    return FastJSONResponse(page)
+
+
+@router.get('', response_model=TicketPage)
+async def list_tickets(status: Optional[str] = None, assigned_to: Optional[int] = None, user_id: Optional[int] = None,
+                       cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=500), include_total: Optional[bool] = None,
+                       db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    """List tickets, newest first, one page at a time"""
     try:
-        tickets = db.query(Ticket).order_by(Ticket.created_at.desc()).all()
-        return tickets
+        return await ticket_page_response(db, ticket_filters(status, assigned_to, user_id), limit, cursor, include_total)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list tickets: {str(e)}")
 
 
+async def search_postgres(db: AsyncSession, query: str, filters: List[Any], limit: int) -> Tuple[List[Dict[str, Any]], int]:
+    """Rank matches with ts_rank over the GIN-indexed search_vector column"""
+    ts_query = func.to_tsquery('english', query)
+    matches = literal_column('tickets.search_vector').op('@@')(ts_query)
+    rank = func.ts_rank(literal_column('tickets.search_vector'), ts_query).label('rank')
+    result = await db.execute(
+        select(Ticket, rank).where(matches, *filters).order_by(rank.desc(), Ticket.id.desc()).limit(limit)
+    )
+    rows = result.all()
+    items = [{**row, 'rank': score} for row, (_, score) in zip(ticket_rows(ticket for ticket, _ in rows), rows)]
+    total = await db.scalar(select(func.count()).select_from(Ticket).where(matches, *filters))
+    return items, total
+
+
+async def search_memory(db: AsyncSession, query: str, filters: Dict[str, Any], limit: int) -> Tuple[List[Dict[str, Any]], int]:
+    """Rank matches with the in-process index, then load just those tickets"""
+    await ticket_search_index.ensure_loaded()
+    best, total = ticket_search_index.search(query, limit, filters)
+    if not best:
+        return [], total
+    result = await db.execute(select(Ticket).where(Ticket.id.in_([ticket_id for ticket_id, _ in best])))
+    rows = {row['id']: row for row in ticket_rows(result.scalars())}
+    # A ticket deleted by another worker may still be indexed here
+    return [{**rows[ticket_id], 'rank': score} for ticket_id, score in best if ticket_id in rows], total
+
+
+@router.get('/search', response_model=TicketSearchResults)
+async def search_tickets(q: str = Query(..., min_length=1), status: Optional[str] = None, assigned_to: Optional[int] = None,
+                         user_id: Optional[int] = None, limit: int = Query(20, ge=1, le=100),
+                         db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    """Full-text search over ticket titles and descriptions, best match first; words match as prefixes"""
+    try:
+        query = tsquery(q)
+        if query is None:
+            return FastJSONResponse({'items': [], 'total': 0})
+        if use_postgres_search(db.bind.dialect.name):
+            items, total = await search_postgres(db, query, ticket_filters(status, assigned_to, user_id), limit)
+        else:
+            filters = {'status': status if status != 'all' else None, 'assigned_to': assigned_to, 'user_id': user_id}
+            items, total = await search_memory(db, q, filters, limit)
+        return FastJSONResponse({'items': items, 'total': total})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to search tickets: {str(e)}")
+
+
+@router.get('/export')
+async def export_tickets(status: Optional[str] = None, assigned_to: Optional[int] = None, user_id: Optional[int] = None,
+                         current_user: User = Depends(get_current_user)):
+    """Stream every matching ticket as newline-delimited JSON"""
+    filters = ticket_filters(status, assigned_to, user_id)
+
+    async def rows():
+        # The request session is closed once the response starts, so stream from a dedicated one
+        async with AsyncSessionLocal() as export_db:
+            position = None
+            while True:
+                tickets, next_cursor = await fetch_ticket_page(export_db, filters, EXPORT_BATCH_SIZE, position)
+                for row in ticket_rows(tickets):
+                    yield dumps_bytes(row) + b"\n"
+                if not next_cursor:
+                    break
+                position = decode_ticket_cursor(next_cursor)
+                # Rows already sent don't need to stay in the identity map
+                export_db.expunge_all()
+
+    return StreamingResponse(rows(), media_type='application/x-ndjson',
+                             headers={'Content-Disposition': 'attachment; filename="tickets.ndjson"'})
+
+
 @router.get('/{ticket_id}')
-async def get_ticket(ticket_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_ticket(ticket_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     """Get a specific ticket"""
     try:
-        ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
-        if not ticket:
-            raise HTTPException(status_code=404, detail='Ticket not found')
-        return ticket
+        return await get_ticket_or_404(db, ticket_id)
     except HTTPException:
         raise
     except Exception as e:
@@ -54,13 +240,12 @@ async def get_ticket(ticket_id: int, db: Session = Depends(get_db), current_user
 
 
 @router.put('/{ticket_id}')
-async def update_ticket(ticket_id: int, ticket_data: dict, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def update_ticket(ticket_id: int, ticket_data: dict, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     """Update a ticket"""
     try:
-        ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
-        if not ticket:
-            raise HTTPException(status_code=404, detail='Ticket not found')
-        
+        ticket = await get_ticket_or_404(db, ticket_id)
+        previous_status, previous_assignee = ticket.status, ticket.assigned_to
+
         # Update fields
         if 'title' in ticket_data:
             ticket.title = ticket_data['title']
@@ -68,66 +253,66 @@ async def update_ticket(ticket_id: int, ticket_data: dict, db: Session = Depends
             ticket.description = ticket_data['description']
         if 'status' in ticket_data:
             ticket.status = ticket_data['status']
-        if 'priority' in ticket_data:
-            ticket.priority = ticket_data['priority']
         if 'assigned_to' in ticket_data:
             ticket.assigned_to = ticket_data['assigned_to']
-        
-        db.commit()
-        db.refresh(ticket)
+
+        await db.commit()
+        await db.refresh(ticket)
+        ticket_search_index.add(ticket)
+        publish_ticket_changes(ticket, current_user, previous_status, previous_assignee)
         return ticket
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to update ticket: {str(e)}")
 
 
 @router.delete('/{ticket_id}')
-async def delete_ticket(ticket_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def delete_ticket(ticket_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     """Delete a ticket"""
     try:
-        ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
-        if not ticket:
-            raise HTTPException(status_code=404, detail='Ticket not found')
-        
-        db.delete(ticket)
-        db.commit()
+        ticket = await get_ticket_or_404(db, ticket_id)
+
+        await db.delete(ticket)
+        await db.commit()
+        ticket_search_index.remove(ticket_id)
         return {"message": "Ticket deleted successfully"}
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to delete ticket: {str(e)}")
 
 
 @router.put('/{ticket_id}/status')
-async def update_ticket_status(ticket_id: int, status_data: dict, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def update_ticket_status(ticket_id: int, status_data: dict, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     """Update ticket status"""
     try:
-        ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
-        if not ticket:
-            raise HTTPException(status_code=404, detail='Ticket not found')
-        
+        ticket = await get_ticket_or_404(db, ticket_id)
+        previous_status = ticket.status
+
         ticket.status = status_data.get('status')
-        db.commit()
-        db.refresh(ticket)
+        await db.commit()
+        await db.refresh(ticket)
+        ticket_search_index.add(ticket)
+        publish_ticket_changes(ticket, current_user, previous_status, ticket.assigned_to)
         return ticket
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to update ticket status: {str(e)}")
 
 
-@router.get('/filter/{status}')
-async def filter_tickets_by_status(status: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+@router.get('/filter/{status}', response_model=TicketPage)
+async def filter_tickets_by_status(status: str, cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=500),
+                                   include_total: Optional[bool] = None, db: AsyncSession = Depends(get_async_db),
+                                   current_user: User = Depends(get_current_user)):
     """Filter tickets by status"""
     try:
-        if status == 'all':
-            tickets = db.query(Ticket).order_by(Ticket.created_at.desc()).all()
-        else:
-            tickets = db.query(Ticket).filter(Ticket.status == status).order_by(Ticket.created_at.desc()).all()
-        return tickets
+        return await ticket_page_response(db, ticket_filters(status), limit, cursor, include_total)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to filter tickets: {str(e)}")
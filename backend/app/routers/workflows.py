@@ -1,28 +1,43 @@
+import asyncio
+import base64
+import math
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ..db import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, delete, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from ..config import Settings
+from ..db import get_async_db, AsyncSessionLocal
 from ..models import Workflow, Execution, ExecutionLog, User
-from ..schemas import WorkflowCreate, WorkflowUpdate, WorkflowOut, ExecutionOut, ExecutionLogOut
-from ..deps import get_current_user
-from ..services.cache import cache
+from ..schemas import WorkflowCreate, WorkflowUpdate, WorkflowOut, ExecutionOut, ExecutionLogOut, ExecutionHistoryPage
+from ..deps import admit_batch, admit_execution, get_current_user
+from ..services.admission import Overloaded, admission_controller
+from ..services.workflow_cache import workflow_cache
 from ..services.executor import workflow_executor
+from ..services.archive import execution_archive
 from ..services.conditions import evaluate_condition
-import asyncio
-from .ws import manager
+from ..utils.serialization import FastJSONResponse, dumps, dumps_bytes, loads
+from ..services.execution_events import execution_events
 
 router = APIRouter()
 
 
+async def get_owned_workflow(workflow_id: int, user_id: int) -> Dict[str, Any]:
+    """The cached workflow, checked against its owner without a database round trip"""
+    wf = await workflow_cache.get_owned(workflow_id, user_id)
+    if not wf:
+        raise HTTPException(status_code=404, detail='Workflow not found')
+    return wf
+
+
 @router.post('', response_model=WorkflowOut)
-def create_workflow(payload: WorkflowCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def create_workflow(payload: WorkflowCreate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     wf = Workflow(user_id=current_user.id, name=payload.name, definition=payload.definition)
     db.add(wf)
-    db.commit()
-    db.refresh(wf)
-    cache.set_json(f"workflow:{wf.id}", payload.model_dump())
-    return wf
+    await db.commit()
+    await db.refresh(wf)
+    return await workflow_cache.put(wf)
 
 @router.get('/samples')
 def get_samples():
@@ -54,47 +69,244 @@ def get_samples():
     ]
 
 @router.get('', response_model=List[WorkflowOut])
-def list_workflows(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    return db.query(Workflow).filter(Workflow.user_id == current_user.id).order_by(Workflow.created_at.desc()).all()
+async def list_workflows(db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    # Only ids come from the database; definitions are served from the workflow cache
+    result = await db.execute(select(Workflow.id).where(Workflow.user_id == current_user.id).order_by(Workflow.created_at.desc()))
+    return await workflow_cache.get_many(result.scalars().all())
 
-@router.get('/{workflow_id}/history')
-def get_history(workflow_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    wf = db.query(Workflow).filter(Workflow.id == workflow_id, Workflow.user_id == current_user.id).first()
-    if not wf:
-        raise HTTPException(status_code=404, detail='Workflow not found')
-    executions = db.query(Execution).filter(Execution.workflow_id == workflow_id).order_by(Execution.started_at.desc()).all()
-    data = []
-    for ex in executions:
-        logs = db.query(ExecutionLog).filter(ExecutionLog.execution_id == ex.id).order_by(ExecutionLog.timestamp.asc()).all()
-        data.append({
-            "execution": ExecutionOut.model_validate(ex),
-            "logs": [ExecutionLogOut.model_validate(l) for l in logs]
-        })
-    return data
-
-@router.post('/{workflow_id}/run')
-async def run_workflow(workflow_id: int, payload: dict = None, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    wf = db.query(Workflow).filter(Workflow.id == workflow_id, Workflow.user_id == current_user.id).first()
-    if not wf:
-        raise HTTPException(status_code=404, detail='Workflow not found')
+def encode_history_cursor(started_at: datetime, execution_id: int) -> str:
+    raw = f"{started_at.isoformat()}|{execution_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_history_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        started_at, execution_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(started_at), int(execution_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail='Invalid cursor')
+
+
+async def fetch_history_page(db: AsyncSession, workflow_id: int, limit: int,
+                             cursor: Optional[Tuple[datetime, int]] = None, include_logs: bool = True) -> Tuple[List[Dict], Optional[str]]:
+    """Load one page of executions, newest first, keyed on (started_at, id), with their logs in one query"""
+    query = select(Execution).where(Execution.workflow_id == workflow_id)
+    if cursor:
+        started_at, execution_id = cursor
+        query = query.where(or_(
+            Execution.started_at < started_at,
+            and_(Execution.started_at == started_at, Execution.id < execution_id)
+        ))
+    query = query.order_by(Execution.started_at.desc(), Execution.id.desc()).limit(limit + 1)
+    executions = (await db.execute(query)).scalars().all()
+
+    if len(executions) > limit:
+        last = executions[limit - 1]
+        next_cursor = encode_history_cursor(last.started_at, last.id)
+    else:
+        next_cursor = None
+    executions = executions[:limit]
+
+    logs_by_execution: Dict[int, List[ExecutionLogOut]] = {}
+    if include_logs and executions:
+        logs = await db.execute(
+            select(ExecutionLog)
+            .where(ExecutionLog.execution_id.in_([ex.id for ex in executions]))
+            .order_by(ExecutionLog.execution_id, ExecutionLog.timestamp.asc())
+        )
+        for log in logs.scalars():
+            logs_by_execution.setdefault(log.execution_id, []).append(ExecutionLogOut.model_validate(log))
+
+    items = [
+        {"execution": ExecutionOut.model_validate(ex), "logs": logs_by_execution.get(ex.id, [])}
+        for ex in executions
+    ]
+
+    # Once the hot table runs out, keep paging into the cold-storage archive
+    loop = asyncio.get_event_loop()
+    if next_cursor is None and await loop.run_in_executor(None, execution_archive.has_workflow, workflow_id):
+        before = (executions[-1].started_at, executions[-1].id) if executions else cursor
+        remaining = limit - len(items)
+        # One extra item tells us whether another page follows
+        archived = await loop.run_in_executor(
+            None, execution_archive.read_history, workflow_id, remaining + 1, before)
+        if len(archived) > remaining:
+            if remaining:
+                last = archived[remaining - 1]['execution']
+                next_cursor = encode_history_cursor(datetime.fromisoformat(last['started_at']), last['id'])
+            else:
+                next_cursor = encode_history_cursor(*before)
+        for item in archived[:remaining]:
+            items.append({
+                "execution": ExecutionOut.model_validate(item['execution']),
+                "logs": [ExecutionLogOut.model_validate(log) for log in item['logs']] if include_logs else []
+            })
+    return items, next_cursor
+
+
+@router.get('/{workflow_id}/history', response_model=ExecutionHistoryPage)
+async def get_history(workflow_id: int, cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=500),
+                      include_logs: bool = True, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    await get_owned_workflow(workflow_id, current_user.id)
+    position = decode_history_cursor(cursor) if cursor else None
+    items, next_cursor = await fetch_history_page(db, workflow_id, limit, position, include_logs)
+    return FastJSONResponse(ExecutionHistoryPage(items=items, next_cursor=next_cursor))
+
+@router.get('/{workflow_id}/history/export')
+async def export_history(workflow_id: int, include_logs: bool = True, current_user: User = Depends(get_current_user)):
+    """Stream the full execution history as newline-delimited JSON"""
+    await get_owned_workflow(workflow_id, current_user.id)
+
+    async def rows():
+        # The request session is closed once the response starts, so stream from a dedicated one
+        async with AsyncSessionLocal() as export_db:
+            position = None
+            while True:
+                items, next_cursor = await fetch_history_page(export_db, workflow_id, 500, position, include_logs)
+                for item in items:
+                    yield dumps_bytes({
+                        "execution": item["execution"].model_dump(),
+                        "logs": [log.model_dump() for log in item["logs"]]
+                    }) + b"\n"
+                if not next_cursor:
+                    break
+                position = decode_history_cursor(next_cursor)
+
+    return StreamingResponse(rows(), media_type='application/x-ndjson',
+                             headers={'Content-Disposition': f'attachment; filename="workflow-{workflow_id}-history.ndjson"'})
+
+@router.post('/{workflow_id}/run', dependencies=[Depends(admit_execution)])
+async def run_workflow(workflow_id: int, payload: dict = None, current_user: User = Depends(get_current_user)):
+    wf = await get_owned_workflow(workflow_id, current_user.id)
     
     # Use the new simplified executor
     execution_id = await workflow_executor.execute_workflow(
         workflow_id=workflow_id,
         payload=payload,
-        user_id=str(current_user.id)
+        user_id=str(current_user.id),
+        definition=wf['definition']
     )
     
     return {"execution_id": execution_id}
 
-@router.post('/{workflow_id}/trigger')
-async def trigger_workflow(workflow_id: int, trigger_data: dict, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    wf = db.query(Workflow).filter(Workflow.id == workflow_id, Workflow.user_id == current_user.id).first()
-    if not wf:
-        raise HTTPException(status_code=404, detail='Workflow not found')
+def parse_batch_line(line: bytes) -> Tuple[Any, Optional[str]]:
+    try:
+        return loads(line), None
+    except Exception:
+        return None, 'Invalid JSON'
+
+
+async def iter_batch_payloads(request: Request) -> AsyncIterator[Tuple[Any, Optional[str]]]:
+    """(payload, error) for every item of a JSON array body or an NDJSON stream; NDJSON is parsed as it arrives"""
+    if 'ndjson' not in request.headers.get('content-type', ''):
+        try:
+            items = loads(await request.body())
+        except Exception:
+            raise HTTPException(status_code=400, detail='Invalid JSON')
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail='Expected a JSON array of payloads')
+        for item in items:
+            yield item, None
+        return
+
+    buffer = b''
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            if line.strip():
+                yield parse_batch_line(line)
+    if buffer.strip():
+        yield parse_batch_line(buffer)
+
+
+async def launch_batch(db: AsyncSession, wf: Dict[str, Any], user_id: int, items: List[Tuple[int, Any, Optional[str]]]) -> List[Dict[str, Any]]:
+    """Insert and schedule one chunk of batch items; returns a result per item, in order"""
+    results = {}
+    valid = []
+    for index, payload, error in items:
+        if error is None and not isinstance(payload, dict):
+            error = 'Payload must be a JSON object'
+        if error:
+            results[index] = {'index': index, 'error': error}
+        else:
+            valid.append((index, payload))
+
+    if valid:
+        # One multi-row INSERT; ids come back in parameter order
+        result = await db.execute(
+            insert(Execution).returning(Execution.id, sort_by_parameter_order=True),
+            [{'workflow_id': wf['id'], 'status': 'pending', 'trigger_data': payload} for _, payload in valid]
+        )
+        db_execution_ids = list(result.scalars())
+        await db.commit()
+        execution_ids = await workflow_executor.execute_workflows(
+            workflow_id=wf['id'],
+            payloads=[payload for _, payload in valid],
+            user_id=str(user_id),
+            db_execution_ids=db_execution_ids,
+            definition=wf['definition']
+        )
+        for (index, _), execution_id, db_execution_id in zip(valid, execution_ids, db_execution_ids):
+            results[index] = {'index': index, 'execution_id': execution_id, 'db_execution_id': db_execution_id}
+
+    return [results[index] for index, _, _ in items]
+
+
+@router.post('/{workflow_id}/run/batch', dependencies=[Depends(admit_batch)])
+async def run_workflow_batch(workflow_id: int, request: Request, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    """Start one execution per payload, from a JSON array or an NDJSON stream of payloads.
+
+    Executions are inserted and scheduled in chunks; every payload gets either its
+    execution ids or an error, so one bad item doesn't fail the rest. Payloads beyond
+    BATCH_RUN_MAX_ITEMS are not read and the response is marked truncated; so is a batch
+    cut short by admission control, with retry_after set.
+    """
+    wf = await get_owned_workflow(workflow_id, current_user.id)
+
+    results: List[Dict[str, Any]] = []
+    chunk: List[Tuple[int, Any, Optional[str]]] = []
+    index = 0
+    truncated = False
+    retry_after = None
+
+    async def flush(chunk) -> bool:
+        nonlocal retry_after
+        try:
+            admission_controller.check_capacity(len(chunk))
+        except Overloaded as e:
+            retry_after = math.ceil(e.retry_after)
+            results.extend({'index': index, 'error': f'Overloaded ({e.reason})'} for index, _, _ in chunk)
+            return False
+        admission_controller.reserve(len(chunk))
+        results.extend(await launch_batch(db, wf, current_user.id, chunk))
+        return True
+
+    async for payload, error in iter_batch_payloads(request):
+        if index >= Settings.batch_run_max_items:
+            truncated = True
+            break
+        chunk.append((index, payload, error))
+        index += 1
+        if len(chunk) >= Settings.batch_run_chunk_size:
+            admitted = await flush(chunk)
+            chunk = []
+            if not admitted:
+                truncated = True
+                break
+    if chunk and not await flush(chunk):
+        truncated = True
+
+    accepted = sum(1 for result in results if 'execution_id' in result)
+    return FastJSONResponse({'accepted': accepted, 'failed': len(results) - accepted, 'truncated': truncated,
+                             'retry_after': retry_after, 'results': results})
+
+@router.post('/{workflow_id}/trigger', dependencies=[Depends(admit_execution)])
+async def trigger_workflow(workflow_id: int, trigger_data: dict, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    wf = await get_owned_workflow(workflow_id, current_user.id)
     
     # Check if any trigger conditions match
-    triggers = wf.definition.get('triggers', [])
+    triggers = wf['definition'].get('triggers', [])
     should_execute = False
     
     for trigger in triggers:
@@ -106,92 +318,92 @@ async def trigger_workflow(workflow_id: int, trigger_data: dict, db: Session = D
         return {"message": "No trigger conditions matched", "executed": False}
     
     # Create execution with trigger data
-    execution = Execution(workflow_id=wf.id, status='pending', trigger_data=trigger_data)
+    execution = Execution(workflow_id=wf['id'], status='pending', trigger_data=trigger_data)
     db.add(execution)
-    db.commit()
-    db.refresh(execution)
-
-    async def broadcast(workflow_id: int, event):
-        await manager.broadcast(workflow_id, event)
-
-    executor = workflow_executor(
-        db=db, 
-        workflow=wf, 
-        execution=execution, 
-        ws_broadcast=broadcast,
-        initial_context=trigger_data
+    await db.commit()
+
+    # Step progress is streamed to subscribers through the execution event stream
+    await workflow_executor.execute_workflow(
+        workflow_id=wf['id'],
+        payload=trigger_data,
+        user_id=str(current_user.id),
+        db_execution_id=execution.id,
+        definition=wf['definition']
     )
-    asyncio.create_task(executor.run())
     return {"execution_id": execution.id, "executed": True}
 
-@router.post('/{workflow_id}/test')
-async def test_workflow(workflow_id: int, payload: dict, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+@router.post('/{workflow_id}/test', dependencies=[Depends(admit_execution)])
+async def test_workflow(workflow_id: int, payload: dict, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     """
     Test a workflow with custom payload data without checking trigger conditions
     """
-    wf = db.query(Workflow).filter(Workflow.id == workflow_id, Workflow.user_id == current_user.id).first()
-    if not wf:
-        raise HTTPException(status_code=404, detail='Workflow not found')
+    wf = await get_owned_workflow(workflow_id, current_user.id)
     
     # Create execution with test payload data
-    execution = Execution(workflow_id=wf.id, status='pending', trigger_data=payload.get('payload', {}))
+    execution = Execution(workflow_id=wf['id'], status='pending', trigger_data=payload.get('payload', {}))
     db.add(execution)
-    db.commit()
-    db.refresh(execution)
-
-    async def broadcast(workflow_id: int, event):
-        await manager.broadcast(workflow_id, event)
-
-    executor = workflow_executor(
-        db=db, 
-        workflow=wf, 
-        execution=execution, 
-        ws_broadcast=broadcast,
-        initial_context=payload.get('payload', {})
+    await db.commit()
+
+    await workflow_executor.execute_workflow(
+        workflow_id=wf['id'],
+        payload=payload.get('payload', {}),
+        user_id=str(current_user.id),
+        db_execution_id=execution.id,
+        definition=wf['definition']
     )
-    asyncio.create_task(executor.run())
     return {"execution_id": execution.id, "message": "Test execution started"}
 
+@router.get('/{workflow_id}/events')
+async def stream_execution_events(workflow_id: int, request: Request, current_user: User = Depends(get_current_user)):
+    """Stream step progress of the workflow's executions as server-sent events"""
+    await get_owned_workflow(workflow_id, current_user.id)
+
+    subscription = execution_events.subscribe(f"sse:{current_user.id}", workflow_id=workflow_id)
+
+    async def event_source():
+        try:
+            while not await request.is_disconnected():
+                events = await subscription.get_batch(timeout=15)
+                if not events:
+                    yield ": keep-alive\n\n"
+                for event in events:
+                    yield f"event: {event.type.value}\ndata: {dumps(event.to_dict())}\n\n"
+        finally:
+            execution_events.unsubscribe(subscription)
+
+    return StreamingResponse(event_source(), media_type='text/event-stream')
+
 @router.get('/{workflow_id}', response_model=WorkflowOut)
-def get_workflow(workflow_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    cached = cache.get_json(f"workflow:{workflow_id}")
-    wf = db.query(Workflow).filter(Workflow.id == workflow_id, Workflow.user_id == current_user.id).first()
-    if not wf:
-        raise HTTPException(status_code=404, detail='Workflow not found')
-    if cached:
-        return wf
-    cache.set_json(f"workflow:{workflow_id}", {"name": wf.name, "definition": wf.definition})
-    return wf
+async def get_workflow(workflow_id: int, current_user: User = Depends(get_current_user)):
+    return await get_owned_workflow(workflow_id, current_user.id)
 
 @router.put('/{workflow_id}', response_model=WorkflowOut)
-def update_workflow(workflow_id: int, payload: WorkflowUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    wf = db.query(Workflow).filter(Workflow.id == workflow_id, Workflow.user_id == current_user.id).first()
+async def update_workflow(workflow_id: int, payload: WorkflowUpdate, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    result = await db.execute(select(Workflow).where(Workflow.id == workflow_id, Workflow.user_id == current_user.id))
+    wf = result.scalars().first()
     if not wf:
         raise HTTPException(status_code=404, detail='Workflow not found')
     wf.name = payload.name
     wf.definition = payload.definition
     wf.updated_at = datetime.utcnow()
-    db.add(wf)
-    db.commit()
-    db.refresh(wf)
-    cache.set_json(f"workflow:{workflow_id}", payload.model_dump())
-    return wf
+    await db.commit()
+    await db.refresh(wf)
+    return await workflow_cache.put(wf)
 
 @router.delete('/{workflow_id}')
-async def delete_workflow(workflow_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def delete_workflow(workflow_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     """Delete a workflow"""
-    wf = db.query(Workflow).filter(Workflow.id == workflow_id, Workflow.user_id == current_user.id).first()
-    if not wf:
-        raise HTTPException(status_code=404, detail='Workflow not found')
+    wf = await get_owned_workflow(workflow_id, current_user.id)
     
     # Delete related executions and logs
-    db.query(ExecutionLog).filter(ExecutionLog.execution_id.in_(
-        db.query(Execution.id).filter(Execution.workflow_id == workflow_id)
-    )).delete(synchronize_session=False)
+    await db.execute(delete(ExecutionLog).where(ExecutionLog.execution_id.in_(
+        select(Execution.id).where(Execution.workflow_id == workflow_id)
+    )))
     
-    db.query(Execution).filter(Execution.workflow_id == workflow_id).delete()
-    db.delete(wf)
-    db.commit()
+    await db.execute(delete(Execution).where(Execution.workflow_id == workflow_id))
+    await db.execute(delete(Workflow).where(Workflow.id == wf['id']))
+    await db.commit()
+    await workflow_cache.evict(workflow_id)
     
     return {"message": "Workflow deleted successfully"}
 
@@ -1,31 +1,204 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import Dict, List
+import asyncio
+import time
+from collections import deque
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+from ..config import Settings
+from ..deps import get_current_user
+from ..models import User
+from ..services.fanout import create_fanout_bus
+from ..utils.serialization import dumps, loads
 
 router = APIRouter()
 
+SLOW_CONSUMER_POLICIES = ('drop_oldest', 'coalesce', 'disconnect')
+
+
+def coalesce_key(message: Any) -> Optional[Tuple]:
+    """Messages with the same key supersede each other under the coalesce policy"""
+    if not isinstance(message, dict):
+        return None
+    return (message.get('type'), message.get('execution_id'), message.get('node_id'))
+
+
+class ConnectionWriter:
+    """Bounded send queue and writer task for a single WebSocket"""
+
+    def __init__(self, workflow_id: int, websocket: WebSocket, max_queue: int, policy: str, manager: "ConnectionManager") -> None:
+        self.workflow_id = workflow_id
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.policy = policy
+        self.manager = manager
+        # (coalesce key, serialized message, enqueued at)
+        self.queue: Deque[Tuple[Optional[Tuple], str, float]] = deque()
+        self._ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.closed = False
+        self.metrics: Dict[str, Any] = {
+            'sent': 0,
+            'dropped': 0,
+            'coalesced': 0,
+            'max_queue_depth': 0,
+            'last_send_ms': 0.0,
+        }
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        self.closed = True
+        if self.task and self.task is not asyncio.current_task():
+            self.task.cancel()
+
+    def enqueue(self, text: str, key: Optional[Tuple] = None) -> bool:
+        """Queue a serialized message; returns False if the connection is being dropped"""
+        if self.closed:
+            return False
+
+        if len(self.queue) >= self.max_queue:
+            if self.policy == 'disconnect':
+                self.manager.evict(self)
+                return False
+            if self.policy == 'coalesce' and key is not None and self._drop_superseded(key):
+                self.metrics['coalesced'] += 1
+            else:
+                self.queue.popleft()
+                self.metrics['dropped'] += 1
+
+        self.queue.append((key, text, time.monotonic()))
+        self.metrics['max_queue_depth'] = max(self.metrics['max_queue_depth'], len(self.queue))
+        self._ready.set()
+        return True
+
+    def _drop_superseded(self, key: Tuple) -> bool:
+        for index, (queued_key, _, _) in enumerate(self.queue):
+            if queued_key == key:
+                del self.queue[index]
+                return True
+        return False
+
+    async def _run(self) -> None:
+        try:
+            while not self.closed:
+                if not self.queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                _, text, _ = self.queue.popleft()
+                started = time.perf_counter()
+                await self.websocket.send_text(text)
+                self.metrics['last_send_ms'] = round((time.perf_counter() - started) * 1000, 2)
+                self.metrics['sent'] += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # Dead socket: stop writing and forget it without affecting other subscribers
+            self.manager.disconnect(self.workflow_id, self.websocket)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        lag_ms = (time.monotonic() - self.queue[0][2]) * 1000 if self.queue else 0.0
+        return {
+            **self.metrics,
+            'workflow_id': self.workflow_id,
+            'policy': self.policy,
+            'queue_depth': len(self.queue),
+            'lag_ms': round(lag_ms, 2),
+        }
+
 
 class ConnectionManager:
-    def __init__(self) -> None:
-        self.active_connections: Dict[int, List[WebSocket]] = {}
+    def __init__(self, max_queue: int = None, policy: str = None, bus=None) -> None:
+        self.active_connections: Dict[int, List[ConnectionWriter]] = {}
+        self.max_queue = max_queue or Settings.ws_send_queue_size
+        self.policy = policy or Settings.ws_slow_consumer_policy
+        if self.policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {self.policy}")
+        self.evicted = 0
+        # Unsubscribe and close tasks, referenced until done so they aren't garbage collected mid-flight
+        self.background_tasks: Set[asyncio.Task] = set()
+        # Messages from any worker arrive through the bus and are delivered to local sockets
+        self.bus = bus or create_fanout_bus()
+        self.bus.set_handler(self.deliver)
 
     async def connect(self, workflow_id: int, websocket: WebSocket) -> None:
         await websocket.accept()
-        self.active_connections.setdefault(workflow_id, []).append(websocket)
+        writer = ConnectionWriter(workflow_id, websocket, self.max_queue, self.policy, self)
+        writer.start()
+        if workflow_id not in self.active_connections:
+            await self.bus.subscribe(workflow_id)
+        self.active_connections.setdefault(workflow_id, []).append(writer)
 
     def disconnect(self, workflow_id: int, websocket: WebSocket) -> None:
         if workflow_id in self.active_connections:
-            self.active_connections[workflow_id] = [ws for ws in self.active_connections[workflow_id] if ws is not websocket]
+            for writer in self.active_connections[workflow_id]:
+                if writer.websocket is websocket:
+                    writer.stop()
+            self.active_connections[workflow_id] = [w for w in self.active_connections[workflow_id] if w.websocket is not websocket]
             if not self.active_connections[workflow_id]:
                 self.active_connections.pop(workflow_id, None)
+                self._spawn(self._unsubscribe(workflow_id))
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+
+    async def _unsubscribe(self, workflow_id: int) -> None:
+        # A new socket may have connected while this was scheduled
+        if workflow_id not in self.active_connections:
+            await self.bus.unsubscribe(workflow_id)
+
+    def evict(self, writer: ConnectionWriter) -> None:
+        """Drop a consumer that cannot keep up"""
+        self.evicted += 1
+        self.disconnect(writer.workflow_id, writer.websocket)
+        self._spawn(self._close(writer.websocket))
+
+    async def _close(self, websocket: WebSocket) -> None:
+        try:
+            await websocket.close(code=1013)
+        except Exception:
+            pass
 
     async def broadcast(self, workflow_id: int, message):
-        for ws in self.active_connections.get(workflow_id, []):
-            await ws.send_json(message)
+        """Serialize once and publish to the subscribers of the workflow on every worker"""
+        await self.bus.publish(workflow_id, dumps(message))
+
+    def deliver(self, workflow_id: int, text: str) -> None:
+        """Queue an already serialized message for every local subscriber of the workflow"""
+        writers = self.active_connections.get(workflow_id)
+        if not writers:
+            return
+        key = coalesce_key(loads(text)) if self.policy == 'coalesce' else None
+        for writer in list(writers):
+            writer.enqueue(text, key)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        connections = [writer.get_metrics() for writers in self.active_connections.values() for writer in writers]
+        return {
+            'policy': self.policy,
+            'fanout': type(self.bus).__name__,
+            'max_queue': self.max_queue,
+            'evicted': self.evicted,
+            'connections': connections,
+        }
 
 
 manager = ConnectionManager()
 
 
+async def broadcast_execution_events(events) -> None:
+    """Execution event sink that streams events to the workflow's WebSocket subscribers"""
+    for event in events:
+        await manager.broadcast(event.workflow_id, event.to_dict())
+
+
+@router.get('/ws/metrics')
+def websocket_metrics(current_user: User = Depends(get_current_user)):
+    return manager.get_metrics()
+
+
 @router.websocket('/ws/executions/{workflow_id}')
 async def websocket_endpoint(websocket: WebSocket, workflow_id: int):
     await manager.connect(workflow_id, websocket)
@@ -33,4 +206,6 @@ async def websocket_endpoint(websocket: WebSocket, workflow_id: int):
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(workflow_id, websocket)
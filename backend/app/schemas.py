@@ -71,4 +71,50 @@ class ExecutionLogOut(BaseModel):
 
 class ExecutionHistoryOut(BaseModel):
     execution: ExecutionOut
-    logs: List[ExecutionLogOut]
+    logs: List[ExecutionLogOut] = []
+
+
+class ExecutionHistoryPage(BaseModel):
+    items: List[ExecutionHistoryOut]
+    next_cursor: Optional[str] = None
+
+
+class TicketOut(BaseModel):
+    id: int
+    user_id: int
+    title: str
+    description: str
+    status: Optional[str]
+    assigned_to: Optional[int]
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class TicketPage(BaseModel):
+    items: List[TicketOut]
+    next_cursor: Optional[str] = None
+    # From planner statistics on PostgreSQL, so it may be off by a few percent
+    total_estimate: Optional[int] = None
+
+
+class TicketSearchHit(TicketOut):
+    rank: float
+
+
+class TicketSearchResults(BaseModel):
+    items: List[TicketSearchHit]
+    total: int
+
+
+class EventIn(BaseModel):
+    event: str = Field(..., min_length=1, max_length=100, pattern=r'^[A-Za-z0-9_.:-]+$')
+    data: Dict[str, Any] = {}
+    # Limit the event to one of the caller's workflows
+    workflow_id: Optional[int] = None
+
+
+class EventsAccepted(BaseModel):
+    event_ids: List[str]
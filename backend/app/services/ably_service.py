@@ -1,7 +1,57 @@
 import os
 import asyncio
-from typing import Dict, Any, Optional
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
 from ably import AblyRealtime
+from ably.types.message import Message
+from ..config import Settings
+from ..utils.serialization import dumps
+
+# Job fields that never leave the process (callables and their arguments)
+JOB_PRIVATE_FIELDS = {'function', 'args', 'kwargs'}
+# Fields sent with every update so clients can always identify the job
+JOB_IDENTITY_FIELDS = ('job_id', 'status', 'job_type', 'updated_at')
+TERMINAL_JOB_STATUSES = {'completed', 'failed', 'cancelled'}
+# Channel for jobs that do not belong to any user
+SYSTEM_JOB_CHANNEL = "refresh-jobs"
+
+
+def user_job_channel(user_id: str) -> str:
+    return f"user-{user_id}-job-updates"
+
+
+def workflow_job_channel(user_id: str, workflow_id: Any) -> str:
+    return f"user-{user_id}-workflow-{workflow_id}-job-updates"
+
+
+def execution_channel(user_id: str, workflow_id: Any) -> str:
+    return f"user-{user_id}-workflow-{workflow_id}-executions"
+
+
+def job_channels(job_data: Dict[str, Any], user_id: Optional[str] = None) -> Tuple[str, ...]:
+    """Channels a job update fans out to: its owner's channel, plus the workflow channel if enabled"""
+    user_id = user_id or job_data.get('user_id')
+    if not user_id:
+        return (SYSTEM_JOB_CHANNEL,)
+    channels = [user_job_channel(user_id)]
+    if Settings.ably_workflow_channels and job_data.get('workflow_id') is not None:
+        channels.append(workflow_job_channel(user_id, job_data['workflow_id']))
+    return tuple(channels)
+
+
+def _public_job_fields(job_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Strip process-local fields and coerce unknown values so the job can be serialized"""
+    fields = {}
+    for key, value in job_data.items():
+        if key in JOB_PRIVATE_FIELDS or callable(value):
+            continue
+        if value is None or isinstance(value, (str, int, float, bool, list, dict)):
+            fields[key] = value
+        else:
+            fields[key] = str(value)
+    return fields
+
 
 class AblyService:
     __client__ = None
@@ -22,6 +72,11 @@ class AblyService:
         else:
             print("⚠️ Ably realtime key not provided - real-time updates will be simulated")
 
+    @staticmethod
+    def set_client(client):
+        """Use a specific realtime client, e.g. an in-memory stand-in for tests"""
+        AblyService.__client__ = client
+
     @staticmethod
     async def publish(channel_name: str, event_name: str, data: Dict[str, Any]):
         """Publish message to Ably channel"""
@@ -52,24 +107,39 @@ class AblyService:
             print(f"❌ Test publish failed: {e}")
             return False
 
+    @staticmethod
+    async def publish_batch(channel_name: str, event_name: str, messages: List[Dict[str, Any]]):
+        """Publish several messages to an Ably channel in a single request"""
+        if not AblyService.__client__:
+            print(f"📡 [SIMULATED] Published {len(messages)} x {event_name} to {channel_name}")
+            return
+
+        channel = AblyService.__client__.channels.get(channel_name)
+        # Encode here so the faster serializer is used; subscribers decode by the json encoding
+        await channel.publish(messages=[Message(name=event_name, data=dumps(data), encoding='json') for data in messages])
+
+    async def publish_execution_events(self, events: list):
+        """Execution event sink that publishes step progress to each owner's workflow channel"""
+        batches: Dict[str, List[Dict[str, Any]]] = {}
+        for event in events:
+            if event.user_id:
+                batches.setdefault(execution_channel(event.user_id, event.workflow_id), []).append(event.to_dict())
+        for channel_name, messages in batches.items():
+            try:
+                await AblyService.publish_batch(channel_name, 'execution-event', messages)
+            except Exception as e:
+                print(f"❌ Error publishing execution events to {channel_name}: {e}")
+
+    def queue_job_status_update(self, job_id: str, job_data: Dict[str, Any], user_id: Optional[str] = None):
+        """Queue a job status update for background publishing without blocking the caller"""
+        job_update_publisher.enqueue(job_id, job_data, user_id)
+
     async def publish_job_status_update(self, job_id: str, job_data: Dict[str, Any], user_id: Optional[str] = None):
         """Publish job status update to a specific channel"""
-        # Create a channel for job updates
-        channel_name = f"refresh-jobs"
-        if user_id:
-            channel_name = f"refresh-jobs"
-        
-        # Prepare the message
-        message = {
-            'job_id': job_id,
-            'status': job_data.get('status'),
-            'job_type': job_data.get('job_type'),
-            'updated_at': job_data.get('updated_at'),
-            'data': job_data
-        }
-        
-        print(f"📡 Publishing job status update to {channel_name}: {message}")
-        await AblyService.publish(channel_name, 'job-status-update', message)
+        self.queue_job_status_update(job_id, job_data, user_id)
+        if not job_update_publisher.is_running:
+            # No background publisher (scripts, tests) - deliver right away
+            await job_update_publisher.flush()
     
     async def publish_job_list_update(self, user_id: str, jobs: list):
         """Publish job list update for a user"""
@@ -100,6 +170,7 @@ class AblyService:
                 'capability': {
                     f"user-{user_id}-job-updates": ['subscribe'],
                     f"user-{user_id}-job-list": ['subscribe'],
+                    f"user-{user_id}-workflow-*": ['subscribe'],
                     f"job-updates-*": ['subscribe']
                 }
             }
@@ -113,5 +184,134 @@ class AblyService:
             print(f"❌ Error creating token request: {e}")
             return None
 
+
+class JobUpdatePublisher:
+    """Coalesces job status updates per job and publishes them to Ably in background batches"""
+
+    def __init__(self, flush_interval: float = None, batch_size: int = None, max_pending: int = None):
+        self.flush_interval = flush_interval if flush_interval is not None else Settings.ably_publish_interval_ms / 1000
+        self.batch_size = batch_size or Settings.ably_publish_batch_size
+        self.max_pending = max_pending or Settings.ably_publish_max_pending
+        # job_id -> (channels, public job fields); insertion order is publish order
+        self._pending: "OrderedDict[str, Tuple[Tuple[str, ...], Dict[str, Any]]]" = OrderedDict()
+        # Last published fields per job, used to send only what changed
+        self._published: Dict[str, Dict[str, Any]] = {}
+        self.is_running = False
+        self.background_task = None
+        self.metrics: Dict[str, Any] = {
+            'enqueued': 0,
+            'coalesced': 0,
+            'dropped': 0,
+            'published': 0,
+            'batches': 0,
+            'errors': 0,
+            'last_flush_ms': 0.0,
+        }
+
+    def enqueue(self, job_id: str, job_data: Dict[str, Any], user_id: Optional[str] = None):
+        """Record the latest state of a job; older unpublished states of the same job are replaced"""
+        channels = job_channels(job_data, user_id)
+        fields = _public_job_fields(job_data)
+        fields['job_id'] = job_id
+
+        self.metrics['enqueued'] += 1
+        if job_id in self._pending:
+            self.metrics['coalesced'] += 1
+            self._pending[job_id] = (channels, fields)
+            return
+
+        if len(self._pending) >= self.max_pending:
+            # Shed the stalest update rather than grow without bound
+            dropped_job_id, _ = self._pending.popitem(last=False)
+            self._published.pop(dropped_job_id, None)
+            self.metrics['dropped'] += 1
+
+        self._pending[job_id] = (channels, fields)
+
+    async def start(self):
+        """Start the background publisher"""
+        if self.is_running:
+            return
+
+        self.is_running = True
+        self.background_task = asyncio.create_task(self._run())
+        print("📡 Job update publisher started")
+
+    async def stop(self):
+        """Stop the background publisher, publishing whatever is still queued"""
+        self.is_running = False
+        if self.background_task:
+            self.background_task.cancel()
+            try:
+                await self.background_task
+            except asyncio.CancelledError:
+                pass
+            self.background_task = None
+        await self.flush()
+        print("📡 Job update publisher stopped")
+
+    async def _run(self):
+        """Publisher loop"""
+        while self.is_running:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error in job update publisher: {e}")
+
+    async def flush(self):
+        """Publish all queued updates, one request per channel and batch"""
+        while self._pending:
+            started = time.perf_counter()
+            batches: Dict[str, List[Dict[str, Any]]] = {}
+            for _ in range(min(self.batch_size, len(self._pending))):
+                job_id, (channels, fields) = self._pending.popitem(last=False)
+                message = self._build_message(job_id, fields)
+                for channel_name in channels:
+                    batches.setdefault(channel_name, []).append(message)
+
+            for channel_name, messages in batches.items():
+                try:
+                    await AblyService.publish_batch(channel_name, 'job-status-update', messages)
+                    self.metrics['published'] += len(messages)
+                    self.metrics['batches'] += 1
+                except Exception as e:
+                    self.metrics['errors'] += 1
+                    # Clients missed this delta, so send full state next time
+                    for message in messages:
+                        self._published.pop(message['job_id'], None)
+                    print(f"❌ Error publishing {len(messages)} job updates to {channel_name}: {e}")
+
+            self.metrics['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+    def _build_message(self, job_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Build a message containing only the fields that changed since the last publish"""
+        previous = self._published.get(job_id, {})
+        changed = {key: value for key, value in fields.items() if previous.get(key) != value}
+        for key in JOB_IDENTITY_FIELDS:
+            if key in fields:
+                changed[key] = fields[key]
+
+        if fields.get('status') in TERMINAL_JOB_STATUSES:
+            self._published.pop(job_id, None)
+        else:
+            self._published[job_id] = fields
+
+        return {
+            'job_id': job_id,
+            'status': fields.get('status'),
+            'job_type': fields.get('job_type'),
+            'updated_at': fields.get('updated_at'),
+            'data': changed
+        }
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Get publisher metrics"""
+        return {**self.metrics, 'queue_depth': len(self._pending)}
+
+
 # Global Ably service instance
 ably_service = AblyService()
+
+# Global job update publisher instance
+job_update_publisher = JobUpdatePublisher()
@@ -0,0 +1,162 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict
+from fastapi import HTTPException, status
+from ..config import Settings
+
+
+class Overloaded(Exception):
+    """Raised when work is refused; retry_after is in seconds"""
+
+    def __init__(self, reason: str, retry_after: float) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1) -> float:
+        """Spend cost tokens; returns 0 on success, otherwise the seconds until they'd be available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0
+        return (cost - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Decides whether new executions may start.
+
+    Work is shed when the scheduler has too many pending jobs, too many executions are
+    in flight or the event loop is lagging, and per user once their token bucket is empty.
+    The load signals are sampled by a background task so admission itself stays O(1).
+    """
+
+    def __init__(self, max_pending_jobs: int = None, max_inflight: int = None, max_loop_lag_ms: float = None,
+                 user_rate: float = None, user_burst: float = None, retry_after: float = None,
+                 sample_interval: float = 0.25, max_users: int = 100000) -> None:
+        self.max_pending_jobs = max_pending_jobs or Settings.admission_max_pending_jobs
+        self.max_inflight = max_inflight or Settings.admission_max_inflight_executions
+        self.max_loop_lag_ms = max_loop_lag_ms or Settings.admission_max_loop_lag_ms
+        self.user_rate = user_rate or Settings.admission_user_rate
+        self.user_burst = user_burst or Settings.admission_user_burst
+        self.retry_after = retry_after or Settings.admission_retry_after_seconds
+        self.sample_interval = sample_interval
+        self.max_users = max_users
+        # user id -> bucket, least recently used first
+        self.buckets: "OrderedDict[int, TokenBucket]" = OrderedDict()
+        self.pending_jobs = 0
+        self.inflight = 0
+        self.loop_lag_ms = 0.0
+        self.is_running = False
+        self.background_task = None
+        self.metrics: Dict[str, int] = {'admitted': 0, 'rejected_pending_jobs': 0, 'rejected_inflight': 0,
+                                        'rejected_loop_lag': 0, 'rejected_rate_limit': 0}
+
+    def sample(self) -> None:
+        """Read queue depth and in-flight executions from the scheduler and executor"""
+        from .executor import workflow_executor
+        from .scheduler import job_scheduler
+
+        self.pending_jobs = job_scheduler.pending_count()
+        self.inflight = workflow_executor.store.active_count()
+
+    async def start(self) -> None:
+        if self.is_running:
+            return
+        self.is_running = True
+        self.background_task = asyncio.create_task(self._run())
+        print("🚦 Admission control started")
+
+    async def stop(self) -> None:
+        self.is_running = False
+        if self.background_task:
+            self.background_task.cancel()
+            try:
+                await self.background_task
+            except asyncio.CancelledError:
+                pass
+            self.background_task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_event_loop()
+        while self.is_running:
+            started = loop.time()
+            await asyncio.sleep(self.sample_interval)
+            # How much later than asked the loop got back to us
+            self.loop_lag_ms = max(0.0, (loop.time() - started - self.sample_interval) * 1000)
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"Error sampling admission signals: {e}")
+
+    def _bucket(self, user_id: int) -> TokenBucket:
+        bucket = self.buckets.get(user_id)
+        if bucket is None:
+            bucket = self.buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+            while len(self.buckets) > self.max_users:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(user_id)
+        return bucket
+
+    def check_capacity(self, new_executions: int = 1) -> None:
+        """Raise Overloaded if the system can't take new_executions more executions"""
+        if not self.is_running:
+            # No sampler (tests, scripts): read the signals now
+            self.sample()
+        if self.loop_lag_ms >= self.max_loop_lag_ms:
+            self._reject('loop_lag', self.retry_after)
+        if self.pending_jobs + new_executions > self.max_pending_jobs:
+            self._reject('pending_jobs', self.retry_after)
+        if self.inflight + new_executions > self.max_inflight:
+            self._reject('inflight', self.retry_after)
+
+    def admit(self, user_id: int, new_executions: int = 1) -> None:
+        """Admit one request from user_id that starts up to new_executions executions, or raise Overloaded"""
+        self.check_capacity(new_executions)
+        wait = self._bucket(user_id).take()
+        if wait:
+            self._reject('rate_limit', wait)
+        self.reserve(new_executions)
+        self.metrics['admitted'] += 1
+
+    def reserve(self, new_executions: int) -> None:
+        """Count admitted work until the next sample sees it, so a burst can't overshoot the limits"""
+        self.pending_jobs += new_executions
+        self.inflight += new_executions
+
+    def _reject(self, reason: str, retry_after: float) -> None:
+        self.metrics[f'rejected_{reason}'] += 1
+        raise Overloaded(reason, retry_after)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            **self.metrics,
+            'pending_jobs': self.pending_jobs,
+            'inflight': self.inflight,
+            'loop_lag_ms': round(self.loop_lag_ms, 2),
+            'users': len(self.buckets),
+        }
+
+
+def overloaded_response(error: Overloaded) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=f'Too many requests ({error.reason}), please retry later',
+        headers={'Retry-After': str(max(1, math.ceil(error.retry_after)))},
+    )
+
+
+# Global admission controller
+admission_controller = AdmissionController()
@@ -0,0 +1,289 @@
+import asyncio
+import fcntl
+import gzip
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import delete, select
+from ..config import Settings
+from ..models import Execution, ExecutionLog
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available
+    zstandard = None
+
+INDEX_SUFFIX = '.idx.json'
+# Held by the process that is archiving, so replicas sharing the directory take turns
+LOCK_FILE = '.archiver.lock'
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor().compress(data)
+    return gzip.compress(data)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _history_key(item: Dict[str, Any]) -> Tuple[str, int]:
+    return item['execution']['started_at'], item['execution']['id']
+
+
+class ExecutionArchive:
+    """Moves old executions and their logs into compressed, append-only NDJSON segments.
+
+    Each segment stores one compressed block per workflow, newest execution first. Its
+    sidecar index records where every block starts and the time range it covers, so a
+    history read only decompresses the blocks of the workflow it asks for. Only one
+    process archives at a time, and indexes written by other processes are picked up
+    when the directory changes. All file I/O is blocking; call it from an executor.
+    """
+
+    def __init__(self, archive_dir: str = None, archive_after_days: int = None, batch_size: int = None,
+                 interval: float = None, codec: str = None, session_factory=None) -> None:
+        self.archive_dir = archive_dir or Settings.archive_dir
+        self.archive_after_days = archive_after_days if archive_after_days is not None else Settings.archive_after_days
+        self.batch_size = batch_size or Settings.archive_batch_size
+        self.interval = interval if interval is not None else Settings.archive_interval_minutes * 60
+        self.codec = codec or ('zstd' if zstandard else 'gzip')
+        self.session_factory = session_factory
+        # segment name -> index, loaded lazily and reloaded when the directory's mtime changes
+        self._indexes: Optional[Dict[str, Dict[str, Any]]] = None
+        self._indexes_mtime: Optional[int] = None
+        self._indexes_lock = threading.Lock()
+        self.is_running = False
+        self.background_task = None
+        self.metrics: Dict[str, Any] = {'runs': 0, 'archived': 0, 'segments_written': 0, 'segments_read': 0}
+
+    # Background archiving
+
+    async def start(self) -> None:
+        if self.is_running or self.archive_after_days <= 0:
+            return
+        self.is_running = True
+        self.background_task = asyncio.create_task(self._run())
+        print(f"🗄️  Execution archiver started ({self.archive_after_days} days)")
+
+    async def stop(self) -> None:
+        self.is_running = False
+        if self.background_task:
+            self.background_task.cancel()
+            try:
+                await self.background_task
+            except asyncio.CancelledError:
+                pass
+            self.background_task = None
+
+    async def _run(self) -> None:
+        while self.is_running:
+            try:
+                await self.archive_once()
+            except Exception as e:
+                print(f"Error in execution archiver: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def archive_once(self, now: Optional[datetime] = None) -> int:
+        """Archive every finished execution older than the cutoff, one segment per batch"""
+        cutoff = (now or datetime.utcnow()) - timedelta(days=self.archive_after_days)
+        loop = asyncio.get_event_loop()
+        total = 0
+        while True:
+            archived = await loop.run_in_executor(None, self._archive_batch, cutoff)
+            total += archived
+            if archived < self.batch_size:
+                break
+        self.metrics['runs'] += 1
+        self.metrics['archived'] += total
+        return total
+
+    def _session(self):
+        if self.session_factory is None:
+            from ..db import SessionLocal
+            self.session_factory = SessionLocal
+        return self.session_factory()
+
+    @contextmanager
+    def _exclusive(self):
+        """Yields whether this process got the archiver lock (without waiting for it)"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        with open(os.path.join(self.archive_dir, LOCK_FILE), 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _archive_batch(self, cutoff: datetime) -> int:
+        with self._exclusive() as acquired:
+            if not acquired:
+                # Another process is archiving
+                return 0
+            return self._archive_locked_batch(cutoff)
+
+    def _archive_locked_batch(self, cutoff: datetime) -> int:
+        db = self._session()
+        try:
+            # SKIP LOCKED keeps archivers that don't share the lock file (other hosts) off the same rows
+            executions = db.execute(
+                select(Execution)
+                .where(Execution.started_at < cutoff, Execution.status.in_(FINISHED_STATUSES))
+                .order_by(Execution.started_at, Execution.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            if not executions:
+                return 0
+
+            ids = [ex.id for ex in executions]
+            logs_by_execution: Dict[int, List[Dict[str, Any]]] = {}
+            for log in db.execute(select(ExecutionLog).where(ExecutionLog.execution_id.in_(ids))
+                                  .order_by(ExecutionLog.execution_id, ExecutionLog.timestamp)).scalars():
+                logs_by_execution.setdefault(log.execution_id, []).append({
+                    'id': log.id,
+                    'execution_id': log.execution_id,
+                    'node_id': log.node_id,
+                    'status': log.status,
+                    'message': log.message,
+                    'timestamp': log.timestamp.isoformat(),
+                })
+
+            items_by_workflow: Dict[int, List[Dict[str, Any]]] = {}
+            for ex in executions:
+                items_by_workflow.setdefault(ex.workflow_id, []).append({
+                    'execution': {
+                        'id': ex.id,
+                        'workflow_id': ex.workflow_id,
+                        'status': ex.status,
+                        'started_at': ex.started_at.isoformat() if ex.started_at else None,
+                        'finished_at': ex.finished_at.isoformat() if ex.finished_at else None,
+                        'trigger_data': ex.trigger_data,
+                    },
+                    'logs': logs_by_execution.get(ex.id, []),
+                })
+
+            # The segment must be durable before the rows it holds are deleted
+            self._write_segment(items_by_workflow)
+            db.execute(delete(ExecutionLog).where(ExecutionLog.execution_id.in_(ids)))
+            db.execute(delete(Execution).where(Execution.id.in_(ids)))
+            db.commit()
+            return len(executions)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _write_segment(self, items_by_workflow: Dict[int, List[Dict[str, Any]]]) -> str:
+        os.makedirs(self.archive_dir, exist_ok=True)
+        name = f"segment-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.ndjson.{self.codec}"
+        index = {'segment': name, 'codec': self.codec, 'created_at': datetime.utcnow().isoformat(), 'workflows': {}}
+
+        offset = 0
+        tmp_path = os.path.join(self.archive_dir, name + '.tmp')
+        with open(tmp_path, 'wb') as segment:
+            for workflow_id, items in sorted(items_by_workflow.items()):
+                items.sort(key=_history_key, reverse=True)
+                block = _compress(self.codec, ''.join(json.dumps(item, default=str) + '\n' for item in items).encode())
+                segment.write(block)
+                index['workflows'][str(workflow_id)] = {
+                    'offset': offset,
+                    'length': len(block),
+                    'count': len(items),
+                    'min_started_at': items[-1]['execution']['started_at'],
+                    'max_started_at': items[0]['execution']['started_at'],
+                }
+                offset += len(block)
+            segment.flush()
+            os.fsync(segment.fileno())
+        os.replace(tmp_path, os.path.join(self.archive_dir, name))
+
+        index_path = os.path.join(self.archive_dir, name + INDEX_SUFFIX)
+        with open(index_path + '.tmp', 'w') as f:
+            json.dump(index, f)
+        os.replace(index_path + '.tmp', index_path)
+
+        with self._indexes_lock:
+            if self._indexes is not None:
+                self._indexes[name] = index
+        self.metrics['segments_written'] += 1
+        return name
+
+    # Read path
+
+    def _load_indexes(self) -> Dict[str, Dict[str, Any]]:
+        """Segment indexes, re-listed whenever a segment was added or removed (by any process)"""
+        try:
+            mtime = os.stat(self.archive_dir).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        with self._indexes_lock:
+            if self._indexes is not None and mtime == self._indexes_mtime:
+                return self._indexes
+            indexes = {}
+            known = self._indexes or {}
+            if mtime is not None:
+                for filename in os.listdir(self.archive_dir):
+                    if not filename.endswith(INDEX_SUFFIX):
+                        continue
+                    segment = filename[:-len(INDEX_SUFFIX)]
+                    if segment in known:
+                        indexes[segment] = known[segment]
+                        continue
+                    with open(os.path.join(self.archive_dir, filename)) as f:
+                        index = json.load(f)
+                    indexes[index['segment']] = index
+            self._indexes, self._indexes_mtime = indexes, mtime
+            return indexes
+
+    def has_workflow(self, workflow_id: int) -> bool:
+        return any(str(workflow_id) in index['workflows'] for index in self._load_indexes().values())
+
+    def read_history(self, workflow_id: int, limit: int, before: Optional[Tuple[datetime, int]] = None) -> List[Dict[str, Any]]:
+        """Archived executions of a workflow, newest first, strictly older than the (started_at, id) cursor"""
+        before_key = (before[0].isoformat(), before[1]) if before else None
+        blocks = []
+        for index in self._load_indexes().values():
+            block = index['workflows'].get(str(workflow_id))
+            if block and (before_key is None or block['min_started_at'] <= before_key[0]):
+                blocks.append((block['max_started_at'], index, block))
+        blocks.sort(key=lambda entry: entry[0], reverse=True)
+
+        results: List[Dict[str, Any]] = []
+        for max_started_at, index, block in blocks:
+            # Blocks are visited newest first; once we have enough items newer than this block, stop
+            if len(results) >= limit and _history_key(results[limit - 1])[0] > max_started_at:
+                break
+            for item in self._read_block(index, block):
+                if before_key is None or _history_key(item) < before_key:
+                    results.append(item)
+            results.sort(key=_history_key, reverse=True)
+            del results[limit:]
+        return results
+
+    def _read_block(self, index: Dict[str, Any], block: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with open(os.path.join(self.archive_dir, index['segment']), 'rb') as segment:
+            segment.seek(block['offset'])
+            data = segment.read(block['length'])
+        self.metrics['segments_read'] += 1
+        return [json.loads(line) for line in _decompress(index['codec'], data).decode().splitlines() if line]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**self.metrics, 'segments': len(self._load_indexes()), 'codec': self.codec}
+
+
+# Global execution archive instance
+execution_archive = ExecutionArchive()
@@ -1,27 +1,303 @@
-import json
-from typing import Any, Optional
+import asyncio
+import math
+import random
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
 import redis
+import redis.asyncio as aioredis
 from ..config import Settings
+from ..utils.serialization import dumps_bytes, loads
+
+
+def _new_metrics() -> Dict[str, Any]:
+    return {
+        'hits': 0,
+        'misses': 0,
+        'negative_hits': 0,
+        'loads': 0,
+        'load_errors': 0,
+        'early_refreshes': 0,
+        'lock_waits': 0,
+        'load_ms_total': 0.0,
+        'load_ms_max': 0.0,
+    }
+
+
+def _summarize(metrics: Dict[str, Any]) -> Dict[str, Any]:
+    load_count = metrics['loads']
+    return {**metrics, 'load_ms_avg': round(metrics['load_ms_total'] / load_count, 2) if load_count else 0.0}
+
+
+def _decode(data: Optional[str]) -> Optional[Any]:
+    if not data:
+        return None
+    try:
+        return loads(data)
+    except Exception:
+        return None
+
+
+def _decode_entry(data: Optional[str]) -> Optional[Dict[str, Any]]:
+    entry = _decode(data)
+    # Only envelopes written by get_or_load carry refresh metadata
+    return entry if isinstance(entry, dict) and 'x' in entry else None
+
+
+def _encode_entry(value: Any, delta: float, ttl: int) -> bytes:
+    entry = {'v': value, 'd': delta, 'x': time.time() + ttl}
+    if value is None:
+        entry['n'] = True
+    return dumps_bytes(entry)
+
+
+def _refresh_early(entry: Dict[str, Any], beta: float) -> bool:
+    # XFetch: the slower the value is to compute, the earlier it gets refreshed
+    delta = entry.get('d', 0)
+    if not delta or entry.get('n'):
+        return False
+    return time.time() - delta * beta * math.log(random.random() or 1e-12) >= entry['x']
+
+
+def _record_load(metrics: Dict[str, Any], delta: float) -> None:
+    load_ms = round(delta * 1000, 2)
+    metrics['loads'] += 1
+    metrics['load_ms_total'] += load_ms
+    metrics['load_ms_max'] = max(metrics['load_ms_max'], load_ms)
+
+
+def _count_hit(metrics: Dict[str, Any], entry: Dict[str, Any]) -> Optional[Any]:
+    if entry.get('n'):
+        metrics['negative_hits'] += 1
+        return None
+    metrics['hits'] += 1
+    return entry['v']
 
 
 class RedisCache:
-    def __init__(self) -> None:
-        self.client = redis.Redis.from_url(Settings.redis_url, decode_responses=True)
+    def __init__(self, client=None) -> None:
+        self.client = client or redis.Redis.from_url(Settings.redis_url, decode_responses=True)
+        self.metrics: Dict[str, int] = {'hits': 0, 'misses': 0}
 
     def get_json(self, key: str) -> Optional[Any]:
-        data = self.client.get(key)
-        if not data:
-            return None
-        try:
-            return json.loads(data)
-        except Exception:
-            return None
+        value = _decode(self.client.get(key))
+        self.metrics['hits' if value is not None else 'misses'] += 1
+        return value
 
     def set_json(self, key: str, value: Any, ex_seconds: int | None = 3600) -> None:
-        self.client.set(key, json.dumps(value), ex=ex_seconds)
+        self.client.set(key, dumps_bytes(value), ex=ex_seconds)
 
     def delete(self, key: str) -> None:
         self.client.delete(key)
 
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Values of every key that is cached, fetched with one MGET"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        found = {key: value for key, value in zip(keys, map(_decode, self.client.mget(keys))) if value is not None}
+        self.metrics['hits'] += len(found)
+        self.metrics['misses'] += len(keys) - len(found)
+        return found
+
+    def set_many(self, values: Dict[str, Any], ex_seconds: int | None = 3600) -> None:
+        """Store several values in one pipelined round trip"""
+        if not values:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in values.items():
+            pipe.set(key, dumps_bytes(value), ex=ex_seconds)
+        pipe.execute()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return dict(self.metrics)
+
+
+def create_async_client(redis_url: str = None) -> aioredis.Redis:
+    """redis.asyncio client on an explicitly sized, health-checked connection pool"""
+    pool = aioredis.ConnectionPool.from_url(
+        redis_url or Settings.redis_url,
+        max_connections=Settings.redis_max_connections,
+        health_check_interval=Settings.redis_health_check_interval,
+        socket_timeout=Settings.redis_socket_timeout,
+        socket_connect_timeout=Settings.redis_socket_timeout,
+        decode_responses=True,
+    )
+    return aioredis.Redis(connection_pool=pool)
+
+
+class AsyncRedisCache:
+    """The RedisCache API on redis.asyncio, so cache calls never block the event loop, plus stampede-protected loading"""
+
+    def __init__(self, client=None, lock_timeout_ms: int = None, negative_ttl: int = None, beta: float = None) -> None:
+        self.client = client or create_async_client()
+        self.lock_timeout_ms = lock_timeout_ms or Settings.cache_lock_timeout_ms
+        self.negative_ttl = negative_ttl or Settings.cache_negative_ttl_seconds
+        self.beta = beta if beta is not None else Settings.cache_early_refresh_beta
+        # Tasks loading a key in this process; later callers await the same task
+        self._loading: Dict[str, asyncio.Task] = {}
+        self.metrics: Dict[str, Any] = _new_metrics()
+
+    async def get_json(self, key: str) -> Optional[Any]:
+        value = _decode(await self.client.get(key))
+        self.metrics['hits' if value is not None else 'misses'] += 1
+        return value
+
+    async def set_json(self, key: str, value: Any, ex_seconds: int | None = 3600) -> None:
+        await self.client.set(key, dumps_bytes(value), ex=ex_seconds)
 
+    async def delete(self, key: str) -> None:
+        await self.client.delete(key)
+
+    async def publish(self, channel: str, message: Any) -> None:
+        await self.client.publish(channel, dumps_bytes(message))
+
+    def pipeline(self):
+        """Non-transactional pipeline; use as `async with cache.pipeline() as pipe`"""
+        return self.client.pipeline(transaction=False)
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Values of every key that is cached, fetched with one MGET"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        found = {key: value for key, value in zip(keys, map(_decode, await self.client.mget(keys))) if value is not None}
+        self.metrics['hits'] += len(found)
+        self.metrics['misses'] += len(keys) - len(found)
+        return found
+
+    async def set_many(self, values: Dict[str, Any], ex_seconds: int | None = 3600) -> None:
+        """Store several values in one pipelined round trip"""
+        if not values:
+            return
+        async with self.pipeline() as pipe:
+            for key, value in values.items():
+                pipe.set(key, dumps_bytes(value), ex=ex_seconds)
+            await pipe.execute()
+
+    async def get_many_loaded(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """get_many for keys written by get_or_load or set_many_loaded; cached misses (None) are left out"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        entries = zip(keys, map(_decode_entry, await self.client.mget(keys)))
+        found = {key: entry['v'] for key, entry in entries if entry is not None and not entry.get('n')}
+        self.metrics['hits'] += len(found)
+        self.metrics['misses'] += len(keys) - len(found)
+        return found
+
+    async def set_many_loaded(self, values: Dict[str, Any], ex_seconds: int = 3600) -> None:
+        """Store values the way get_or_load does, e.g. after a write or a batch load"""
+        if not values:
+            return
+        async with self.pipeline() as pipe:
+            for key, value in values.items():
+                pipe.set(key, _encode_entry(value, 0, ex_seconds), ex=ex_seconds)
+            await pipe.execute()
+
+    # Stampede-protected loading
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]], ex_seconds: int = 3600,
+                          negative_ttl: int = None) -> Optional[Any]:
+        """Read-through get: on a miss exactly one caller across all workers awaits loader.
+
+        Entries are refreshed probabilistically before they expire (XFetch), so a hot
+        key is recomputed by one caller while everyone else keeps reading it. A loader
+        returning None is cached for negative_ttl seconds.
+        """
+        entry = _decode_entry(await self.client.get(key))
+        if entry is not None:
+            if not _refresh_early(entry, self.beta) or key in self._loading:
+                return _count_hit(self.metrics, entry)
+            token = await self._acquire_redis_lock(key)
+            if token is None:
+                return _count_hit(self.metrics, entry)
+            self.metrics['early_refreshes'] += 1
+            return await self._load_locked(key, loader, ex_seconds, negative_ttl, token)
+
+        self.metrics['misses'] += 1
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load_or_wait(key, loader, ex_seconds, negative_ttl))
+            self._loading[key] = task
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        # shield: one cancelled caller must not cancel the load everyone else awaits
+        return await asyncio.shield(task)
+
+    async def _load_or_wait(self, key: str, loader, ex_seconds: int, negative_ttl: Optional[int]) -> Optional[Any]:
+        token = await self._acquire_redis_lock(key)
+        if token is None:
+            # Another worker holds the lock: wait for its result instead of loading too
+            entry = await self._wait_for_entry(key)
+            if entry is not None:
+                return _count_hit(self.metrics, entry)
+        return await self._load_locked(key, loader, ex_seconds, negative_ttl, token)
+
+    async def _load_locked(self, key: str, loader, ex_seconds: int, negative_ttl: Optional[int], token: Optional[str]) -> Optional[Any]:
+        started = time.perf_counter()
+        try:
+            value = await loader()
+        except Exception:
+            self.metrics['load_errors'] += 1
+            if token is not None:
+                await self._release_redis_lock(key, token)
+            raise
+        delta = time.perf_counter() - started
+        _record_load(self.metrics, delta)
+
+        ttl = ex_seconds if value is not None else (negative_ttl or self.negative_ttl)
+        async with self.pipeline() as pipe:
+            pipe.set(key, _encode_entry(value, delta, ttl), ex=ttl)
+            await pipe.execute()
+        if token is not None:
+            await self._release_redis_lock(key, token)
+        return value
+
+    async def _acquire_redis_lock(self, key: str) -> Optional[str]:
+        token = uuid.uuid4().hex
+        if await self.client.set(f"lock:{key}", token, nx=True, px=self.lock_timeout_ms):
+            return token
+        return None
+
+    async def _release_redis_lock(self, key: str, token: str) -> None:
+        if await self.client.get(f"lock:{key}") == token:
+            await self.client.delete(f"lock:{key}")
+
+    async def _wait_for_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        self.metrics['lock_waits'] += 1
+        deadline = time.monotonic() + self.lock_timeout_ms / 1000
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+            async with self.pipeline() as pipe:
+                pipe.get(key)
+                pipe.exists(f"lock:{key}")
+                data, locked = await pipe.execute()
+            entry = _decode_entry(data)
+            if entry is not None or not locked:
+                return entry
+        return _decode_entry(await self.client.get(key))
+
+    async def ping(self) -> bool:
+        try:
+            return await self.client.ping()
+        except Exception:
+            return False
+
+    async def close(self) -> None:
+        await self.client.aclose()
+        await self.client.connection_pool.disconnect()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        pool = self.client.connection_pool
+        return {
+            **_summarize(self.metrics),
+            'pool_max_connections': getattr(pool, 'max_connections', None),
+            'pool_in_use': len(getattr(pool, '_in_use_connections', ())),
+        }
+
+
+# Sync client for code running outside the event loop
 cache = RedisCache()
+
+# Pooled async client used by the services and routers
+async_cache = AsyncRedisCache()
@@ -0,0 +1,291 @@
+import asyncio
+import os
+import socket
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from .cache import async_cache
+from ..config import Settings
+from ..utils.serialization import dumps_bytes, loads
+
+INFLIGHT_KEY = "checkpoints:inflight"
+JOBS_KEY = "checkpoints:jobs"
+# Pending jobs of these types hold only data, so they can be restored after a restart
+RESTORABLE_JOB_TYPES = ('email_send',)
+
+
+def checkpoint_key(execution_id: str) -> str:
+    return f"checkpoint:{execution_id}"
+
+
+def steps_key(execution_id: str) -> str:
+    return f"checkpoint:{execution_id}:steps"
+
+
+def claim_key(execution_id: str) -> str:
+    return f"checkpoint:{execution_id}:claim"
+
+
+def heartbeat_key(worker_id: str) -> str:
+    return f"checkpoints:worker:{worker_id}"
+
+
+def process_worker_id() -> str:
+    """An id no other process shares, not even a sibling worker forked on the same host"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class ExecutionCheckpointer:
+    """Checkpoints unfinished executions in Redis so a restart resumes them.
+
+    An execution's initial state is written once when it is created and every finished
+    step appends a small delta (the step, its result and the nodes it queued), from which
+    the context and the frontier are rebuilt. Unfinished executions, and pending jobs
+    that hold only data, are listed in hashes by owning worker; at startup, a worker
+    resumes its own, and at startup and periodically after, those of workers whose
+    heartbeat has expired. Every resumed execution is claimed first, so only one worker
+    runs it. Recovery reads only in-flight work, never history. A step interrupted by the
+    restart runs again.
+    """
+
+    def __init__(self, redis_cache=None, worker_id: str = None, enabled: bool = None, ttl: int = None,
+                 heartbeat_seconds: int = None, recovery_interval: int = None, batch_size: int = 500) -> None:
+        self.redis = redis_cache or async_cache
+        self._worker_id = worker_id or Settings.worker_id
+        self._process_id: Optional[Tuple[int, str]] = None
+        self.enabled = Settings.execution_checkpoints if enabled is None else enabled
+        self.ttl = ttl or Settings.checkpoint_ttl_seconds
+        self.heartbeat_seconds = heartbeat_seconds or Settings.checkpoint_heartbeat_seconds
+        self.recovery_interval = Settings.checkpoint_recovery_interval_seconds if recovery_interval is None else recovery_interval
+        self._last_recovery = 0.0
+        self.batch_size = batch_size
+        self.is_running = False
+        self.background_task = None
+        self.metrics: Dict[str, int] = {'started': 0, 'steps': 0, 'finished': 0, 'jobs_saved': 0,
+                                        'recovered_executions': 0, 'recovered_jobs': 0, 'redis_errors': 0}
+
+    @property
+    def worker_id(self) -> str:
+        """WORKER_ID if set, else an id of this process, derived again after a fork"""
+        if self._worker_id:
+            return self._worker_id
+        if self._process_id is None or self._process_id[0] != os.getpid():
+            self._process_id = (os.getpid(), process_worker_id())
+        return self._process_id[1]
+
+    # Writes
+
+    async def begin(self, executions: List[Dict[str, Any]]) -> None:
+        """Checkpoint the initial state of new executions, in one pipelined round trip"""
+        if not self.enabled or not executions:
+            return
+        try:
+            async with self.redis.pipeline() as pipe:
+                for execution in executions:
+                    state = {key: value for key, value in execution.items() if key not in ('definition', 'resume')}
+                    pipe.set(checkpoint_key(execution['id']), dumps_bytes(state), ex=self.ttl)
+                pipe.hset(INFLIGHT_KEY, mapping={execution['id']: self.worker_id for execution in executions})
+                await pipe.execute()
+            self.metrics['started'] += len(executions)
+        except Exception:
+            self.metrics['redis_errors'] += 1
+
+    async def record_step(self, execution_id: str, step: Dict[str, Any], result: Dict[str, Any], next_nodes: List[str]) -> None:
+        """Append the delta of one finished step"""
+        if not self.enabled:
+            return
+        try:
+            async with self.redis.pipeline() as pipe:
+                pipe.rpush(steps_key(execution_id), dumps_bytes({'step': step, 'result': result, 'next': next_nodes}))
+                pipe.expire(steps_key(execution_id), self.ttl)
+                await pipe.execute()
+            self.metrics['steps'] += 1
+        except Exception:
+            self.metrics['redis_errors'] += 1
+
+    async def finish(self, execution_id: str) -> None:
+        """Drop the checkpoint of a finished execution"""
+        if not self.enabled:
+            return
+        try:
+            async with self.redis.pipeline() as pipe:
+                pipe.delete(checkpoint_key(execution_id), steps_key(execution_id), claim_key(execution_id))
+                pipe.hdel(INFLIGHT_KEY, execution_id)
+                await pipe.execute()
+            self.metrics['finished'] += 1
+        except Exception:
+            self.metrics['redis_errors'] += 1
+
+    async def save_job(self, job: Dict[str, Any]) -> None:
+        if not self.enabled or job['job_type'] not in RESTORABLE_JOB_TYPES:
+            return
+        try:
+            await self.redis.client.hset(JOBS_KEY, job['id'], dumps_bytes({'owner': self.worker_id, 'job': job}))
+            self.metrics['jobs_saved'] += 1
+        except Exception:
+            self.metrics['redis_errors'] += 1
+
+    async def drop_job(self, job: Dict[str, Any]) -> None:
+        if not self.enabled or job['job_type'] not in RESTORABLE_JOB_TYPES:
+            return
+        try:
+            await self.redis.client.hdel(JOBS_KEY, job['id'])
+        except Exception:
+            self.metrics['redis_errors'] += 1
+
+    # Recovery
+
+    async def _orphaned(self, owners: Dict[str, str], include_own: bool) -> List[str]:
+        """Keys owned by workers that stopped sending heartbeats, and by this worker's previous run if include_own"""
+        if not include_own:
+            owners = {key: owner for key, owner in owners.items() if owner != self.worker_id}
+        others = sorted({owner for owner in owners.values() if owner != self.worker_id})
+        alive = set()
+        if others:
+            async with self.redis.pipeline() as pipe:
+                for owner in others:
+                    pipe.exists(heartbeat_key(owner))
+                alive = {owner for owner, exists in zip(others, await pipe.execute()) if exists}
+        return [key for key, owner in owners.items() if owner not in alive]
+
+    async def _claim(self, ids: List[str]) -> List[str]:
+        """The ids (of executions or jobs) no other recovering worker got first; a claim left by this worker's previous run still counts"""
+        async with self.redis.pipeline() as pipe:
+            for item_id in ids:
+                pipe.set(claim_key(item_id), self.worker_id, nx=True, ex=self.heartbeat_seconds * 3)
+            claimed = await pipe.execute()
+        taken = [item_id for item_id, ok in zip(ids, claimed) if not ok]
+        if not taken:
+            return list(ids)
+        async with self.redis.pipeline() as pipe:
+            for item_id in taken:
+                pipe.get(claim_key(item_id))
+            holders = dict(zip(taken, await pipe.execute()))
+        return [item_id for item_id in ids if holders.get(item_id, self.worker_id) == self.worker_id]
+
+    async def _load(self, execution_ids: List[str]) -> List[Dict[str, Any]]:
+        async with self.redis.pipeline() as pipe:
+            for execution_id in execution_ids:
+                pipe.get(checkpoint_key(execution_id))
+                pipe.lrange(steps_key(execution_id), 0, -1)
+            replies = await pipe.execute()
+        executions = []
+        for index in range(0, len(replies), 2):
+            state, deltas = replies[index], replies[index + 1]
+            if state is None:
+                continue
+            execution = loads(state)
+            # Replayed by the executor before it runs the remaining nodes
+            execution['resume'] = [loads(delta) for delta in deltas]
+            executions.append(execution)
+        return executions
+
+    async def recover_executions(self, include_own: bool = True) -> int:
+        """Register and reschedule every orphaned unfinished execution"""
+        from .executor import workflow_executor
+        from .scheduler import job_scheduler
+
+        owners = await self.redis.client.hgetall(INFLIGHT_KEY)
+        execution_ids = await self._orphaned(owners, include_own)
+        recovered = 0
+        for start in range(0, len(execution_ids), self.batch_size):
+            claimed = await self._claim(execution_ids[start:start + self.batch_size])
+            executions = await self._load(claimed) if claimed else []
+            expired = set(claimed) - {execution['id'] for execution in executions}
+            if expired:
+                await self.redis.client.hdel(INFLIGHT_KEY, *expired)
+            if not executions:
+                continue
+            await self.redis.client.hset(INFLIGHT_KEY, mapping={execution['id']: self.worker_id for execution in executions})
+            groups: Dict[Tuple[int, Optional[str], Optional[str]], List[str]] = {}
+            for execution in executions:
+                execution['status'] = 'running'
+                execution['steps'] = []
+                workflow_executor.store.add(execution)
+                groups.setdefault((execution['workflow_id'], execution.get('user_id'), execution.get('priority')), []).append(execution['id'])
+            for (workflow_id, user_id, priority), ids in groups.items():
+                await job_scheduler.schedule_workflow_executions(workflow_id, ids, user_id=user_id, priority=priority)
+            recovered += len(executions)
+        self.metrics['recovered_executions'] += recovered
+        return recovered
+
+    async def recover_jobs(self, include_own: bool = True) -> int:
+        """Re-queue orphaned pending jobs"""
+        from .scheduler import job_scheduler
+
+        entries = {job_id: loads(data) for job_id, data in (await self.redis.client.hgetall(JOBS_KEY)).items()}
+        job_ids = await self._orphaned({job_id: entry['owner'] for job_id, entry in entries.items()}, include_own)
+        if job_ids:
+            job_ids = await self._claim(job_ids)
+        jobs = [entries[job_id]['job'] for job_id in job_ids]
+        if jobs:
+            await self.redis.client.hset(JOBS_KEY, mapping={job['id']: dumps_bytes({'owner': self.worker_id, 'job': job}) for job in jobs})
+        job_scheduler.restore_jobs(jobs)
+        self.metrics['recovered_jobs'] += len(jobs)
+        return len(jobs)
+
+    async def recover(self, include_own: bool = True) -> None:
+        """Resume orphaned work; this worker's own only at startup, when it is left over from its previous run"""
+        if not self.enabled:
+            return
+        self._last_recovery = time.monotonic()
+        try:
+            executions = await self.recover_executions(include_own)
+            jobs = await self.recover_jobs(include_own)
+        except Exception as e:
+            self.metrics['redis_errors'] += 1
+            print(f"⚠️ Execution recovery failed: {e}")
+            return
+        if executions or jobs:
+            print(f"♻️ Resumed {executions} executions and {jobs} pending jobs")
+
+    # Lifecycle
+
+    async def _heartbeat(self) -> None:
+        try:
+            await self.redis.client.set(heartbeat_key(self.worker_id), 1, ex=self.heartbeat_seconds * 3)
+        except Exception:
+            self.metrics['redis_errors'] += 1
+
+    async def start(self) -> None:
+        """Announce this worker, then resume what it (or a dead worker) left unfinished"""
+        if not self.enabled or self.is_running:
+            return
+        self.is_running = True
+        await self._heartbeat()
+        self.background_task = asyncio.create_task(self._run())
+        await self.recover()
+        print(f"💾 Execution checkpoints enabled (worker {self.worker_id})")
+
+    async def stop(self) -> None:
+        # Checkpoints stay behind for the next start, or for whichever worker notices the heartbeat is gone
+        self.is_running = False
+        if self.background_task:
+            self.background_task.cancel()
+            try:
+                await self.background_task
+            except asyncio.CancelledError:
+                pass
+            self.background_task = None
+        try:
+            await self.redis.client.delete(heartbeat_key(self.worker_id))
+        except Exception:
+            self.metrics['redis_errors'] += 1
+
+    async def _run(self) -> None:
+        while self.is_running:
+            await asyncio.sleep(self.heartbeat_seconds)
+            await self._tick()
+
+    async def _tick(self) -> None:
+        """Refresh the heartbeat and, every recovery interval, take over work of workers that died since"""
+        await self._heartbeat()
+        if time.monotonic() - self._last_recovery >= self.recovery_interval:
+            await self.recover(include_own=False)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**self.metrics, 'enabled': self.enabled, 'worker_id': self.worker_id}
+
+
+# Global execution checkpointer
+execution_checkpointer = ExecutionCheckpointer()
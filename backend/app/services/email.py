@@ -1,12 +1,13 @@
+import asyncio
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Dict, Any
+from typing import Dict, Any, List
 import os
-import json
 import uuid
 from datetime import datetime
-from .cache import cache
+from .cache import async_cache
+from ..utils.serialization import dumps_bytes
 
 
 class EmailService:
@@ -31,10 +32,6 @@ class EmailService:
             'attempts': 0
         }
         
-        # Store email data in Redis
-        cache.set_json(f"email:{email_id}", email_data, ex_seconds=3600)
-        
-        # Publish email event to Redis
         email_event = {
             'type': 'email_send_attempt',
             'email_id': email_id,
@@ -45,30 +42,22 @@ class EmailService:
             'timestamp': datetime.utcnow().isoformat()
         }
         
+        # Store email data and publish the attempt in one Redis round trip
+        await self._record(email_data, email_event)
+        
         try:
-            # Publish to Redis pub/sub
-            cache.client.publish('email_events', json.dumps(email_event))
-            
             msg = MIMEMultipart()
             msg['From'] = self.from_email
             msg['To'] = to_email
             msg['Subject'] = subject
             msg.attach(MIMEText(body, 'html'))
 
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            if self.smtp_username and self.smtp_password:
-                server.login(self.smtp_username, self.smtp_password)
-            
-            server.send_message(msg)
-            server.quit()
+            # smtplib blocks, so it runs off the event loop
+            await asyncio.get_event_loop().run_in_executor(None, self._send_smtp, msg)
             
             # Update email status to success
             email_data['status'] = 'sent'
             email_data['sent_at'] = datetime.utcnow().isoformat()
-            cache.set_json(f"email:{email_id}", email_data, ex_seconds=3600)
-            
-            # Publish success event
             success_event = {
                 'type': 'email_sent',
                 'email_id': email_id,
@@ -78,7 +67,7 @@ class EmailService:
                 'step_id': step_id,
                 'timestamp': datetime.utcnow().isoformat()
             }
-            cache.client.publish('email_events', json.dumps(success_event))
+            await self._record(email_data, success_event)
             
             return {
                 'success': True,
@@ -91,9 +80,6 @@ class EmailService:
             email_data['status'] = 'failed'
             email_data['error'] = str(e)
             email_data['attempts'] = email_data.get('attempts', 0) + 1
-            cache.set_json(f"email:{email_id}", email_data, ex_seconds=3600)
-            
-            # Publish failure event
             failure_event = {
                 'type': 'email_failed',
                 'email_id': email_id,
@@ -104,7 +90,7 @@ class EmailService:
                 'error': str(e),
                 'timestamp': datetime.utcnow().isoformat()
             }
-            cache.client.publish('email_events', json.dumps(failure_event))
+            await self._record(email_data, failure_event)
             
             print(f"Email send failed: {e}")
             return {
@@ -113,13 +99,34 @@ class EmailService:
                 'error': str(e)
             }
 
-    def get_email_status(self, email_id: str) -> Dict[str, Any]:
+    def _send_smtp(self, msg: MIMEMultipart) -> None:
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        server.starttls()
+        if self.smtp_username and self.smtp_password:
+            server.login(self.smtp_username, self.smtp_password)
+        
+        server.send_message(msg)
+        server.quit()
+
+    async def _record(self, email_data: Dict[str, Any], event: Dict[str, Any]) -> None:
+        """Store the email's status and publish the event in one pipelined round trip"""
+        async with async_cache.pipeline() as pipe:
+            pipe.set(f"email:{email_data['id']}", dumps_bytes(email_data), ex=3600)
+            pipe.publish('email_events', dumps_bytes(event))
+            await pipe.execute()
+
+    async def get_email_status(self, email_id: str) -> Dict[str, Any]:
         """Get email status from Redis"""
-        email_data = cache.get_json(f"email:{email_id}")
+        email_data = await async_cache.get_json(f"email:{email_id}")
         if not email_data:
             return {'status': 'not_found'}
         return email_data
 
+    async def get_email_statuses(self, email_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Get the status of several emails in one Redis round trip"""
+        found = await async_cache.get_many(f"email:{email_id}" for email_id in email_ids)
+        return {email_id: found.get(f"email:{email_id}", {'status': 'not_found'}) for email_id in email_ids}
+
     def get_emails_by_execution(self, execution_id: str) -> list:
         """Get all emails for a specific execution"""
         # This is a simplified implementation
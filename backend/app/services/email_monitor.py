@@ -1,7 +1,7 @@
-import json
 import asyncio
 from typing import Dict, Any, Callable
-from .cache import cache
+from .cache import async_cache
+from ..utils.serialization import loads
 
 
 class EmailMonitor:
@@ -18,24 +18,21 @@ class EmailMonitor:
         self.is_running = True
         
         try:
-            # Use the same Redis client from cache
-            self.pubsub = cache.client.pubsub()
+            # Pub/sub holds its own connection from the shared async pool
+            self.pubsub = async_cache.client.pubsub()
             
             # Subscribe to the channel
-            self.pubsub.subscribe('email_events')
+            await self.pubsub.subscribe('email_events')
             
             print("📧 Email monitor started - listening for events...")
             
             # Process messages in a non-blocking way
             while self.is_running:
                 try:
-                    # Use get_message with timeout to prevent blocking
-                    message = self.pubsub.get_message(timeout=1.0)
+                    # Waits up to a second for a message without blocking the event loop
+                    message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
                     if message and message['type'] == 'message':
-                        await self._handle_email_event(json.loads(message['data']))
-                    
-                    # Small delay to prevent CPU spinning
-                    await asyncio.sleep(0.1)
+                        await self._handle_email_event(loads(message['data']))
                     
                 except Exception as e:
                     print(f"Error in email monitor loop: {e}")
@@ -49,7 +46,7 @@ class EmailMonitor:
         finally:
             if self.pubsub:
                 try:
-                    self.pubsub.close()
+                    await self.pubsub.aclose()
                 except:
                     pass
     
@@ -58,7 +55,7 @@ class EmailMonitor:
         self.is_running = False
         if self.pubsub:
             try:
-                self.pubsub.close()
+                await self.pubsub.aclose()
             except:
                 pass
     
@@ -91,7 +88,7 @@ class EmailMonitor:
     async def get_email_status(self, email_id: str) -> Dict[str, Any]:
         """Get email status from Redis"""
         from .email import email_service
-        return email_service.get_email_status(email_id)
+        return await email_service.get_email_status(email_id)
     
     async def get_recent_emails(self, limit: int = 10) -> list:
         """Get recent email events (simplified implementation)"""
@@ -0,0 +1,117 @@
+import asyncio
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from ..config import Settings
+
+# Called with a batch of events, in publish order
+DomainEventHandler = Callable[[List["DomainEvent"]], Awaitable[None]]
+
+
+@dataclass
+class DomainEvent:
+    name: str
+    payload: Dict[str, Any]
+    user_id: Optional[int] = None
+    # Set for events sent by a user: only that user's workflows (or just workflow_id) may run
+    owner_id: Optional[int] = None
+    workflow_id: Optional[int] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    timestamp: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+
+
+class EventBus:
+    """Async in-process bus for domain events such as ticket.created.
+
+    publish() only enqueues, so request handlers never wait on subscribers; background
+    workers hand the queued events to every handler in batches. When the queue is full
+    new events are dropped and counted rather than slowing down the publisher.
+    """
+
+    def __init__(self, max_queue: int = None, batch_size: int = None, workers: int = 1) -> None:
+        self.max_queue = max_queue or Settings.event_bus_queue_size
+        self.batch_size = batch_size or Settings.event_bus_batch_size
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue)
+        self.handlers: Dict[str, DomainEventHandler] = {}
+        self.is_running = False
+        self.background_tasks: List[asyncio.Task] = []
+        self.metrics: Dict[str, int] = {'published': 0, 'dropped': 0, 'delivered': 0, 'handler_errors': 0}
+
+    def add_handler(self, name: str, handler: DomainEventHandler) -> None:
+        self.handlers[name] = handler
+
+    def publish(self, name: str, payload: Dict[str, Any], user_id: Optional[int] = None, **fields) -> Optional[DomainEvent]:
+        """Queue an event for the handlers; returns None if it was dropped"""
+        return self.publish_event(DomainEvent(name=name, payload=payload, user_id=user_id, **fields))
+
+    def publish_event(self, event: DomainEvent) -> Optional[DomainEvent]:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.metrics['dropped'] += 1
+            print(f"⚠️ Event bus full, dropped {event.name}")
+            return None
+        self.metrics['published'] += 1
+        return event
+
+    async def start(self) -> None:
+        if self.is_running:
+            return
+        self.is_running = True
+        self.background_tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+        print(f"📣 Event bus started ({self.workers} workers)")
+
+    async def stop(self) -> None:
+        """Deliver what is already queued, then stop the workers"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        # One wake-up per worker, in case they are waiting on an empty queue
+        for _ in self.background_tasks:
+            await self.queue.put(None)
+        try:
+            await asyncio.wait_for(asyncio.gather(*self.background_tasks), timeout=10)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            for task in self.background_tasks:
+                task.cancel()
+        self.background_tasks = []
+
+    async def _run(self) -> None:
+        while True:
+            event = await self.queue.get()
+            if event is None:
+                return
+            batch = [event]
+            stopping = False
+            while len(batch) < self.batch_size and not self.queue.empty():
+                event = self.queue.get_nowait()
+                if event is None:
+                    # This worker's stop signal; the other sentinels are left for the other workers
+                    stopping = True
+                    break
+                batch.append(event)
+            await self.deliver(batch)
+            if stopping:
+                return
+
+    async def deliver(self, events: List[DomainEvent]) -> None:
+        for name, handler in list(self.handlers.items()):
+            try:
+                await handler(events)
+            except Exception as e:
+                self.metrics['handler_errors'] += 1
+                print(f"Error in domain event handler {name}: {e}")
+        self.metrics['delivered'] += len(events)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**self.metrics, 'queued': self.queue.qsize(), 'handlers': list(self.handlers)}
+
+
+# Global domain event bus
+event_bus = EventBus()
+
+# Events posted to the ingestion endpoint, consumed by several workers
+ingest_bus = EventBus(max_queue=Settings.ingest_queue_size, batch_size=Settings.ingest_batch_size,
+                      workers=Settings.ingest_consumers)
@@ -0,0 +1,172 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from enum import Enum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+from ..config import Settings
+from ..utils.serialization import dumps
+
+
+class ExecutionEventType(Enum):
+    EXECUTION_STARTED = "execution.started"
+    EXECUTION_FINISHED = "execution.finished"
+    EXECUTION_FAILED = "execution.failed"
+    STEP_STARTED = "step.started"
+    STEP_FINISHED = "step.finished"
+    STEP_FAILED = "step.failed"
+
+
+@dataclass
+class ExecutionEvent:
+    type: ExecutionEventType
+    execution_id: str
+    workflow_id: int
+    user_id: Optional[str] = None
+    db_execution_id: Optional[int] = None
+    node_id: Optional[str] = None
+    action: Optional[str] = None
+    duration_ms: Optional[float] = None
+    result: Any = None
+    error: Optional[str] = None
+    timestamp: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data['type'] = self.type.value
+        return data
+
+
+def trim_result(result: Any, max_chars: int = None) -> Any:
+    """Keep step results small enough to stream; oversized results are truncated to a preview"""
+    max_chars = max_chars or Settings.execution_event_max_result_chars
+    if result is None:
+        return None
+    try:
+        encoded = dumps(result)
+    except Exception:
+        encoded = str(result)
+        result = encoded
+    if len(encoded) <= max_chars:
+        return result
+    return {'truncated': True, 'preview': encoded[:max_chars]}
+
+
+class EventSubscription:
+    """Bounded per-consumer buffer; when full the oldest events are dropped"""
+
+    def __init__(self, name: str, maxsize: int, workflow_id: Optional[int] = None) -> None:
+        self.name = name
+        self.maxsize = maxsize
+        self.workflow_id = workflow_id
+        self.buffer: Deque[ExecutionEvent] = deque()
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.delivered = 0
+        self.dropped = 0
+
+    def matches(self, event: ExecutionEvent) -> bool:
+        return self.workflow_id is None or self.workflow_id == event.workflow_id
+
+    def put(self, event: ExecutionEvent) -> None:
+        if len(self.buffer) >= self.maxsize:
+            self.buffer.popleft()
+            self.dropped += 1
+        self.buffer.append(event)
+        self._ready.set()
+
+    async def get_batch(self, max_items: int = 100, timeout: Optional[float] = None) -> List[ExecutionEvent]:
+        """Wait for at least one event and return everything buffered, up to max_items"""
+        if not self.buffer:
+            if self.closed:
+                return []
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        batch = []
+        while self.buffer and len(batch) < max_items:
+            batch.append(self.buffer.popleft())
+        self.delivered += len(batch)
+        return batch
+
+    async def __aiter__(self):
+        while not self.closed:
+            for event in await self.get_batch():
+                yield event
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'buffered': len(self.buffer),
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+        }
+
+
+class ExecutionEventStream:
+    """Fans executor events out to any number of sinks, each with its own buffer"""
+
+    def __init__(self, buffer_size: int = None) -> None:
+        self.buffer_size = buffer_size or Settings.execution_event_buffer_size
+        self.subscriptions: List[EventSubscription] = []
+        self.sink_tasks: Dict[str, asyncio.Task] = {}
+        self.emitted = 0
+
+    def subscribe(self, name: str, workflow_id: Optional[int] = None, maxsize: int = None) -> EventSubscription:
+        subscription = EventSubscription(name, maxsize or self.buffer_size, workflow_id)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: EventSubscription) -> None:
+        subscription.close()
+        self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+
+    def emit(self, event: ExecutionEvent) -> None:
+        """Hand an event to every subscriber without waiting on any of them"""
+        self.emitted += 1
+        for subscription in self.subscriptions:
+            if subscription.matches(event):
+                subscription.put(event)
+
+    def add_sink(self, name: str, handler: Callable[[List[ExecutionEvent]], Awaitable[None]], batch_size: int = 100) -> None:
+        """Run handler in the background on batches of events from a dedicated subscription"""
+        subscription = self.subscribe(name)
+        self.sink_tasks[name] = asyncio.create_task(self._run_sink(subscription, handler, batch_size))
+
+    async def _run_sink(self, subscription: EventSubscription, handler, batch_size: int) -> None:
+        while not subscription.closed or subscription.buffer:
+            batch = await subscription.get_batch(batch_size)
+            if not batch:
+                continue
+            try:
+                await handler(batch)
+            except Exception as e:
+                print(f"Error in execution event sink {subscription.name}: {e}")
+
+    async def stop(self) -> None:
+        """Stop all sinks, letting each handle what is already buffered"""
+        for subscription in list(self.subscriptions):
+            subscription.close()
+        for task in self.sink_tasks.values():
+            try:
+                await asyncio.wait_for(task, timeout=5)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                task.cancel()
+        self.sink_tasks.clear()
+        self.subscriptions.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            'emitted': self.emitted,
+            'subscriptions': [s.get_metrics() for s in self.subscriptions],
+        }
+
+
+# Global execution event stream instance
+execution_events = ExecutionEventStream()
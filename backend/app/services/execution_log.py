@@ -0,0 +1,224 @@
+import asyncio
+import csv
+import io
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+from sqlalchemy import bindparam, insert, update
+from .execution_events import ExecutionEvent, ExecutionEventType
+from ..config import Settings
+from ..models import Execution, ExecutionLog
+
+STEP_LOG_STATUSES = {
+    ExecutionEventType.STEP_STARTED: 'running',
+    ExecutionEventType.STEP_FINISHED: 'completed',
+    ExecutionEventType.STEP_FAILED: 'failed',
+}
+
+LOG_COLUMNS = ('execution_id', 'node_id', 'status', 'message', 'timestamp')
+
+
+def _log_message(event: ExecutionEvent) -> str:
+    if event.error:
+        return event.error
+    if event.duration_ms is not None:
+        return f"{event.action or 'step'} took {event.duration_ms}ms"
+    return f"{event.action or 'step'} started"
+
+
+class ExecutionLogWriter:
+    """Buffers execution log rows and status updates and writes them to the database in bulk"""
+
+    def __init__(self, batch_size: int = None, flush_interval: float = None, max_buffer: int = None,
+                 copy_threshold: int = None, max_retries: int = None, end_flush_delay: float = None,
+                 session_factory=None) -> None:
+        self.batch_size = batch_size or Settings.execution_log_batch_size
+        self.flush_interval = flush_interval if flush_interval is not None else Settings.execution_log_flush_interval_ms / 1000
+        self.max_buffer = max_buffer or Settings.execution_log_max_buffer
+        # flush never writes more than batch_size rows at once, so a larger threshold would never apply
+        self.copy_threshold = min(copy_threshold or Settings.execution_log_copy_threshold, self.batch_size)
+        self.end_flush_delay = end_flush_delay if end_flush_delay is not None else Settings.execution_log_end_flush_delay_ms / 1000
+        self.pending_flush: Optional[asyncio.Task] = None
+        self.max_retries = max_retries or Settings.execution_log_max_retries
+        self._failures = 0
+        self.session_factory = session_factory
+        self.logs: Deque[Dict[str, Any]] = deque()
+        # execution_id -> latest status values; later updates of the same execution replace earlier ones
+        self.statuses: Dict[int, Dict[str, Any]] = {}
+        self._lock = asyncio.Lock()
+        self.is_running = False
+        self.background_task = None
+        self.metrics: Dict[str, Any] = {
+            'flushes': 0,
+            'rows_written': 0,
+            'status_updates_written': 0,
+            'dropped': 0,
+            'errors': 0,
+            'dropped_batches': 0,
+            'last_batch_size': 0,
+            'max_batch_size': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+        }
+
+    def add_log(self, execution_id: int, node_id: str, status: str, message: Optional[str], timestamp: datetime) -> None:
+        if len(self.logs) >= self.max_buffer:
+            # Bounded memory: if the database cannot keep up, shed the oldest rows
+            self.logs.popleft()
+            self.metrics['dropped'] += 1
+        self.logs.append({
+            'execution_id': execution_id,
+            'node_id': node_id,
+            'status': status,
+            'message': message,
+            'timestamp': timestamp,
+        })
+
+    def set_status(self, execution_id: int, status: str, finished_at: Optional[datetime] = None) -> None:
+        values = self.statuses.setdefault(execution_id, {'id': execution_id})
+        values['status'] = status
+        if finished_at is not None:
+            values['finished_at'] = finished_at
+
+    async def write_events(self, events: List[ExecutionEvent]) -> None:
+        """Execution event sink that records step logs; execution status comes from the executor via set_status"""
+        for event in events:
+            if event.db_execution_id is not None and event.type in STEP_LOG_STATUSES:
+                self.add_log(event.db_execution_id, event.node_id, STEP_LOG_STATUSES[event.type], _log_message(event),
+                             datetime.fromisoformat(event.timestamp))
+        if len(self.logs) >= self.batch_size:
+            await self.flush()
+
+    def flush_soon(self) -> None:
+        """Flush shortly so history reads see finished executions; executions ending meanwhile share the write"""
+        if self.pending_flush is None or self.pending_flush.done():
+            self.pending_flush = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(self.end_flush_delay)
+        await self.flush()
+
+    async def start(self) -> None:
+        if self.is_running:
+            return
+        self.is_running = True
+        self.background_task = asyncio.create_task(self._run())
+        print("🗒️  Execution log writer started")
+
+    async def stop(self) -> None:
+        self.is_running = False
+        if self.background_task:
+            self.background_task.cancel()
+            try:
+                await self.background_task
+            except asyncio.CancelledError:
+                pass
+            self.background_task = None
+        if self.pending_flush and not self.pending_flush.done():
+            self.pending_flush.cancel()
+        self.pending_flush = None
+        await self.flush()
+        print("🗒️  Execution log writer stopped")
+
+    async def _run(self) -> None:
+        while self.is_running:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write everything buffered so far, in batches of batch_size log rows"""
+        async with self._lock:
+            while self.logs or self.statuses:
+                logs = [self.logs.popleft() for _ in range(min(self.batch_size, len(self.logs)))]
+                statuses, self.statuses = list(self.statuses.values()), {}
+                started = time.perf_counter()
+                try:
+                    await asyncio.get_event_loop().run_in_executor(None, self._write, logs, statuses)
+                except Exception as e:
+                    self.metrics['errors'] += 1
+                    self._failures += 1
+                    if self._failures >= self.max_retries:
+                        # Give up on this batch so it can't block every later write
+                        self._failures = 0
+                        self.metrics['dropped'] += len(logs)
+                        self.metrics['dropped_batches'] += 1
+                        print(f"❌ Execution log flush failed {self.max_retries} times, dropping {len(logs)} rows and {len(statuses)} status updates: {e}")
+                        continue
+                    print(f"❌ Execution log flush failed, will retry: {e}")
+                    # Put the batch back in front of anything buffered since
+                    self.logs.extendleft(reversed(logs))
+                    for values in statuses:
+                        self.statuses.setdefault(values['id'], values)
+                    while len(self.logs) > self.max_buffer:
+                        self.logs.popleft()
+                        self.metrics['dropped'] += 1
+                    return
+                self._failures = 0
+                self._record_flush(len(logs), len(statuses), started)
+
+    def _record_flush(self, log_count: int, status_count: int, started: float) -> None:
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.metrics['flushes'] += 1
+        self.metrics['rows_written'] += log_count
+        self.metrics['status_updates_written'] += status_count
+        self.metrics['last_batch_size'] = log_count
+        self.metrics['max_batch_size'] = max(self.metrics['max_batch_size'], log_count)
+        self.metrics['last_flush_ms'] = elapsed_ms
+        self.metrics['max_flush_ms'] = max(self.metrics['max_flush_ms'], elapsed_ms)
+
+    def _write(self, logs: List[Dict[str, Any]], statuses: List[Dict[str, Any]]) -> None:
+        if self.session_factory is None:
+            from ..db import SessionLocal
+            self.session_factory = SessionLocal
+
+        db = self.session_factory()
+        try:
+            if logs:
+                if db.get_bind().dialect.name == 'postgresql' and len(logs) >= self.copy_threshold:
+                    self._copy_logs(db, logs)
+                else:
+                    db.execute(insert(ExecutionLog), logs)
+            self._update_statuses(db, statuses)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _update_statuses(self, db, statuses: List[Dict[str, Any]]) -> None:
+        """Bulk UPDATE by id, one executemany per set of columns; rows deleted meanwhile are skipped"""
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for values in statuses:
+            columns = tuple(sorted(key for key in values if key != 'id'))
+            groups.setdefault(columns, []).append({'execution_id': values['id'], **{key: values[key] for key in columns}})
+        table = Execution.__table__
+        for columns, rows in groups.items():
+            statement = update(table).where(table.c.id == bindparam('execution_id')).values({key: bindparam(key) for key in columns})
+            db.execute(statement, rows)
+
+    def _copy_logs(self, db, logs: List[Dict[str, Any]]) -> None:
+        """Load log rows with PostgreSQL COPY, inside the session's transaction"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in logs:
+            writer.writerow([row['execution_id'], row['node_id'], row['status'], row['message'], row['timestamp'].isoformat()])
+        buffer.seek(0)
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY execution_logs ({', '.join(LOG_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**self.metrics, 'buffered_logs': len(self.logs), 'buffered_status_updates': len(self.statuses)}
+
+
+# Global execution log writer instance
+execution_log_writer = ExecutionLogWriter()
+
+
+async def write_execution_logs(events: List[ExecutionEvent]) -> None:
+    """Execution event sink that records step logs in the database"""
+    await execution_log_writer.write_events(events)
@@ -0,0 +1,241 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from .cache import async_cache
+from ..config import Settings
+from ..utils.serialization import dumps_bytes
+
+
+def execution_key(execution_id: str) -> str:
+    return f"execution:{execution_id}"
+
+
+def workflow_index_key(workflow_id: int) -> str:
+    return f"executions:workflow:{workflow_id}"
+
+
+def user_index_key(user_id: str) -> str:
+    return f"executions:user:{user_id}"
+
+
+def snapshot(execution: Dict[str, Any]) -> Dict[str, Any]:
+    """What is stored of an execution; the definition can be reloaded from the workflow"""
+    return {key: value for key, value in execution.items() if key != 'definition'}
+
+
+def _started_at(execution: Dict[str, Any]) -> float:
+    try:
+        return datetime.fromisoformat(execution['started_at']).timestamp()
+    except Exception:
+        return 0.0
+
+
+class NullExecutionPersistence:
+    """Keeps nothing beyond the in-process store (single worker, tests)"""
+
+    async def save_many(self, executions: List[Dict[str, Any]]) -> None:
+        pass
+
+    async def load_many(self, execution_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        return {}
+
+    async def ids_by_workflow(self, workflow_id: int, limit: int) -> List[str]:
+        return []
+
+    async def ids_by_user(self, user_id: str, limit: int) -> List[str]:
+        return []
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {'backend': 'memory'}
+
+
+class RedisExecutionPersistence:
+    """Execution snapshots in Redis, with per-workflow and per-user indexes (newest first), for every worker"""
+
+    def __init__(self, redis_cache=None, ttl: int = None, index_size: int = None) -> None:
+        self.redis = redis_cache or async_cache
+        self.ttl = ttl or Settings.execution_store_ttl_seconds
+        self.index_size = index_size or Settings.execution_store_index_size
+        self.metrics: Dict[str, int] = {'saved': 0, 'loaded': 0, 'redis_errors': 0}
+
+    async def save_many(self, executions: List[Dict[str, Any]]) -> None:
+        if not executions:
+            return
+        try:
+            async with self.redis.pipeline() as pipe:
+                indexes = set()
+                for execution in executions:
+                    score = _started_at(execution)
+                    pipe.set(execution_key(execution['id']), dumps_bytes(snapshot(execution)), ex=self.ttl)
+                    for index in (workflow_index_key(execution['workflow_id']), user_index_key(execution.get('user_id'))):
+                        pipe.zadd(index, {execution['id']: score})
+                        indexes.add(index)
+                for index in indexes:
+                    # Keep only the newest entries of each index
+                    pipe.zremrangebyrank(index, 0, -self.index_size - 1)
+                    pipe.expire(index, self.ttl)
+                await pipe.execute()
+            self.metrics['saved'] += len(executions)
+        except Exception:
+            self.metrics['redis_errors'] += 1
+
+    async def load_many(self, execution_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        try:
+            found = await self.redis.get_many(execution_key(execution_id) for execution_id in execution_ids)
+        except Exception:
+            self.metrics['redis_errors'] += 1
+            return {}
+        self.metrics['loaded'] += len(found)
+        return {data['id']: data for data in found.values()}
+
+    async def _ids(self, index: str, limit: int) -> List[str]:
+        try:
+            return list(await self.redis.client.zrevrange(index, 0, limit - 1))
+        except Exception:
+            self.metrics['redis_errors'] += 1
+            return []
+
+    async def ids_by_workflow(self, workflow_id: int, limit: int) -> List[str]:
+        return await self._ids(workflow_index_key(workflow_id), limit)
+
+    async def ids_by_user(self, user_id: str, limit: int) -> List[str]:
+        return await self._ids(user_index_key(user_id), limit)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**self.metrics, 'backend': 'redis'}
+
+
+class ExecutionStore:
+    """Execution state for WorkflowExecutor.
+
+    Unfinished runs stay in memory until they finish (admission control bounds how many
+    there are). Finished runs move to an LRU bounded by count and by serialized bytes,
+    and are persisted so status and history survive eviction and are visible to every
+    worker. Indexes by workflow and user cover everything held in memory.
+    """
+
+    def __init__(self, persistence=None, max_entries: int = None, max_bytes: int = None) -> None:
+        self.persistence = persistence or create_execution_persistence()
+        self.max_entries = max_entries or Settings.execution_store_max_entries
+        self.max_bytes = max_bytes or Settings.execution_store_max_bytes
+        self.active: Dict[str, Dict[str, Any]] = {}
+        # execution id -> (serialized size, execution), least recently used first
+        self.finished: "OrderedDict[str, Tuple[int, Dict[str, Any]]]" = OrderedDict()
+        self.finished_bytes = 0
+        self.by_workflow: Dict[int, Set[str]] = {}
+        self.by_user: Dict[str, Set[str]] = {}
+        self.metrics: Dict[str, int] = {'added': 0, 'finished': 0, 'evicted': 0, 'local_hits': 0, 'persisted_hits': 0}
+
+    # Writes
+
+    def add(self, execution: Dict[str, Any]) -> None:
+        self.active[execution['id']] = execution
+        self._index(execution)
+        self.metrics['added'] += 1
+
+    async def save(self, executions: Iterable[Dict[str, Any]]) -> None:
+        """Persist the current state of executions, e.g. right after they were created"""
+        await self.persistence.save_many(list(executions))
+
+    async def finish(self, execution: Dict[str, Any]) -> None:
+        """Move a finished execution out of the active set, into the LRU and persistence"""
+        self.active.pop(execution['id'], None)
+        data = snapshot(execution)
+        size = len(dumps_bytes(data))
+        previous = self.finished.pop(execution['id'], None)
+        if previous:
+            self.finished_bytes -= previous[0]
+        self.finished[execution['id']] = (size, data)
+        self.finished_bytes += size
+        self.metrics['finished'] += 1
+        self._evict()
+        await self.persistence.save_many([data])
+
+    def _evict(self) -> None:
+        while self.finished and (len(self.finished) > self.max_entries or self.finished_bytes > self.max_bytes):
+            execution_id, (size, data) = self.finished.popitem(last=False)
+            self.finished_bytes -= size
+            self._unindex(data)
+            self.metrics['evicted'] += 1
+
+    def _index(self, execution: Dict[str, Any]) -> None:
+        self.by_workflow.setdefault(execution['workflow_id'], set()).add(execution['id'])
+        self.by_user.setdefault(execution.get('user_id'), set()).add(execution['id'])
+
+    def _unindex(self, execution: Dict[str, Any]) -> None:
+        for index, key in ((self.by_workflow, execution['workflow_id']), (self.by_user, execution.get('user_id'))):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(execution['id'])
+                if not ids:
+                    del index[key]
+
+    # Reads
+
+    def get_local(self, execution_id: str) -> Optional[Dict[str, Any]]:
+        execution = self.active.get(execution_id)
+        if execution is not None:
+            return execution
+        entry = self.finished.get(execution_id)
+        if entry is None:
+            return None
+        self.finished.move_to_end(execution_id)
+        return entry[1]
+
+    async def get(self, execution_id: str) -> Optional[Dict[str, Any]]:
+        """An execution from this worker's memory, or else as persisted by any worker"""
+        execution = self.get_local(execution_id)
+        if execution is not None:
+            self.metrics['local_hits'] += 1
+            return execution
+        execution = (await self.persistence.load_many([execution_id])).get(execution_id)
+        if execution is not None:
+            self.metrics['persisted_hits'] += 1
+        return execution
+
+    async def _list(self, local_ids: Set[str], persisted_ids: List[str]) -> List[Dict[str, Any]]:
+        found = {execution_id: self.get_local(execution_id) for execution_id in local_ids}
+        missing = [execution_id for execution_id in persisted_ids if execution_id not in found]
+        if missing:
+            found.update(await self.persistence.load_many(missing))
+        return sorted((e for e in found.values() if e is not None), key=_started_at, reverse=True)
+
+    async def list_by_workflow(self, workflow_id: int, limit: int = 100) -> List[Dict[str, Any]]:
+        """Newest executions of a workflow"""
+        persisted = await self.persistence.ids_by_workflow(workflow_id, limit)
+        return (await self._list(set(self.by_workflow.get(workflow_id, ())), persisted))[:limit]
+
+    async def list_by_user(self, user_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Newest executions started by a user"""
+        persisted = await self.persistence.ids_by_user(user_id, limit)
+        return (await self._list(set(self.by_user.get(user_id, ())), persisted))[:limit]
+
+    def active_count(self) -> int:
+        return len(self.active)
+
+    def clear(self) -> None:
+        self.active.clear()
+        self.finished.clear()
+        self.finished_bytes = 0
+        self.by_workflow.clear()
+        self.by_user.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            **self.metrics,
+            'active': len(self.active),
+            'finished_cached': len(self.finished),
+            'finished_bytes': self.finished_bytes,
+            'persistence': self.persistence.get_metrics(),
+        }
+
+
+def create_execution_persistence():
+    """Persistence selected by EXECUTION_STORE_BACKEND"""
+    if Settings.execution_store_backend == 'redis':
+        return RedisExecutionPersistence()
+    return NullExecutionPersistence()
+
+
+# Global execution state store
+execution_store = ExecutionStore()
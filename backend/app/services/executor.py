@@ -1,43 +1,230 @@
 import asyncio
 import json
+import time
+import uuid
+from collections import deque
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from .scheduler import job_scheduler
 from .email import email_service
 from .actions import handle_email, handle_delay, handle_http_request
+from .conditions import evaluate_condition
+from .execution_events import execution_events, ExecutionEvent, ExecutionEventType, trim_result
+from .workflow_cache import workflow_cache
+from .execution_store import execution_store
+from .execution_log import execution_log_writer
+from .checkpoints import execution_checkpointer
 from ..models import Workflow, Execution
 
 class WorkflowExecutor:
-    def __init__(self):
-        self.executions: Dict[str, Dict[str, Any]] = {}
+    def __init__(self, store=None, checkpoints=None, log_writer=None):
+        # Active runs in memory; finished ones bounded, indexed and persisted
+        self.store = store or execution_store
+        # Per-step checkpoints of unfinished runs, resumed after a restart
+        self.checkpoints = checkpoints or execution_checkpointer
+        # Status of runs in the executions table; written directly, never through a lossy event buffer
+        self.log_writer = log_writer or execution_log_writer
     
-    async def execute_workflow(self, workflow_id: int, payload: Dict[str, Any] = None, user_id: Optional[str] = None) -> str:
-        """Execute a workflow"""
-        execution_id = f"exec_{workflow_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
-        
-        # Create execution record
-        execution = {
+    @staticmethod
+    def new_execution_id(workflow_id: int) -> str:
+        # Random suffix: runs started in the same second must not overwrite each other
+        return f"exec_{workflow_id}_{uuid.uuid4().hex}"
+
+    def _register(self, workflow_id: int, payload: Optional[Dict[str, Any]], user_id: Optional[str],
+                  db_execution_id: Optional[int], definition: Optional[Dict[str, Any]]) -> str:
+        execution_id = self.new_execution_id(workflow_id)
+        self.store.add({
             'id': execution_id,
             'workflow_id': workflow_id,
             'status': 'running',
             'started_at': datetime.utcnow().isoformat(),
             'payload': payload or {},
             'steps': [],
-            'user_id': user_id
-        }
-        
-        self.executions[execution_id] = execution
-        
+            'user_id': user_id,
+            'db_execution_id': db_execution_id,
+            'definition': definition,
+            # Scheduler class ("interactive" or "bulk") for the execution and the jobs it spawns
+            'priority': (definition or {}).get('priority')
+        })
+        return execution_id
+
+    async def execute_workflow(self, workflow_id: int, payload: Dict[str, Any] = None, user_id: Optional[str] = None,
+                               db_execution_id: Optional[int] = None, definition: Optional[Dict[str, Any]] = None) -> str:
+        """Execute a workflow"""
+        definition = definition or await self._load_definition(workflow_id)
+        execution_id = self._register(workflow_id, payload, user_id, db_execution_id, definition)
+        execution = self.store.get_local(execution_id)
+        await self._persist_new([execution])
+
         # Schedule the execution as a background job
         await job_scheduler.schedule_workflow_execution(
             workflow_id=workflow_id,
             execution_id=execution_id,
-            user_id=user_id
+            user_id=user_id,
+            priority=execution['priority']
         )
         
         return execution_id
+
+    async def execute_workflows(self, workflow_id: int, payloads: List[Dict[str, Any]], user_id: Optional[str] = None,
+                                db_execution_ids: Optional[List[int]] = None, definition: Optional[Dict[str, Any]] = None) -> List[str]:
+        """Start one execution per payload and schedule them all in a single scheduler call"""
+        definition = definition or await self._load_definition(workflow_id)
+        db_execution_ids = db_execution_ids or [None] * len(payloads)
+        execution_ids = [
+            self._register(workflow_id, payload, user_id, db_execution_id, definition)
+            for payload, db_execution_id in zip(payloads, db_execution_ids)
+        ]
+        await self._persist_new([self.store.get_local(execution_id) for execution_id in execution_ids])
+        await job_scheduler.schedule_workflow_executions(workflow_id, execution_ids, user_id=user_id,
+                                                         priority=(definition or {}).get('priority'))
+        return execution_ids
+
+    async def _persist_new(self, executions: List[Dict[str, Any]]) -> None:
+        await self.store.save(executions)
+        await self.checkpoints.begin(executions)
+
+    async def _finish(self, execution: Dict[str, Any]) -> None:
+        self._record_status(execution)
+        await self.store.finish(execution)
+        await self.checkpoints.finish(execution['id'])
+
+    async def run_execution(self, execution_id: str) -> Dict[str, Any]:
+        """Run a scheduled execution node by node, emitting an event for every step"""
+        execution = self.store.get_local(execution_id)
+        if not execution:
+            raise ValueError(f"Execution {execution_id} not found")
+
+        started = time.perf_counter()
+        try:
+            return await self._run(execution, started)
+        except Exception as e:
+            # Whatever went wrong, the run ends here rather than staying active (and resumable) forever
+            if execution['status'] == 'running':
+                await self._fail(execution, str(e), started)
+            return execution
+
+    async def _run(self, execution: Dict[str, Any], started: float) -> Dict[str, Any]:
+        execution_id = execution['id']
+        definition = execution.pop('definition', None) or await self._load_definition(execution['workflow_id'])
+        if definition is None:
+            raise ValueError(f"Workflow {execution['workflow_id']} not found")
+
+        nodes = {node['id']: node for node in definition.get('nodes', [])}
+        outgoing: Dict[str, List[Dict[str, Any]]] = {}
+        for edge in definition.get('edges', []):
+            outgoing.setdefault(edge['source'], []).append(edge)
+        targets = {edge['target'] for edge in definition.get('edges', [])}
+
+        context = {**execution['payload'], 'execution_id': execution_id, 'workflow_id': execution['workflow_id'], 'steps': {}}
+        frontier = deque(node_id for node_id in nodes if node_id not in targets)
+        completed = set()
+        # Steps checkpointed before a restart: rebuild the context and frontier without running them again
+        for delta in execution.pop('resume', None) or []:
+            node_id = delta['step']['node_id']
+            execution['steps'].append(delta['step'])
+            context['steps'][node_id] = delta['result']
+            completed.add(node_id)
+            frontier.extend(delta['next'])
+        self._record_status(execution)
+        self._emit(execution, ExecutionEventType.EXECUTION_STARTED)
+
+        while frontier:
+            node_id = frontier.popleft()
+            if node_id in completed or node_id not in nodes:
+                continue
+
+            result = await self._run_node(execution, nodes[node_id], context)
+            completed.add(node_id)
+            if result.get('status') == 'failed':
+                await self._fail(execution, result.get('error'), started, node_id=node_id)
+                return execution
+
+            next_nodes = [
+                edge['target'] for edge in outgoing.get(node_id, [])
+                if 'condition' not in edge or evaluate_condition(edge['condition'], context)
+            ]
+            frontier.extend(next_nodes)
+            await self.checkpoints.record_step(execution_id, execution['steps'][-1], result, next_nodes)
+
+        execution['status'] = 'completed'
+        execution['finished_at'] = datetime.utcnow().isoformat()
+        self._emit(execution, ExecutionEventType.EXECUTION_FINISHED, duration_ms=self._elapsed_ms(started))
+        await self._finish(execution)
+        return execution
+
+    async def _fail(self, execution: Dict[str, Any], error: Optional[str], started: Optional[float] = None,
+                    node_id: Optional[str] = None, status: str = 'failed') -> None:
+        execution['status'] = status
+        execution['error'] = error
+        execution['finished_at'] = datetime.utcnow().isoformat()
+        self._emit(execution, ExecutionEventType.EXECUTION_FAILED, node_id=node_id, error=error,
+                   duration_ms=self._elapsed_ms(started) if started is not None else None)
+        await self._finish(execution)
+
+    async def end_execution(self, execution_id: str, error: str, status: str = 'failed') -> None:
+        """End an execution that won't run (its job was cancelled or failed), if it is still active"""
+        execution = self.store.get_local(execution_id)
+        if execution is not None and execution['status'] == 'running':
+            await self._fail(execution, error, status=status)
+
+    async def _run_node(self, execution: Dict[str, Any], node: Dict[str, Any], context: Dict[str, Any]) -> Dict[str, Any]:
+        node_id = node['id']
+        action = node.get('action', 'notify')
+        self._emit(execution, ExecutionEventType.STEP_STARTED, node_id=node_id, action=action)
+
+        started = time.perf_counter()
+        result = await self.execute_step(node, context, execution.get('user_id'), execution.get('priority'))
+        if not isinstance(result, dict):
+            result = {'status': 'completed', 'result': result}
+        duration_ms = self._elapsed_ms(started)
+        context['steps'][node_id] = result
+
+        failed = result.get('status') == 'failed'
+        execution['steps'].append({
+            'node_id': node_id,
+            'action': action,
+            'status': 'failed' if failed else 'completed',
+            'duration_ms': duration_ms,
+            'finished_at': datetime.utcnow().isoformat()
+        })
+        if failed:
+            self._emit(execution, ExecutionEventType.STEP_FAILED, node_id=node_id, action=action,
+                       duration_ms=duration_ms, error=result.get('error'))
+        else:
+            self._emit(execution, ExecutionEventType.STEP_FINISHED, node_id=node_id, action=action,
+                       duration_ms=duration_ms, result=trim_result(result))
+        return result
+
+    def _record_status(self, execution: Dict[str, Any]) -> None:
+        if execution.get('db_execution_id') is None:
+            return
+        finished_at = execution.get('finished_at')
+        self.log_writer.set_status(execution['db_execution_id'], execution['status'],
+                                   datetime.fromisoformat(finished_at) if finished_at else None)
+        if finished_at:
+            self.log_writer.flush_soon()
+
+    def _emit(self, execution: Dict[str, Any], event_type: ExecutionEventType, **fields) -> None:
+        execution_events.emit(ExecutionEvent(
+            type=event_type,
+            execution_id=execution['id'],
+            workflow_id=execution['workflow_id'],
+            user_id=execution.get('user_id'),
+            db_execution_id=execution.get('db_execution_id'),
+            **fields
+        ))
+
+    @staticmethod
+    def _elapsed_ms(started: float) -> float:
+        return round((time.perf_counter() - started) * 1000, 2)
+
+    async def _load_definition(self, workflow_id: int) -> Optional[Dict[str, Any]]:
+        wf = await workflow_cache.get(workflow_id)
+        return wf['definition'] if wf else None
     
-    async def execute_step(self, step: Dict[str, Any], context: Dict[str, Any], user_id: Optional[str] = None) -> Dict[str, Any]:
+    async def execute_step(self, step: Dict[str, Any], context: Dict[str, Any], user_id: Optional[str] = None,
+                           priority: Optional[str] = None) -> Dict[str, Any]:
         """Execute a single workflow step"""
         step_id = step.get('id', 'unknown')
         action = step.get('action', 'notify')
@@ -60,7 +247,8 @@ class WorkflowExecutor:
                         'execution_id': context.get('execution_id'),
                         'step_id': step_id
                     },
-                    user_id=user_id
+                    user_id=user_id,
+                    priority=priority
                 )
                 return result
                 
@@ -72,7 +260,8 @@ class WorkflowExecutor:
                     scheduled_at=datetime.utcnow(),
                     function=handle_delay,
                     args=[delay_seconds],
-                    user_id=user_id
+                    user_id=user_id,
+                    priority=priority
                 )
                 return {'status': 'scheduled', 'delay_seconds': delay_seconds}
                 
@@ -83,7 +272,8 @@ class WorkflowExecutor:
                     scheduled_at=datetime.utcnow(),
                     function=handle_http_request,
                     args=[params, context],
-                    user_id=user_id
+                    user_id=user_id,
+                    priority=priority
                 )
                 return {'status': 'scheduled', 'url': params.get('url')}
                 
@@ -103,15 +293,12 @@ class WorkflowExecutor:
             }
     
     async def get_execution_status(self, execution_id: str) -> Optional[Dict[str, Any]]:
-        """Get execution status"""
-        return self.executions.get(execution_id)
+        """Get execution status, from this worker or as persisted by any worker"""
+        return await self.store.get(execution_id)
     
-    async def get_execution_history(self, workflow_id: int) -> list:
-        """Get execution history for a workflow"""
-        return [
-            execution for execution in self.executions.values()
-            if execution['workflow_id'] == workflow_id
-        ]
+    async def get_execution_history(self, workflow_id: int, limit: int = 100) -> list:
+        """Get execution history for a workflow, newest first"""
+        return await self.store.list_by_workflow(workflow_id, limit)
 
 # Global executor instance
 workflow_executor = WorkflowExecutor()
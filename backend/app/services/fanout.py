@@ -0,0 +1,166 @@
+import asyncio
+from typing import Callable, Dict, Optional, Set
+import redis.asyncio as aioredis
+from ..config import Settings
+
+# Called with (workflow_id, serialized message) for every message a worker receives
+DeliverHandler = Callable[[int, str], None]
+
+CHANNEL_PREFIX = "ws:workflow:"
+
+
+def workflow_channel(workflow_id: int) -> str:
+    return f"{CHANNEL_PREFIX}{workflow_id}"
+
+
+class InProcessBroker:
+    """Stands in for the Redis server: routes messages between buses in one process"""
+
+    def __init__(self) -> None:
+        self.subscriptions: Dict[int, Set["InProcessFanoutBus"]] = {}
+
+    def publish(self, workflow_id: int, text: str) -> int:
+        receivers = list(self.subscriptions.get(workflow_id, ()))
+        for bus in receivers:
+            bus.deliver(workflow_id, text)
+        return len(receivers)
+
+
+class InProcessFanoutBus:
+    """Fan-out bus for a single process, and for tests that simulate several workers"""
+
+    def __init__(self, broker: Optional[InProcessBroker] = None) -> None:
+        self.broker = broker or InProcessBroker()
+        self.handler: Optional[DeliverHandler] = None
+        self.channels: Set[int] = set()
+
+    def set_handler(self, handler: DeliverHandler) -> None:
+        self.handler = handler
+
+    def deliver(self, workflow_id: int, text: str) -> None:
+        if self.handler:
+            self.handler(workflow_id, text)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        for workflow_id in list(self.channels):
+            await self.unsubscribe(workflow_id)
+
+    async def subscribe(self, workflow_id: int) -> None:
+        self.channels.add(workflow_id)
+        self.broker.subscriptions.setdefault(workflow_id, set()).add(self)
+
+    async def unsubscribe(self, workflow_id: int) -> None:
+        self.channels.discard(workflow_id)
+        subscribers = self.broker.subscriptions.get(workflow_id)
+        if subscribers is not None:
+            subscribers.discard(self)
+            if not subscribers:
+                self.broker.subscriptions.pop(workflow_id, None)
+
+    async def publish(self, workflow_id: int, text: str) -> None:
+        self.broker.publish(workflow_id, text)
+
+
+class RedisFanoutBus:
+    """Fan-out bus over Redis pub/sub so every worker reaches its own WebSocket subscribers"""
+
+    def __init__(self, redis_url: str = None) -> None:
+        self.redis_url = redis_url or Settings.redis_url
+        self.client = None
+        self.pubsub = None
+        self.handler: Optional[DeliverHandler] = None
+        self.channels: Set[int] = set()
+        self.is_running = False
+        self.background_task = None
+
+    def set_handler(self, handler: DeliverHandler) -> None:
+        self.handler = handler
+
+    def deliver(self, workflow_id: int, text: str) -> None:
+        if self.handler:
+            self.handler(workflow_id, text)
+
+    async def start(self) -> None:
+        if self.is_running:
+            return
+        self.client = aioredis.Redis.from_url(self.redis_url, decode_responses=True)
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self.is_running = True
+        # Subscribe channels that got local sockets before start
+        try:
+            for workflow_id in self.channels:
+                await self.pubsub.subscribe(workflow_channel(workflow_id))
+        except Exception as e:
+            print(f"⚠️ WebSocket fan-out could not subscribe (Redis may not be available): {e}")
+        self.background_task = asyncio.create_task(self._listen())
+        print("📣 Redis WebSocket fan-out started")
+
+    async def stop(self) -> None:
+        self.is_running = False
+        if self.background_task:
+            self.background_task.cancel()
+            try:
+                await self.background_task
+            except asyncio.CancelledError:
+                pass
+            self.background_task = None
+        if self.pubsub:
+            try:
+                await self.pubsub.aclose()
+            except Exception:
+                pass
+        if self.client:
+            await self.client.aclose()
+        print("📣 Redis WebSocket fan-out stopped")
+
+    async def _listen(self) -> None:
+        while self.is_running:
+            try:
+                if not self.channels:
+                    await asyncio.sleep(0.1)
+                    continue
+                message = await self.pubsub.get_message(timeout=1.0)
+                if message and message['type'] == 'message':
+                    workflow_id = int(message['channel'][len(CHANNEL_PREFIX):])
+                    self.deliver(workflow_id, message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in WebSocket fan-out listener: {e}")
+                await asyncio.sleep(1)
+
+    async def subscribe(self, workflow_id: int) -> None:
+        if workflow_id in self.channels:
+            return
+        self.channels.add(workflow_id)
+        if self.is_running:
+            await self.pubsub.subscribe(workflow_channel(workflow_id))
+
+    async def unsubscribe(self, workflow_id: int) -> None:
+        if workflow_id not in self.channels:
+            return
+        self.channels.discard(workflow_id)
+        if self.is_running:
+            await self.pubsub.unsubscribe(workflow_channel(workflow_id))
+
+    async def publish(self, workflow_id: int, text: str) -> None:
+        if not self.is_running:
+            self.deliver(workflow_id, text)
+            return
+        try:
+            await self.client.publish(workflow_channel(workflow_id), text)
+        except Exception as e:
+            # Redis unavailable: local subscribers still get the message
+            print(f"⚠️ WebSocket fan-out publish failed, delivering locally: {e}")
+            if workflow_id in self.channels:
+                self.deliver(workflow_id, text)
+
+
+def create_fanout_bus():
+    """Build the bus selected by WS_FANOUT_BACKEND"""
+    if Settings.ws_fanout_backend == 'redis':
+        return RedisFanoutBus()
+    return InProcessFanoutBus()
@@ -0,0 +1,115 @@
+import asyncio
+import uuid
+from typing import Callable, Dict, List
+import redis.asyncio as aioredis
+from ..config import Settings
+from ..utils.serialization import dumps_bytes, loads
+
+# Called with the invalidated key, e.g. a workflow id
+InvalidationHandler = Callable[[str], None]
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+
+class InProcessInvalidationBus:
+    """Invalidation bus for a single worker: handlers run as soon as a key is published"""
+
+    def __init__(self) -> None:
+        self.handlers: Dict[str, List[InvalidationHandler]] = {}
+
+    def add_handler(self, namespace: str, handler: InvalidationHandler) -> None:
+        self.handlers.setdefault(namespace, []).append(handler)
+
+    def deliver(self, namespace: str, key: str) -> None:
+        for handler in self.handlers.get(namespace, ()):
+            handler(key)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, namespace: str, key: str) -> None:
+        self.deliver(namespace, key)
+
+
+class RedisInvalidationBus(InProcessInvalidationBus):
+    """Invalidation bus over Redis pub/sub so every worker drops its in-process copies"""
+
+    def __init__(self, redis_url: str = None) -> None:
+        super().__init__()
+        self.redis_url = redis_url or Settings.redis_url
+        # Lets a worker skip its own messages; it already updated its local cache
+        self.origin = uuid.uuid4().hex
+        self.client = None
+        self.pubsub = None
+        self.is_running = False
+        self.background_task = None
+
+    async def start(self) -> None:
+        if self.is_running:
+            return
+        self.client = aioredis.Redis.from_url(self.redis_url, decode_responses=True)
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self.is_running = True
+        try:
+            await self.pubsub.subscribe(INVALIDATION_CHANNEL)
+        except Exception as e:
+            print(f"⚠️ Cache invalidation could not subscribe (Redis may not be available): {e}")
+        self.background_task = asyncio.create_task(self._listen())
+        print("♻️  Redis cache invalidation started")
+
+    async def stop(self) -> None:
+        self.is_running = False
+        if self.background_task:
+            self.background_task.cancel()
+            try:
+                await self.background_task
+            except asyncio.CancelledError:
+                pass
+            self.background_task = None
+        if self.pubsub:
+            try:
+                await self.pubsub.aclose()
+            except Exception:
+                pass
+        if self.client:
+            await self.client.aclose()
+
+    async def _listen(self) -> None:
+        while self.is_running:
+            try:
+                if not self.pubsub.subscribed:
+                    await self.pubsub.subscribe(INVALIDATION_CHANNEL)
+                message = await self.pubsub.get_message(timeout=1.0)
+                if message and message['type'] == 'message':
+                    data = loads(message['data'])
+                    if data.get('origin') != self.origin:
+                        self.deliver(data['namespace'], data['key'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in cache invalidation listener: {e}")
+                await asyncio.sleep(1)
+
+    async def publish(self, namespace: str, key: str) -> None:
+        self.deliver(namespace, key)
+        if not self.is_running:
+            return
+        try:
+            await self.client.publish(INVALIDATION_CHANNEL, dumps_bytes({'namespace': namespace, 'key': key, 'origin': self.origin}))
+        except Exception as e:
+            # Other workers fall back to their local TTL
+            print(f"⚠️ Cache invalidation publish failed: {e}")
+
+
+def create_invalidation_bus():
+    """Build the bus selected by CACHE_INVALIDATION_BACKEND"""
+    if Settings.cache_invalidation_backend == 'redis':
+        return RedisInvalidationBus()
+    return InProcessInvalidationBus()
+
+
+# Global cache invalidation bus
+invalidation_bus = create_invalidation_bus()
@@ -0,0 +1,78 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+from fastapi import HTTPException, status
+from ..config import Settings
+from ..utils.security import get_pwd_context
+
+
+class HasherSaturated(Exception):
+    """Raised when too many hash operations are already queued"""
+
+
+def _hash(password: str, rounds: int) -> str:
+    return get_pwd_context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    # The new hash is only returned when the stored one uses fewer rounds than configured
+    return get_pwd_context(rounds).verify_and_update(password, hashed)
+
+
+class PasswordHasher:
+    """Runs bcrypt in a bounded process pool so login bursts never occupy the event loop or its threads"""
+
+    def __init__(self, workers: int = None, max_pending: int = None, rounds: int = None, executor: Executor = None) -> None:
+        self.workers = workers or Settings.password_hash_workers
+        self.max_pending = max_pending or Settings.password_hash_max_pending
+        self.rounds = rounds or Settings.bcrypt_rounds
+        self.executor = executor
+        self.pending = 0
+        self.metrics: Dict[str, int] = {'hashes': 0, 'verifications': 0, 'rehashes': 0, 'rejected': 0}
+
+    def _get_executor(self) -> Executor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self.executor
+
+    async def _run(self, fn, *args) -> Any:
+        if self.pending >= self.max_pending:
+            self.metrics['rejected'] += 1
+            raise HasherSaturated()
+        self.pending += 1
+        try:
+            return await asyncio.get_event_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        self.metrics['hashes'] += 1
+        return await self._run(_hash, password, self.rounds)
+
+    async def verify(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """(matches, upgraded hash to store or None)"""
+        self.metrics['verifications'] += 1
+        ok, new_hash = await self._run(_verify_and_update, password, hashed, self.rounds)
+        if new_hash:
+            self.metrics['rehashes'] += 1
+        return ok, new_hash
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**self.metrics, 'pending': self.pending, 'max_pending': self.max_pending, 'workers': self.workers}
+
+
+def saturated_response() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail='Authentication is busy, please retry shortly',
+        headers={'Retry-After': str(Settings.password_hash_retry_after_seconds)},
+    )
+
+
+# Global password hasher instance
+password_hasher = PasswordHasher()
@@ -0,0 +1,144 @@
+import hashlib
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from .cache import async_cache
+from .invalidation import invalidation_bus
+from ..config import Settings
+from ..models import User
+
+INVALIDATION_NAMESPACE = "principal"
+
+
+def principal_key(payload: Dict[str, Any], token: str) -> str:
+    """Cache key of a token: its jti, or a hash of the token for tokens issued without one"""
+    token_id = payload.get('jti') or hashlib.sha256(token.encode()).hexdigest()
+    return f"principal:{token_id}"
+
+
+def user_principals_key(user_id: int) -> str:
+    return f"principals:user:{user_id}"
+
+
+def detached_user(data: Dict[str, Any]) -> User:
+    """A User built from cached fields; it belongs to no session and never lazy-loads"""
+    return User(id=data['id'], email=data['email'], created_at=datetime.fromisoformat(data['created_at']))
+
+
+class PrincipalCache:
+    """Authenticated users by token id: in-process LRU, then Redis, then the database.
+
+    Entries never outlive the token they were cached for.
+    """
+
+    def __init__(self, redis_cache=None, bus=None, max_entries: int = None, ttl: int = None, session_factory=None) -> None:
+        self.redis = redis_cache or async_cache
+        self.bus = bus or invalidation_bus
+        self.max_entries = max_entries or Settings.principal_cache_size
+        self.ttl = ttl or Settings.principal_cache_ttl_seconds
+        self.session_factory = session_factory
+        # key -> (expires_at, user fields), least recently used first
+        self.entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.metrics: Dict[str, int] = {'local_hits': 0, 'redis_hits': 0, 'db_loads': 0, 'invalidations': 0, 'redis_errors': 0}
+        self.bus.add_handler(INVALIDATION_NAMESPACE, lambda user_id: self._drop_local_user(int(user_id)))
+
+    def _get_local(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.time():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def _set_local(self, key: str, data: Dict[str, Any], expires_at: float) -> None:
+        self.entries[key] = (expires_at, data)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _drop_local_user(self, user_id: int) -> None:
+        for key in [key for key, (_, data) in self.entries.items() if data['id'] == user_id]:
+            del self.entries[key]
+
+    async def _load(self, user_id: int) -> Optional[Dict[str, Any]]:
+        if self.session_factory is None:
+            from ..db import AsyncSessionLocal
+            self.session_factory = AsyncSessionLocal
+
+        async with self.session_factory() as db:
+            user = await db.scalar(select(User).where(User.id == user_id))
+            if not user:
+                return None
+            return {'id': user.id, 'email': user.email, 'created_at': user.created_at.isoformat()}
+
+    async def get_user(self, payload: Dict[str, Any], token: str) -> Optional[User]:
+        """The user a decoded token belongs to, or None if the user no longer exists"""
+        key = principal_key(payload, token)
+        data = self._get_local(key)
+        if data is not None:
+            self.metrics['local_hits'] += 1
+            return detached_user(data)
+
+        expires_at = min(time.time() + self.ttl, float(payload.get('exp', time.time() + self.ttl)))
+        ttl = int(expires_at - time.time())
+        loaded = []
+
+        async def load() -> Optional[Dict[str, Any]]:
+            loaded.append(key)
+            self.metrics['db_loads'] += 1
+            data = await self._load(int(payload['sub']))
+            if data is not None and ttl > 0:
+                await self._index_redis(key, data['id'])
+            return data
+
+        if ttl <= 0:
+            data = await load()
+        else:
+            # One load per token across all workers, however many requests arrive with it at once
+            try:
+                data = await self.redis.get_or_load(key, load, ex_seconds=ttl)
+            except RedisError:
+                self.metrics['redis_errors'] += 1
+                data = await load()
+        if data is None:
+            return None
+        if not loaded:
+            self.metrics['redis_hits'] += 1
+        self._set_local(key, data, expires_at)
+        return detached_user(data)
+
+    async def _index_redis(self, key: str, user_id: int) -> None:
+        """Index the user's tokens so invalidate_user can find them"""
+        try:
+            async with self.redis.pipeline() as pipe:
+                pipe.sadd(user_principals_key(user_id), key)
+                pipe.expire(user_principals_key(user_id), self.ttl)
+                await pipe.execute()
+        except Exception:
+            self.metrics['redis_errors'] += 1
+
+    async def invalidate_user(self, user_id: int) -> None:
+        """Drop every cached principal of a user on all workers, e.g. after the user changed"""
+        try:
+            index = user_principals_key(user_id)
+            keys = await self.redis.client.smembers(index)
+            await self.redis.client.delete(index, *keys)
+        except Exception:
+            self.metrics['redis_errors'] += 1
+        await self.bus.publish(INVALIDATION_NAMESPACE, str(user_id))
+        self.metrics['invalidations'] += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**self.metrics, 'local_entries': len(self.entries)}
+
+
+# Global principal cache instance
+principal_cache = PrincipalCache()
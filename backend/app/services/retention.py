@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from sqlalchemy import delete, select
+from ..config import Settings
+from ..models import ExecutionLog
+
+
+class LogRetention:
+    """Deletes execution logs past the retention window in small chunks, so no delete holds long locks"""
+
+    def __init__(self, retention_days: int = None, chunk_size: int = None, interval: float = None,
+                 chunk_pause: float = 0.05, session_factory=None) -> None:
+        self.retention_days = retention_days if retention_days is not None else Settings.log_retention_days
+        self.chunk_size = chunk_size or Settings.log_retention_chunk_size
+        self.interval = interval if interval is not None else Settings.log_retention_interval_minutes * 60
+        self.chunk_pause = chunk_pause
+        self.session_factory = session_factory
+        self.is_running = False
+        self.background_task = None
+        self.metrics: Dict[str, Any] = {'runs': 0, 'deleted': 0, 'last_run_at': None, 'last_deleted': 0}
+
+    async def start(self) -> None:
+        if self.is_running or self.retention_days <= 0:
+            return
+        self.is_running = True
+        self.background_task = asyncio.create_task(self._run())
+        print(f"🧹 Log retention started ({self.retention_days} days)")
+
+    async def stop(self) -> None:
+        self.is_running = False
+        if self.background_task:
+            self.background_task.cancel()
+            try:
+                await self.background_task
+            except asyncio.CancelledError:
+                pass
+            self.background_task = None
+
+    async def _run(self) -> None:
+        while self.is_running:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Error in log retention: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self, now: Optional[datetime] = None) -> int:
+        """Delete every log older than the retention window, one committed chunk at a time"""
+        cutoff = (now or datetime.utcnow()) - timedelta(days=self.retention_days)
+        loop = asyncio.get_event_loop()
+        total = 0
+        while True:
+            deleted = await loop.run_in_executor(None, self._delete_chunk, cutoff)
+            total += deleted
+            if deleted < self.chunk_size:
+                break
+            # Let other writers in between chunks
+            await asyncio.sleep(self.chunk_pause)
+
+        self.metrics['runs'] += 1
+        self.metrics['deleted'] += total
+        self.metrics['last_deleted'] = total
+        self.metrics['last_run_at'] = datetime.utcnow().isoformat()
+        return total
+
+    def _delete_chunk(self, cutoff: datetime) -> int:
+        if self.session_factory is None:
+            from ..db import SessionLocal
+            self.session_factory = SessionLocal
+
+        db = self.session_factory()
+        try:
+            # Walks ix_execution_logs_timestamp; the id list keeps each transaction small
+            ids = select(ExecutionLog.id).where(ExecutionLog.timestamp < cutoff).order_by(ExecutionLog.timestamp).limit(self.chunk_size)
+            result = db.execute(delete(ExecutionLog).where(ExecutionLog.id.in_(ids.scalar_subquery())))
+            db.commit()
+            return result.rowcount
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**self.metrics, 'retention_days': self.retention_days}
+
+
+# Global log retention instance
+log_retention = LogRetention()
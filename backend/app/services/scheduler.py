@@ -1,11 +1,16 @@
 import asyncio
+import heapq
+import itertools
 import json
 import uuid
+from collections import Counter, deque
 from datetime import datetime, timedelta
-from typing import Dict, Any, Callable, Optional
+from typing import Deque, Dict, Any, Callable, List, Optional, Tuple
 from enum import Enum
 from .cache import cache
 from .ably_service import ably_service
+from .checkpoints import execution_checkpointer
+from ..config import Settings
 
 
 class JobStatus(Enum):
@@ -16,11 +21,115 @@ class JobStatus(Enum):
     CANCELLED = "cancelled"
 
 
+def parse_weights(spec: str) -> Dict[str, int]:
+    """"interactive:4,bulk:1" -> {'interactive': 4, 'bulk': 1}"""
+    weights = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, weight = item.partition(':')
+        weights[name.strip()] = max(1, int(weight or 1))
+    return weights
+
+
+class FairQueue:
+    """Ready jobs in per-user FIFO sub-queues, grouped by priority class.
+
+    Classes are served by weighted deficit round robin (interactive gets more turns than
+    bulk, but bulk never starves), and so are the users within a class, so one user's
+    large backlog only delays that user. Users at their concurrency cap are skipped.
+    """
+
+    def __init__(self, class_weights: Dict[str, int], user_weights: Dict[str, int] = None,
+                 user_concurrency: int = None) -> None:
+        self.class_weights = class_weights
+        self.user_weights = user_weights or {}
+        self.user_concurrency = user_concurrency
+        self.queues: Dict[str, Dict[str, Deque[str]]] = {name: {} for name in class_weights}
+        # Users with queued jobs in each class, in round-robin order
+        self.active: Dict[str, Deque[str]] = {name: deque() for name in class_weights}
+        self.deficits: Dict[str, Dict[str, int]] = {name: {} for name in class_weights}
+        self.class_order: Deque[str] = deque(class_weights)
+        self.class_deficits: Dict[str, int] = dict.fromkeys(class_weights, 0)
+        self.running: Counter = Counter()
+        self.size = 0
+
+    def push(self, priority: str, user: str, job_id: str) -> None:
+        queues = self.queues[priority]
+        if user not in queues:
+            queues[user] = deque()
+            self.active[priority].append(user)
+        queues[user].append(job_id)
+        self.size += 1
+
+    def _pop_user(self, priority: str) -> Optional[Tuple[str, str]]:
+        active, queues, deficits = self.active[priority], self.queues[priority], self.deficits[priority]
+        for _ in range(len(active)):
+            user = active[0]
+            if self.user_concurrency and self.running[user] >= self.user_concurrency:
+                active.rotate(-1)
+                continue
+            if deficits.get(user, 0) < 1:
+                deficits[user] = deficits.get(user, 0) + self.user_weights.get(user, 1)
+            queue = queues[user]
+            job_id = queue.popleft()
+            deficits[user] -= 1
+            self.size -= 1
+            if not queue:
+                del queues[user]
+                active.popleft()
+                deficits.pop(user, None)
+            elif deficits[user] < 1:
+                active.rotate(-1)
+            return user, job_id
+        return None
+
+    def pop(self) -> Optional[Tuple[str, str, str]]:
+        """(priority, user, job id) of the next job to run, or None if nothing can run now"""
+        for _ in range(2 * len(self.class_order)):
+            priority = self.class_order[0]
+            if self.class_deficits[priority] < 1:
+                self.class_deficits[priority] += self.class_weights[priority]
+            item = self._pop_user(priority)
+            if item is None:
+                # Nothing runnable in this class: it keeps no credit for later
+                self.class_deficits[priority] = 0
+                self.class_order.rotate(-1)
+                continue
+            self.class_deficits[priority] -= 1
+            if self.class_deficits[priority] < 1:
+                self.class_order.rotate(-1)
+            return (priority, *item)
+        return None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            'queued': self.size,
+            'queued_by_class': {name: sum(len(queue) for queue in queues.values()) for name, queues in self.queues.items()},
+            'running_by_user': {user: count for user, count in self.running.items() if count},
+        }
+
+
 class JobScheduler:
-    def __init__(self):
+    def __init__(self, max_concurrency: int = None, user_concurrency: int = None,
+                 class_weights: Dict[str, int] = None, user_weights: Dict[str, int] = None):
         self.jobs: Dict[str, Dict[str, Any]] = {}
         self.is_running = False
         self.background_task = None
+        self.max_concurrency = max_concurrency or Settings.scheduler_max_concurrency
+        self.class_weights = class_weights or parse_weights(Settings.scheduler_class_weights)
+        self.default_priority = Settings.scheduler_default_priority
+        self.ready = FairQueue(self.class_weights, user_weights or parse_weights(Settings.scheduler_user_weights),
+                               user_concurrency or Settings.scheduler_user_concurrency)
+        # (scheduled_at, sequence, job id) of jobs that aren't due yet
+        self.delayed: List[Tuple[datetime, int, str]] = []
+        self._sequence = itertools.count()
+        # Jobs waiting to start, ready or delayed (cancelled ones are subtracted right away)
+        self.pending = 0
+        self.running_tasks: set = set()
+        self._wake = asyncio.Event()
+        self._last_cleanup = datetime.utcnow()
+        # user -> queueing delay stats, and the same per priority class
+        self.wait_stats: Dict[str, Dict[str, float]] = {}
+        self.class_wait_stats: Dict[str, Dict[str, float]] = {}
         
     async def start(self):
         """Start the job scheduler"""
@@ -40,40 +149,95 @@ class JobScheduler:
                 await self.background_task
             except asyncio.CancelledError:
                 pass
+        for task in list(self.running_tasks):
+            task.cancel()
         print("🕐 Job scheduler stopped")
     
     async def _run_scheduler(self):
         """Main scheduler loop"""
         while self.is_running:
             try:
-                # Process pending jobs
+                self._wake.clear()
+                
+                # Start due jobs, fairly, up to the concurrency limits
                 await self._process_jobs()
                 
                 # Clean up old completed jobs
-                await self._cleanup_old_jobs()
+                if datetime.utcnow() - self._last_cleanup > timedelta(minutes=1):
+                    await self._cleanup_old_jobs()
+                    self._last_cleanup = datetime.utcnow()
                 
-                # Wait before next iteration
-                await asyncio.sleep(1)
+                # Sleep until a job is scheduled or finishes, or the next delayed job is due
+                timeout = 1.0
+                if self.delayed:
+                    timeout = min(timeout, max(0.0, (self.delayed[0][0] - datetime.utcnow()).total_seconds()))
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
                 
             except Exception as e:
                 print(f"Error in scheduler loop: {e}")
                 await asyncio.sleep(5)
     
+    def _enqueue(self, job: Dict[str, Any]) -> None:
+        scheduled_at = datetime.fromisoformat(job['scheduled_at'])
+        if scheduled_at <= datetime.utcnow():
+            self.ready.push(job['priority'], job.get('user_id') or '', job['id'])
+        else:
+            heapq.heappush(self.delayed, (scheduled_at, next(self._sequence), job['id']))
+        self.pending += 1
+        self._wake.set()
+    
     async def _process_jobs(self):
-        """Process pending jobs"""
+        """Move due jobs to the ready queue, then start ready jobs while there are free slots"""
         current_time = datetime.utcnow()
+        while self.delayed and self.delayed[0][0] <= current_time:
+            _, _, job_id = heapq.heappop(self.delayed)
+            job = self.jobs.get(job_id)
+            if job and job['status'] == JobStatus.PENDING.value:
+                self.ready.push(job['priority'], job.get('user_id') or '', job_id)
         
-        for job_id, job in list(self.jobs.items()):
-            if job['status'] == JobStatus.PENDING.value:
-                scheduled_time = datetime.fromisoformat(job['scheduled_at'])
-                
-                if current_time >= scheduled_time:
-                    # Start the job
-                    await self._execute_job(job_id, job)
+        while len(self.running_tasks) < self.max_concurrency:
+            item = self.ready.pop()
+            if item is None:
+                break
+            priority, user, job_id = item
+            job = self.jobs.get(job_id)
+            if not job or job['status'] != JobStatus.PENDING.value:
+                # Cancelled or cleaned up while queued
+                continue
+            self.pending -= 1
+            self._record_wait(job, user, priority)
+            self.ready.running[user] += 1
+            task = asyncio.create_task(self._run_job(job_id, job, user))
+            self.running_tasks.add(task)
+    
+    async def _run_job(self, job_id: str, job: Dict[str, Any], user: str):
+        try:
+            await self._execute_job(job_id, job)
+        finally:
+            self.ready.running[user] -= 1
+            self.running_tasks.discard(asyncio.current_task())
+            # A slot is free; the user may have more queued
+            self._wake.set()
+    
+    def _record_wait(self, job: Dict[str, Any], user: str, priority: str) -> None:
+        """Time a job spent queued after it was due"""
+        due = max(datetime.fromisoformat(job['scheduled_at']), datetime.fromisoformat(job['created_at']))
+        wait_ms = max(0.0, (datetime.utcnow() - due).total_seconds() * 1000)
+        job['queue_wait_ms'] = round(wait_ms, 2)
+        for stats in (self.wait_stats.setdefault(user, {'jobs': 0, 'total_ms': 0.0, 'max_ms': 0.0}),
+                      self.class_wait_stats.setdefault(priority, {'jobs': 0, 'total_ms': 0.0, 'max_ms': 0.0})):
+            stats['jobs'] += 1
+            stats['total_ms'] += wait_ms
+            stats['max_ms'] = max(stats['max_ms'], wait_ms)
     
     async def _execute_job(self, job_id: str, job: Dict[str, Any]):
         """Execute a job"""
         try:
+            await execution_checkpointer.drop_job(job)
+            
             # Update job status to running
             job['status'] = JobStatus.RUNNING.value
             job['started_at'] = datetime.utcnow().isoformat()
@@ -82,7 +246,7 @@ class JobScheduler:
             self.jobs[job_id] = job
             
             # Publish real-time update
-            await ably_service.publish_job_status_update(job_id, job, job.get('user_id'))
+            ably_service.queue_job_status_update(job_id, job, job.get('user_id'))
             
             # Execute the job function
             if job['job_type'] == 'workflow_execution':
@@ -113,7 +277,7 @@ class JobScheduler:
             job['updated_at'] = datetime.utcnow().isoformat()
             
             # Publish real-time update
-            await ably_service.publish_job_status_update(job_id, job, job.get('user_id'))
+            ably_service.queue_job_status_update(job_id, job, job.get('user_id'))
             
         except Exception as e:
             # Mark job as failed
@@ -125,26 +289,31 @@ class JobScheduler:
             print(f"Job {job_id} failed: {e}")
             
             # Publish real-time update
-            await ably_service.publish_job_status_update(job_id, job, job.get('user_id'))
+            ably_service.queue_job_status_update(job_id, job, job.get('user_id'))
+            
+            if job['job_type'] == 'workflow_execution':
+                await self._end_execution(job, job['error'])
         
         finally:
             self.jobs[job_id] = job
     
     async def _execute_workflow_job(self, job: Dict[str, Any]):
         """Execute a workflow job"""
-        from .executor import WorkflowExecutor
-        from ..db import get_db
-        from ..models import Workflow, Execution
+        from .executor import workflow_executor
         
-        # This would be implemented to handle long-running workflow executions
-        # For now, we'll simulate the execution
-        await asyncio.sleep(2)  # Simulate work
+        execution = await workflow_executor.run_execution(job['execution_id'])
+        job['result'] = {'status': execution['status'], 'steps': len(execution['steps'])}
+        if execution['status'] == 'failed':
+            raise Exception(execution.get('error') or 'Workflow execution failed')
+    
+    async def _end_execution(self, job: Dict[str, Any], error: str, status: str = 'failed') -> None:
+        """Release the execution of a workflow job that was cancelled or failed outside the executor"""
+        from .executor import workflow_executor
         
-        # In a real implementation, you would:
-        # 1. Get the workflow from database
-        # 2. Create execution record
-        # 3. Run the workflow executor
-        # 4. Update execution status
+        try:
+            await workflow_executor.end_execution(job['execution_id'], error, status=status)
+        except Exception as e:
+            print(f"Error ending execution {job['execution_id']}: {e}")
     
     async def _execute_email_job(self, job: Dict[str, Any]):
         """Execute an email job"""
@@ -176,15 +345,18 @@ class JobScheduler:
         for job_id in jobs_to_remove:
             del self.jobs[job_id]
     
-    async def schedule_job(self, job_type: str, scheduled_at: datetime, 
-                          function: Optional[Callable] = None, 
-                          args: list = None, kwargs: dict = None,
-                          user_id: Optional[str] = None,
-                          **job_data) -> str:
-        """Schedule a new job"""
+    def _priority(self, priority: Optional[str]) -> str:
+        return priority if priority in self.class_weights else self.default_priority
+    
+    def _new_job(self, job_type: str, scheduled_at: datetime,
+                 function: Optional[Callable] = None,
+                 args: list = None, kwargs: dict = None,
+                 user_id: Optional[str] = None,
+                 priority: Optional[str] = None,
+                 **job_data) -> Dict[str, Any]:
         job_id = str(uuid.uuid4())
         
-        job = {
+        return {
             'id': job_id,
             'job_id': job_id,  # Add job_id for consistency with frontend
             'job_type': job_type,
@@ -197,20 +369,38 @@ class JobScheduler:
             'kwargs': kwargs or {},
             'user_id': user_id,
             'created_by': user_id,  # Add created_by field for user tracking
+            'priority': self._priority(priority),
             **job_data
         }
+    
+    def pending_count(self) -> int:
+        """Jobs waiting to start"""
+        return self.pending
+    
+    async def schedule_job(self, job_type: str, scheduled_at: datetime, 
+                          function: Optional[Callable] = None, 
+                          args: list = None, kwargs: dict = None,
+                          user_id: Optional[str] = None,
+                          priority: Optional[str] = None,
+                          **job_data) -> str:
+        """Schedule a new job"""
+        job = self._new_job(job_type, scheduled_at, function, args, kwargs, user_id, priority, **job_data)
+        job_id = job['id']
         
         self.jobs[job_id] = job
+        self._enqueue(job)
+        await execution_checkpointer.save_job(job)
         print(f"📅 Scheduled job {job_id} of type {job_type} for {scheduled_at}")
         
         # Publish real-time update for new job
         if user_id:
-            await ably_service.publish_job_status_update(job_id, job, user_id)
+            ably_service.queue_job_status_update(job_id, job, user_id)
         
         return job_id
     
     async def schedule_workflow_execution(self, workflow_id: int, execution_id: int, 
-                                        scheduled_at: datetime = None, user_id: Optional[str] = None) -> str:
+                                        scheduled_at: datetime = None, user_id: Optional[str] = None,
+                                        priority: Optional[str] = None) -> str:
         """Schedule a workflow execution"""
         if scheduled_at is None:
             scheduled_at = datetime.utcnow()
@@ -220,11 +410,43 @@ class JobScheduler:
             scheduled_at=scheduled_at,
             workflow_id=workflow_id,
             execution_id=execution_id,
-            user_id=user_id
+            user_id=user_id,
+            priority=priority
         )
     
+    async def schedule_workflow_executions(self, workflow_id: int, execution_ids: List[str],
+                                         scheduled_at: datetime = None, user_id: Optional[str] = None,
+                                         priority: Optional[str] = None) -> List[str]:
+        """Schedule many executions of one workflow in a single operation"""
+        if scheduled_at is None:
+            scheduled_at = datetime.utcnow()
+        
+        jobs = [
+            self._new_job('workflow_execution', scheduled_at, user_id=user_id, priority=priority,
+                          workflow_id=workflow_id, execution_id=execution_id)
+            for execution_id in execution_ids
+        ]
+        self.jobs.update((job['id'], job) for job in jobs)
+        for job in jobs:
+            self._enqueue(job)
+        print(f"📅 Scheduled {len(jobs)} workflow_execution jobs for {scheduled_at}")
+        
+        if user_id:
+            for job in jobs:
+                ably_service.queue_job_status_update(job['id'], job, user_id)
+        
+        return [job['id'] for job in jobs]
+    
+    def restore_jobs(self, jobs: List[Dict[str, Any]]) -> None:
+        """Re-queue pending jobs checkpointed before a restart, keeping their ids"""
+        for job in jobs:
+            if job['id'] not in self.jobs:
+                self.jobs[job['id']] = job
+                self._enqueue(job)
+    
     async def schedule_email_send(self, email_data: Dict[str, Any], 
-                                scheduled_at: datetime = None, user_id: Optional[str] = None) -> str:
+                                scheduled_at: datetime = None, user_id: Optional[str] = None,
+                                priority: Optional[str] = None) -> str:
         """Schedule an email send job"""
         if scheduled_at is None:
             scheduled_at = datetime.utcnow()
@@ -233,7 +455,8 @@ class JobScheduler:
             job_type='email_send',
             scheduled_at=scheduled_at,
             email_data=email_data,
-            user_id=user_id
+            user_id=user_id,
+            priority=priority
         )
     
     async def get_job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
@@ -245,14 +468,19 @@ class JobScheduler:
         if job_id in self.jobs:
             job = self.jobs[job_id]
             if job['status'] == JobStatus.PENDING.value:
+                # Its queue entry is skipped when it comes up
+                self.pending -= 1
                 job['status'] = JobStatus.CANCELLED.value
                 job['cancelled_at'] = datetime.utcnow().isoformat()
                 job['job_id'] = job_id  # Ensure job_id is always present
                 job['updated_at'] = datetime.utcnow().isoformat()
                 self.jobs[job_id] = job
+                await execution_checkpointer.drop_job(job)
+                if job['job_type'] == 'workflow_execution':
+                    await self._end_execution(job, 'Cancelled before it started', status=JobStatus.CANCELLED.value)
                 
                 # Publish real-time update
-                await ably_service.publish_job_status_update(job_id, job, job.get('user_id'))
+                ably_service.queue_job_status_update(job_id, job, job.get('user_id'))
                 
                 return True
         return False
@@ -274,6 +502,20 @@ class JobScheduler:
         # await ably_service.publish_job_list_update(user_id, user_jobs)
         
         return user_jobs
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        def summarize(stats: Dict[str, float]) -> Dict[str, float]:
+            return {'jobs': stats['jobs'], 'avg_wait_ms': round(stats['total_ms'] / stats['jobs'], 2), 'max_wait_ms': round(stats['max_ms'], 2)}
+        
+        return {
+            **self.ready.get_metrics(),
+            'pending': self.pending,
+            'delayed': len(self.delayed),
+            'running': len(self.running_tasks),
+            'max_concurrency': self.max_concurrency,
+            'wait_by_class': {name: summarize(stats) for name, stats in self.class_wait_stats.items()},
+            'wait_by_user': {user: summarize(stats) for user, stats in self.wait_stats.items()},
+        }
 
 # Global job scheduler instance
 job_scheduler = JobScheduler()
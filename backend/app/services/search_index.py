@@ -0,0 +1,245 @@
+import asyncio
+import heapq
+import math
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+from sqlalchemy import select
+from ..config import Settings
+from ..models import Ticket
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# Title matches count more than description matches, like setweight 'A' vs 'B' in PostgreSQL
+TITLE_WEIGHT = 2
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Metadata kept per ticket so filtered searches never touch the database
+FILTER_FIELDS = ('status', 'assigned_to', 'user_id')
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+def ticket_terms(title: Optional[str], description: Optional[str]) -> Counter:
+    """Weighted term frequencies of a ticket"""
+    terms = Counter()
+    for term in tokenize(title):
+        terms[term] += TITLE_WEIGHT
+    for term in tokenize(description):
+        terms[term] += 1
+    return terms
+
+
+def tsquery(query: str) -> Optional[str]:
+    """A prefix-matching PostgreSQL tsquery in which every word of the query must match"""
+    terms = tokenize(query)
+    return ' & '.join(f"{term}:*" for term in terms) if terms else None
+
+
+class TicketSearchIndex:
+    """In-process inverted index over ticket titles and descriptions.
+
+    Used where PostgreSQL full-text search isn't available (e.g. SQLite). Every query word
+    must match, as a prefix of an indexed term, and results are ranked with BM25. The index
+    is built from the database on first use and kept current by the ticket router.
+    """
+
+    def __init__(self, session_factory=None, batch_size: int = 5000) -> None:
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        # term -> {ticket id: weighted term frequency}
+        self.postings: Dict[str, Dict[int, int]] = {}
+        # Sorted copy of the postings' terms, for prefix lookups by bisection
+        self.terms: List[str] = []
+        # ticket id -> (terms, document length, filter fields)
+        self.documents: Dict[int, Tuple[Counter, int, Dict[str, Any]]] = {}
+        self.total_length = 0
+        self.loaded = False
+        self.building = False
+        # Changes made while the index is being built, applied once it's done
+        self._pending: List[Tuple[str, Any]] = []
+        self._build_lock = asyncio.Lock()
+        self.is_running = False
+        self.background_task = None
+        self.metrics: Dict[str, Any] = {'searches': 0, 'builds': 0, 'updates': 0}
+
+    # Index maintenance
+
+    def _index(self, ticket_id: int, terms: Counter, fields: Dict[str, Any]) -> None:
+        self._unindex(ticket_id)
+        for term, frequency in terms.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                insort(self.terms, term)
+            postings[ticket_id] = frequency
+        length = sum(terms.values())
+        self.documents[ticket_id] = (terms, length, fields)
+        self.total_length += length
+
+    def _unindex(self, ticket_id: int) -> None:
+        document = self.documents.pop(ticket_id, None)
+        if document is None:
+            return
+        terms, length, _ = document
+        self.total_length -= length
+        for term in terms:
+            postings = self.postings[term]
+            del postings[ticket_id]
+            if not postings:
+                del self.postings[term]
+                del self.terms[bisect_left(self.terms, term)]
+
+    def add(self, ticket: Ticket) -> None:
+        """Index a created or updated ticket"""
+        fields = {name: getattr(ticket, name) for name in FILTER_FIELDS}
+        self._apply('add', (ticket.id, ticket_terms(ticket.title, ticket.description), fields))
+
+    def remove(self, ticket_id: int) -> None:
+        self._apply('remove', ticket_id)
+
+    def _apply(self, action: str, args: Any) -> None:
+        if self.building:
+            self._pending.append((action, args))
+            return
+        if not self.loaded:
+            # The first search builds the index from the database, including this change
+            return
+        self.metrics['updates'] += 1
+        if action == 'add':
+            self._index(*args)
+        else:
+            self._unindex(args)
+
+    async def ensure_loaded(self) -> None:
+        if self.loaded:
+            return
+        async with self._build_lock:
+            if not self.loaded:
+                await self.build()
+
+    async def build(self) -> None:
+        """(Re)build the index from the tickets table, in id order and in batches"""
+        if self.session_factory is None:
+            from ..db import AsyncSessionLocal
+            self.session_factory = AsyncSessionLocal
+
+        self.building = True
+        self.loaded = False
+        self.postings, self.terms, self.documents, self.total_length = {}, [], {}, 0
+        try:
+            async with self.session_factory() as db:
+                last_id = 0
+                while True:
+                    result = await db.execute(
+                        select(Ticket.id, Ticket.title, Ticket.description, *[getattr(Ticket, name) for name in FILTER_FIELDS])
+                        .where(Ticket.id > last_id).order_by(Ticket.id).limit(self.batch_size)
+                    )
+                    rows = result.all()
+                    for row in rows:
+                        self._index(row.id, ticket_terms(row.title, row.description), {name: getattr(row, name) for name in FILTER_FIELDS})
+                    if len(rows) < self.batch_size:
+                        break
+                    last_id = rows[-1].id
+                    # Let requests run between batches
+                    await asyncio.sleep(0)
+        finally:
+            self.building = False
+        self.loaded = True
+        pending, self._pending = self._pending, []
+        for action, args in pending:
+            self._apply(action, args)
+        self.metrics['builds'] += 1
+
+    async def start(self) -> None:
+        """Warm the index in the background so the first search doesn't pay for it"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self.background_task = asyncio.create_task(self.ensure_loaded())
+        print("🔎 Ticket search index warming up")
+
+    async def stop(self) -> None:
+        self.is_running = False
+        if self.background_task:
+            self.background_task.cancel()
+            try:
+                await self.background_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self.background_task = None
+
+    def clear(self) -> None:
+        self.postings, self.terms, self.documents, self.total_length = {}, [], {}, 0
+        self.loaded = False
+
+    # Queries
+
+    def _expand(self, prefix: str) -> List[str]:
+        """Indexed terms starting with prefix"""
+        start = bisect_left(self.terms, prefix)
+        end = bisect_left(self.terms, prefix + '\U0010ffff')
+        return self.terms[start:end]
+
+    def search(self, query: str, limit: int = 20, filters: Dict[str, Any] = None) -> Tuple[List[Tuple[int, float]], int]:
+        """Best matches as (ticket id, score), highest score first, and the number of matches"""
+        self.metrics['searches'] += 1
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words or not self.documents:
+            return [], 0
+        filters = {name: value for name, value in (filters or {}).items() if value is not None}
+
+        # Each word matches every term it prefixes
+        expansions = [self._expand(word) for word in words]
+        if not all(expansions):
+            return [], 0
+        matches: List[Set[int]] = []
+        for terms in expansions:
+            ids: Set[int] = set()
+            for term in terms:
+                ids.update(self.postings[term])
+            matches.append(ids)
+        matches.sort(key=len)
+        candidates = matches[0].intersection(*matches[1:])
+        if filters:
+            candidates = {
+                ticket_id for ticket_id in candidates
+                if all(self.documents[ticket_id][2][name] == value for name, value in filters.items())
+            }
+
+        count = len(self.documents)
+        average_length = self.total_length / count if count else 1
+        scores = dict.fromkeys(candidates, 0.0)
+        for terms in expansions:
+            for term in terms:
+                postings = self.postings[term]
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                # Walk whichever side is smaller
+                smaller, larger = (candidates, postings) if len(candidates) < len(postings) else (postings, candidates)
+                for ticket_id in smaller:
+                    if ticket_id not in larger:
+                        continue
+                    frequency = postings[ticket_id]
+                    length = self.documents[ticket_id][1]
+                    scores[ticket_id] += idf * frequency * (K1 + 1) / (frequency + K1 * (1 - B + B * length / average_length))
+
+        # Newer tickets (higher ids) win ties
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+        return best, len(scores)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**self.metrics, 'loaded': self.loaded, 'documents': len(self.documents), 'terms': len(self.terms)}
+
+
+def use_postgres_search(dialect_name: str) -> bool:
+    """Whether ticket search runs on PostgreSQL's full-text index rather than the in-process one"""
+    if Settings.ticket_search_backend == 'memory':
+        return False
+    return dialect_name == 'postgresql'
+
+
+# Global ticket search index
+ticket_search_index = TicketSearchIndex()
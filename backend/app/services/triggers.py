@@ -0,0 +1,184 @@
+import asyncio
+from typing import Any, Dict, List, Set, Tuple
+from sqlalchemy import select
+from .admission import Overloaded, admission_controller
+from .conditions import evaluate_condition
+from .event_bus import DomainEvent
+from .executor import workflow_executor
+from .invalidation import invalidation_bus
+from .workflow_cache import INVALIDATION_NAMESPACE
+from ..config import Settings
+from ..models import Execution, Workflow
+
+
+def event_triggers(definition: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The definition's triggers that listen for a named event"""
+    return [trigger for trigger in (definition or {}).get('triggers', []) if trigger.get('event')]
+
+
+def trigger_matches(trigger: Dict[str, Any], event: DomainEvent) -> bool:
+    # A trigger without a condition fires on every event of its name
+    return trigger['event'] == event.name and ('condition' not in trigger or evaluate_condition(trigger['condition'], event.payload))
+
+
+class TriggerIndex:
+    """Event name -> workflows with a trigger for it, so dispatch never scans every workflow.
+
+    Built from the database on first use. Workflows that change are marked dirty through
+    the workflow cache's invalidation messages and reloaded before the next lookup.
+    """
+
+    def __init__(self, bus=None, session_factory=None) -> None:
+        self.bus = bus or invalidation_bus
+        self.session_factory = session_factory
+        # workflow id -> (owner id, event triggers)
+        self.workflows: Dict[int, Tuple[int, List[Dict[str, Any]]]] = {}
+        self.by_event: Dict[str, Set[int]] = {}
+        self.loaded = False
+        self.dirty: Set[int] = set()
+        self._lock = asyncio.Lock()
+        self.bus.add_handler(INVALIDATION_NAMESPACE, lambda key: self.dirty.add(int(key)))
+
+    def _set(self, workflow_id: int, user_id: int, definition: Dict[str, Any]) -> None:
+        self._drop(workflow_id)
+        triggers = event_triggers(definition)
+        if not triggers:
+            return
+        self.workflows[workflow_id] = (user_id, triggers)
+        for trigger in triggers:
+            self.by_event.setdefault(trigger['event'], set()).add(workflow_id)
+
+    def _drop(self, workflow_id: int) -> None:
+        entry = self.workflows.pop(workflow_id, None)
+        if entry is None:
+            return
+        for trigger in entry[1]:
+            workflow_ids = self.by_event.get(trigger['event'])
+            if workflow_ids is not None:
+                workflow_ids.discard(workflow_id)
+                if not workflow_ids:
+                    del self.by_event[trigger['event']]
+
+    async def _refresh(self) -> None:
+        if self.session_factory is None:
+            from ..db import AsyncSessionLocal
+            self.session_factory = AsyncSessionLocal
+
+        async with self._lock:
+            if self.loaded and not self.dirty:
+                return
+            query = select(Workflow.id, Workflow.user_id, Workflow.definition)
+            if self.loaded:
+                workflow_ids, self.dirty = self.dirty, set()
+                query = query.where(Workflow.id.in_(workflow_ids))
+            else:
+                # Anything marked dirty so far is covered by the full load
+                workflow_ids, self.dirty = set(), set()
+            async with self.session_factory() as db:
+                rows = (await db.execute(query)).all()
+            # Workflows that are gone (deleted) drop out of the index
+            for workflow_id in workflow_ids:
+                self._drop(workflow_id)
+            for row in rows:
+                self._set(row.id, row.user_id, row.definition)
+            self.loaded = True
+
+    async def lookup(self, event_name: str) -> List[Tuple[int, int, List[Dict[str, Any]]]]:
+        """(workflow id, owner id, event triggers) of every workflow listening for event_name"""
+        if not self.loaded or self.dirty:
+            await self._refresh()
+        return [(workflow_id, *self.workflows[workflow_id]) for workflow_id in self.by_event.get(event_name, ())]
+
+    def clear(self) -> None:
+        self.workflows.clear()
+        self.by_event.clear()
+        self.dirty.clear()
+        self.loaded = False
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {'workflows': len(self.workflows), 'events': len(self.by_event), 'dirty': len(self.dirty)}
+
+
+class TriggerDispatcher:
+    """Starts an execution of every workflow whose trigger matches a domain event.
+
+    Executions are only created once admission control has room for them. While it
+    doesn't, dispatch waits, which holds up the bus consumer so the ingestion queue fills
+    and POST /events answers 503; after admission_retries waits the events are shed.
+    """
+
+    def __init__(self, index: TriggerIndex = None, session_factory=None, admission_retries: int = None) -> None:
+        self.index = index or TriggerIndex()
+        self.session_factory = session_factory
+        self.admission_retries = Settings.trigger_admission_retries if admission_retries is None else admission_retries
+        self.metrics: Dict[str, int] = {'events': 0, 'matched': 0, 'executions': 0, 'throttled': 0, 'shed': 0}
+
+    async def match(self, events: List[DomainEvent]) -> List[Tuple[int, int, DomainEvent]]:
+        """(workflow id, owner id, event) for every workflow an event should start"""
+        matched = []
+        for event in events:
+            for workflow_id, user_id, triggers in await self.index.lookup(event.name):
+                if event.owner_id is not None and user_id != event.owner_id:
+                    continue
+                if event.workflow_id is not None and workflow_id != event.workflow_id:
+                    continue
+                if any(trigger_matches(trigger, event) for trigger in triggers):
+                    matched.append((workflow_id, user_id, event))
+        return matched
+
+    async def dispatch(self, events: List[DomainEvent]) -> List[int]:
+        """Create the executions for a batch of events in one transaction, then schedule them"""
+        self.metrics['events'] += len(events)
+        matched = await self.match(events)
+        self.metrics['matched'] += len(matched)
+        if not matched or not await self._admit(len(matched)):
+            return []
+
+        if self.session_factory is None:
+            from ..db import AsyncSessionLocal
+            self.session_factory = AsyncSessionLocal
+
+        async with self.session_factory() as db:
+            executions = [
+                Execution(workflow_id=workflow_id, status='pending', trigger_data=event.payload)
+                for workflow_id, _, event in matched
+            ]
+            db.add_all(executions)
+            await db.commit()
+
+        # One scheduler call per workflow
+        groups: Dict[Tuple[int, int], List[Tuple[DomainEvent, Execution]]] = {}
+        for (workflow_id, user_id, event), execution in zip(matched, executions):
+            groups.setdefault((workflow_id, user_id), []).append((event, execution))
+        for (workflow_id, user_id), items in groups.items():
+            await workflow_executor.execute_workflows(
+                workflow_id=workflow_id,
+                payloads=[event.payload for event, _ in items],
+                user_id=str(user_id),
+                db_execution_ids=[execution.id for _, execution in items]
+            )
+        self.metrics['executions'] += len(executions)
+        return [execution.id for execution in executions]
+
+    async def _admit(self, new_executions: int) -> bool:
+        """Wait until admission control has room for new_executions, or give up after admission_retries waits"""
+        for attempt in range(self.admission_retries + 1):
+            try:
+                admission_controller.check_capacity(new_executions)
+            except Overloaded as e:
+                if attempt == self.admission_retries:
+                    self.metrics['shed'] += new_executions
+                    print(f"⚠️ Overloaded ({e.reason}), shed {new_executions} triggered executions")
+                    return False
+                self.metrics['throttled'] += 1
+                await asyncio.sleep(e.retry_after)
+                continue
+            admission_controller.reserve(new_executions)
+            return True
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**self.metrics, 'index': self.index.get_metrics()}
+
+
+# Global trigger dispatcher
+trigger_dispatcher = TriggerDispatcher()
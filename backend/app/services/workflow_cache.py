@@ -0,0 +1,180 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from .cache import async_cache
+from .invalidation import invalidation_bus
+from ..config import Settings
+from ..models import Workflow
+from ..schemas import WorkflowOut
+
+INVALIDATION_NAMESPACE = "workflow"
+
+
+def workflow_key(workflow_id: int) -> str:
+    return f"workflow:{workflow_id}"
+
+
+def serialize_workflow(wf: Workflow) -> Dict[str, Any]:
+    """The one shape stored in every cache tier; includes user_id for ownership checks"""
+    return WorkflowOut.model_validate(wf).model_dump(mode='json')
+
+
+class WorkflowCache:
+    """Read-through workflow cache: in-process LRU with TTL, then Redis, then the database.
+
+    Redis misses go through async_cache.get_or_load, so when a hot workflow expires one
+    caller across all workers loads it while the rest wait for that result.
+    """
+
+    def __init__(self, redis_cache=None, bus=None, max_entries: int = None, local_ttl: float = None,
+                 redis_ttl: int = None, session_factory=None) -> None:
+        self.redis = redis_cache or async_cache
+        self.bus = bus or invalidation_bus
+        self.max_entries = max_entries or Settings.workflow_cache_size
+        self.local_ttl = local_ttl if local_ttl is not None else Settings.workflow_cache_ttl_seconds
+        self.redis_ttl = redis_ttl or Settings.workflow_cache_redis_ttl_seconds
+        self.session_factory = session_factory
+        # workflow_id -> (expires_at, workflow dict), least recently used first
+        self.entries: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.metrics: Dict[str, int] = {'local_hits': 0, 'redis_hits': 0, 'db_loads': 0, 'invalidations': 0, 'redis_errors': 0}
+        self.bus.add_handler(INVALIDATION_NAMESPACE, lambda key: self._drop_local(int(key)))
+
+    def _get_local(self, workflow_id: int) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(workflow_id)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self.entries[workflow_id]
+            return None
+        self.entries.move_to_end(workflow_id)
+        return entry[1]
+
+    def _set_local(self, data: Dict[str, Any]) -> None:
+        self.entries[data['id']] = (time.monotonic() + self.local_ttl, data)
+        self.entries.move_to_end(data['id'])
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _drop_local(self, workflow_id: int) -> None:
+        self.entries.pop(workflow_id, None)
+
+    async def _set_redis(self, data: Dict[str, Any]) -> None:
+        try:
+            await self.redis.set_many_loaded({workflow_key(data['id']): data}, ex_seconds=self.redis_ttl)
+        except Exception:
+            self.metrics['redis_errors'] += 1
+
+    async def _delete_redis(self, workflow_id: int) -> None:
+        try:
+            await self.redis.delete(workflow_key(workflow_id))
+        except Exception:
+            self.metrics['redis_errors'] += 1
+
+    async def _load(self, workflow_id: int) -> Optional[Dict[str, Any]]:
+        loaded = await self._load_many([workflow_id])
+        return loaded.get(workflow_id)
+
+    async def _load_many(self, workflow_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        if self.session_factory is None:
+            from ..db import AsyncSessionLocal
+            self.session_factory = AsyncSessionLocal
+
+        async with self.session_factory() as db:
+            result = await db.execute(select(Workflow).where(Workflow.id.in_(workflow_ids)))
+            return {wf.id: serialize_workflow(wf) for wf in result.scalars()}
+
+    async def get(self, workflow_id: int) -> Optional[Dict[str, Any]]:
+        data = self._get_local(workflow_id)
+        if data is not None:
+            self.metrics['local_hits'] += 1
+            return data
+
+        loaded = []
+
+        async def load() -> Optional[Dict[str, Any]]:
+            loaded.append(workflow_id)
+            self.metrics['db_loads'] += 1
+            return await self._load(workflow_id)
+
+        try:
+            data = await self.redis.get_or_load(workflow_key(workflow_id), load, ex_seconds=self.redis_ttl)
+        except RedisError:
+            # Redis unavailable: go to the database
+            self.metrics['redis_errors'] += 1
+            data = await load()
+        if data is None:
+            return None
+        if not loaded:
+            self.metrics['redis_hits'] += 1
+        self._set_local(data)
+        return data
+
+    async def get_many(self, workflow_ids: List[int]) -> List[Dict[str, Any]]:
+        """Workflows in the given order: local hits, then one MGET, then one database query"""
+        found: Dict[int, Dict[str, Any]] = {}
+        missing = []
+        for workflow_id in workflow_ids:
+            data = self._get_local(workflow_id)
+            if data is not None:
+                found[workflow_id] = data
+            else:
+                missing.append(workflow_id)
+        self.metrics['local_hits'] += len(found)
+
+        if missing:
+            try:
+                cached = await self.redis.get_many_loaded(workflow_key(workflow_id) for workflow_id in missing)
+            except Exception:
+                self.metrics['redis_errors'] += 1
+                cached = {}
+            self.metrics['redis_hits'] += len(cached)
+            for data in cached.values():
+                found[data['id']] = data
+                self._set_local(data)
+
+            missing = [workflow_id for workflow_id in missing if workflow_id not in found]
+            if missing:
+                loaded = await self._load_many(missing)
+                self.metrics['db_loads'] += 1
+                try:
+                    await self.redis.set_many_loaded({workflow_key(workflow_id): data for workflow_id, data in loaded.items()}, ex_seconds=self.redis_ttl)
+                except Exception:
+                    self.metrics['redis_errors'] += 1
+                for data in loaded.values():
+                    found[data['id']] = data
+                    self._set_local(data)
+
+        return [found[workflow_id] for workflow_id in workflow_ids if workflow_id in found]
+
+    async def get_owned(self, workflow_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+        """The workflow if it exists and belongs to user_id"""
+        data = await self.get(workflow_id)
+        if data is None or data['user_id'] != user_id:
+            return None
+        return data
+
+    async def put(self, wf: Workflow) -> Dict[str, Any]:
+        """Store a created or updated workflow and drop stale copies on every worker"""
+        data = serialize_workflow(wf)
+        await self._set_redis(data)
+        await self.bus.publish(INVALIDATION_NAMESPACE, str(wf.id))
+        self.metrics['invalidations'] += 1
+        self._set_local(data)
+        return data
+
+    async def evict(self, workflow_id: int) -> None:
+        await self._delete_redis(workflow_id)
+        await self.bus.publish(INVALIDATION_NAMESPACE, str(workflow_id))
+        self.metrics['invalidations'] += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**self.metrics, 'local_entries': len(self.entries)}
+
+
+# Global workflow cache instance
+workflow_cache = WorkflowCache()
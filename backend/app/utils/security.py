@@ -1,15 +1,26 @@
+import uuid
+from functools import lru_cache
 from datetime import datetime, timedelta
 from typing import Any, Dict
 import jwt
 from passlib.context import CryptContext
 from ..config import Settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+@lru_cache(maxsize=None)
+def get_pwd_context(rounds: int) -> CryptContext:
+    # min_rounds makes hashes with a lower cost report needs_update, so they are upgraded on login
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+
+
+pwd_context = get_pwd_context(Settings.bcrypt_rounds)
 
 
 def create_access_token(subject: int, expires_minutes: int | None = None) -> str:
     expire = datetime.utcnow() + timedelta(minutes=expires_minutes or Settings.access_token_expire_minutes)
-    to_encode: Dict[str, Any] = {"sub": str(subject), "exp": expire}
+    # jti identifies the token in the principal cache
+    to_encode: Dict[str, Any] = {"sub": str(subject), "exp": expire, "jti": uuid.uuid4().hex}
     return jwt.encode(to_encode, Settings.jwt_secret_key, algorithm=Settings.jwt_algorithm)
 
 
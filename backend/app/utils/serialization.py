@@ -0,0 +1,106 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+from uuid import UUID
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from ..config import Settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def _default(obj: Any) -> Any:
+    """Fallback for types the JSON backends don't encode natively"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode='json')
+    if isinstance(obj, (Decimal, UUID)):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return str(obj)
+
+
+class StdlibSerializer:
+    name = 'json'
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        return json.dumps(obj, default=_default, separators=(',', ':')).encode()
+
+    def loads(self, data: str | bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonSerializer:
+    name = 'orjson'
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data: str | bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MsgspecSerializer:
+    name = 'msgspec'
+
+    def __init__(self) -> None:
+        self.encoder = msgspec.json.Encoder(enc_hook=_default)
+        self.decoder = msgspec.json.Decoder()
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        return self.encoder.encode(obj)
+
+    def loads(self, data: str | bytes) -> Any:
+        return self.decoder.decode(data)
+
+
+def create_serializer(backend: str = None):
+    """Pick the JSON backend: JSON_BACKEND if set, otherwise orjson, then msgspec, then the stdlib"""
+    backend = backend or Settings.json_backend
+    if backend in ('auto', 'orjson') and orjson is not None:
+        return OrjsonSerializer()
+    if backend in ('auto', 'msgspec') and msgspec is not None:
+        return MsgspecSerializer()
+    return StdlibSerializer()
+
+
+serializer = create_serializer()
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    return serializer.dumps_bytes(obj)
+
+
+def dumps(obj: Any) -> str:
+    return serializer.dumps_bytes(obj).decode()
+
+
+def loads(data: str | bytes) -> Any:
+    return serializer.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered by the fastest available backend.
+
+    Return it directly from an endpoint to skip FastAPI's jsonable_encoder pass;
+    pydantic models are rendered by pydantic's own JSON serializer.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.model_dump_json().encode()
+        return serializer.dumps_bytes(content)
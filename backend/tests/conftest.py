@@ -0,0 +1,55 @@
+import os
+import tempfile
+
+# Tests run against a throwaway SQLite database; must be set before the app is imported
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+os.environ.setdefault("ARCHIVE_DIR", tempfile.mkdtemp())
+
+import pytest
+from fastapi.testclient import TestClient
+from app.db import Base, SessionLocal, engine
+from app.deps import get_current_user
+from app.main import app
+from app.models import User
+from app.services.principal_cache import principal_cache
+from app.services.search_index import ticket_search_index
+from app.services.triggers import trigger_dispatcher
+from app.services.admission import admission_controller
+from app.services.execution_store import execution_store
+from app.services.workflow_cache import workflow_cache
+
+
+@pytest.fixture
+def db_session():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+        # Ids are reused once the tables are recreated
+        workflow_cache.clear()
+        principal_cache.clear()
+        ticket_search_index.clear()
+        trigger_dispatcher.index.clear()
+        admission_controller.buckets.clear()
+        execution_store.clear()
+
+
+@pytest.fixture
+def user(db_session):
+    user = User(email="owner@example.com", password_hash="x")
+    db_session.add(user)
+    db_session.commit()
+    db_session.refresh(user)
+    return user
+
+
+@pytest.fixture
+def client(user):
+    app.dependency_overrides[get_current_user] = lambda: user
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
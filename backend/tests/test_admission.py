@@ -0,0 +1,69 @@
+import pytest
+from app.services import admission as admission_module
+from app.services.admission import AdmissionController, Overloaded, TokenBucket
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    controller = AdmissionController(max_pending_jobs=5, max_inflight=5, max_loop_lag_ms=100,
+                                     user_rate=1, user_burst=2, retry_after=3)
+    # Signals are set by the tests rather than read from the scheduler
+    monkeypatch.setattr(controller, 'sample', lambda: None)
+    monkeypatch.setattr(admission_module, 'admission_controller', controller)
+    monkeypatch.setattr('app.deps.admission_controller', controller)
+    monkeypatch.setattr('app.routers.workflows.admission_controller', controller)
+    return controller
+
+
+def test_token_bucket_refills_over_time(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(admission_module.time, 'monotonic', lambda: now[0])
+    bucket = TokenBucket(rate=2, burst=2)
+
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert bucket.take() == pytest.approx(0.5)
+    now[0] += 0.5
+    assert bucket.take() == 0
+
+
+def test_sheds_on_queue_depth_inflight_and_loop_lag(controller):
+    controller.admit(1)
+    controller.pending_jobs = 5
+    with pytest.raises(Overloaded) as error:
+        controller.admit(2)
+    assert (error.value.reason, error.value.retry_after) == ('pending_jobs', 3)
+
+    controller.pending_jobs, controller.inflight = 0, 5
+    with pytest.raises(Overloaded, match='inflight'):
+        controller.admit(2)
+
+    controller.inflight, controller.loop_lag_ms = 0, 250
+    with pytest.raises(Overloaded, match='loop_lag'):
+        controller.admit(2)
+    assert controller.get_metrics()['admitted'] == 1
+
+
+def test_run_returns_429_with_retry_after_when_user_exceeds_rate(client, controller):
+    workflow_id = client.post('/workflows', json={'name': 'w', 'definition': {'nodes': [], 'edges': []}}).json()['id']
+
+    assert client.post(f'/workflows/{workflow_id}/run', json={}).status_code == 200
+    assert client.post(f'/workflows/{workflow_id}/test', json={'payload': {}}).status_code == 200
+    response = client.post(f'/workflows/{workflow_id}/run', json={})
+
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert controller.get_metrics()['rejected_rate_limit'] == 1
+
+
+def test_batch_run_stops_at_capacity(client, controller, monkeypatch):
+    from app.config import Settings
+
+    workflow_id = client.post('/workflows', json={'name': 'w', 'definition': {'nodes': [], 'edges': []}}).json()['id']
+    monkeypatch.setattr(Settings, 'batch_run_chunk_size', 3)
+
+    body = client.post(f'/workflows/{workflow_id}/run/batch', json=[{'n': i} for i in range(8)]).json()
+
+    # The first chunk fits (3 of 5), the second (3 more) doesn't
+    assert (body['accepted'], body['failed'], body['truncated'], body['retry_after']) == (3, 3, True, 3)
+    assert body['results'][3]['error'] == 'Overloaded (pending_jobs)'
@@ -0,0 +1,85 @@
+import pytest
+from datetime import datetime, timedelta
+from app.models import Execution, ExecutionLog, Workflow
+from app.services.archive import ExecutionArchive
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    archive = ExecutionArchive(archive_dir=str(tmp_path), archive_after_days=30, batch_size=2)
+    monkeypatch.setattr('app.routers.workflows.execution_archive', archive)
+    return archive
+
+
+def seed(db_session, user, now):
+    workflows = [Workflow(user_id=user.id, name=f'wf{i}', definition={}) for i in range(2)]
+    db_session.add_all(workflows)
+    db_session.commit()
+    for days_old in (60, 50, 40, 5, 1):
+        for wf in workflows:
+            ex = Execution(workflow_id=wf.id, status='completed', started_at=now - timedelta(days=days_old))
+            db_session.add(ex)
+            db_session.flush()
+            db_session.add(ExecutionLog(execution_id=ex.id, node_id='start', status='completed', timestamp=ex.started_at))
+    db_session.commit()
+    return workflows
+
+
+@pytest.mark.asyncio
+async def test_archive_moves_old_executions_into_segments(db_session, user, archive):
+    now = datetime(2025, 6, 1)
+    wf, other = seed(db_session, user, now)
+
+    assert await archive.archive_once(now=now) == 6
+    assert db_session.query(Execution).count() == 4
+    assert db_session.query(ExecutionLog).count() == 4
+
+    history = archive.read_history(wf.id, limit=10)
+    assert [(now - datetime.fromisoformat(item['execution']['started_at'])).days for item in history] == [40, 50, 60]
+    assert all(item['execution']['workflow_id'] == wf.id and len(item['logs']) == 1 for item in history)
+
+    # A fresh reader rebuilds its view from the sidecar indexes alone
+    reopened = ExecutionArchive(archive_dir=archive.archive_dir)
+    assert reopened.get_metrics()['segments'] == 3
+    assert reopened.read_history(other.id, limit=1, before=(now - timedelta(days=45), 10**6))[0]['execution']['started_at'] \
+        == (now - timedelta(days=50)).isoformat()
+
+
+@pytest.mark.asyncio
+async def test_history_pages_from_database_into_archive(client, db_session, user, archive):
+    now = datetime(2025, 6, 1)
+    wf, _ = seed(db_session, user, now)
+    await archive.archive_once(now=now)
+
+    seen, cursor = [], None
+    while True:
+        params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+        page = client.get(f'/workflows/{wf.id}/history', params=params).json()
+        seen.extend((now - datetime.fromisoformat(item['execution']['started_at'])).days for item in page['items'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert seen == [1, 5, 40, 50, 60]
+
+    export = client.get(f'/workflows/{wf.id}/history/export')
+    assert len(export.text.splitlines()) == 5
+
+
+@pytest.mark.asyncio
+async def test_archiving_takes_turns_and_readers_see_other_processes_segments(db_session, user, archive):
+    now = datetime(2025, 6, 1)
+    wf, _ = seed(db_session, user, now)
+    # A reader in another process, with its indexes already loaded (empty)
+    reader = ExecutionArchive(archive_dir=archive.archive_dir)
+    assert not reader.has_workflow(wf.id)
+
+    # While one archiver holds the lock, another one moves nothing
+    other = ExecutionArchive(archive_dir=archive.archive_dir, archive_after_days=30, batch_size=2)
+    with archive._exclusive() as acquired:
+        assert acquired
+        assert await other.archive_once(now=now) == 0
+    assert db_session.query(Execution).count() == 10
+
+    assert await other.archive_once(now=now) == 6
+    assert reader.has_workflow(wf.id)
+    assert len(reader.read_history(wf.id, limit=10)) == 3
@@ -0,0 +1,55 @@
+from app.config import Settings
+from app.models import Execution
+from app.services.executor import workflow_executor
+from app.services.scheduler import job_scheduler
+
+DEFINITION = {'nodes': [{'id': 'start', 'type': 'start', 'action': 'start'}], 'edges': []}
+
+
+def create_workflow(client):
+    return client.post('/workflows', json={'name': 'campaign', 'definition': DEFINITION}).json()['id']
+
+
+def test_batch_run_from_json_array(client, db_session, monkeypatch):
+    workflow_id = create_workflow(client)
+    monkeypatch.setattr(Settings, 'batch_run_chunk_size', 2)
+    scheduled_before = len(job_scheduler.jobs)
+
+    response = client.post(f'/workflows/{workflow_id}/run/batch', json=[{'n': 1}, {'n': 2}, 'oops', {'n': 3}])
+
+    body = response.json()
+    assert response.status_code == 200
+    assert (body['accepted'], body['failed'], body['truncated']) == (3, 1, False)
+    assert [r['index'] for r in body['results']] == [0, 1, 2, 3]
+    assert body['results'][2]['error'] == 'Payload must be a JSON object'
+    execution_ids = [r['execution_id'] for r in body['results'] if 'execution_id' in r]
+    assert len(set(execution_ids)) == 3
+    assert [workflow_executor.store.get_local(e)['payload'] for e in execution_ids] == [{'n': 1}, {'n': 2}, {'n': 3}]
+    rows = {e.id: e.trigger_data for e in db_session.query(Execution).all()}
+    assert [rows[r['db_execution_id']] for r in body['results'] if 'db_execution_id' in r] == [{'n': 1}, {'n': 2}, {'n': 3}]
+    assert len(job_scheduler.jobs) - scheduled_before == 3
+
+
+def test_batch_run_from_ndjson_reports_bad_lines(client, monkeypatch):
+    workflow_id = create_workflow(client)
+    monkeypatch.setattr(Settings, 'batch_run_max_items', 3)
+    body = b'{"n": 1}\n{not json\n\n{"n": 2}\n{"n": 3}\n'
+
+    response = client.post(f'/workflows/{workflow_id}/run/batch', content=body, headers={'Content-Type': 'application/x-ndjson'})
+
+    result = response.json()
+    assert (result['accepted'], result['failed'], result['truncated']) == (2, 1, True)
+    assert result['results'][1] == {'index': 1, 'error': 'Invalid JSON'}
+
+
+def test_batch_run_rejects_non_array_and_foreign_workflows(client):
+    workflow_id = create_workflow(client)
+    assert client.post(f'/workflows/{workflow_id}/run/batch', json={'n': 1}).status_code == 400
+    assert client.post('/workflows/999/run/batch', json=[]).status_code == 404
+
+
+def test_runs_in_the_same_second_get_distinct_ids(client):
+    workflow_id = create_workflow(client)
+    first = client.post(f'/workflows/{workflow_id}/run', json={}).json()['execution_id']
+    second = client.post(f'/workflows/{workflow_id}/run', json={}).json()['execution_id']
+    assert first != second
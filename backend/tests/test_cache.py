@@ -0,0 +1,114 @@
+import asyncio
+import json
+import fakeredis
+import pytest
+from app.services.cache import AsyncRedisCache, RedisCache
+
+
+def make_cache(**kwargs):
+    return RedisCache(client=fakeredis.FakeRedis(decode_responses=True), **kwargs)
+
+
+def test_get_many_and_set_many():
+    cache = make_cache()
+    cache.set_many({'a': {'n': 1}, 'b': [2]}, ex_seconds=60)
+    assert cache.get_many(['a', 'b', 'c']) == {'a': {'n': 1}, 'b': [2]}
+    assert cache.metrics['hits'] == 2 and cache.metrics['misses'] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_cache_loads_once_and_batches():
+    cache = AsyncRedisCache(client=fakeredis.FakeAsyncRedis(decode_responses=True))
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {'value': 42}
+
+    results = await asyncio.gather(*(cache.get_or_load('hot', loader) for _ in range(8)))
+    assert results == [{'value': 42}] * 8
+    assert len(calls) == 1
+
+    await cache.set_many({'a': 1, 'b': 2})
+    assert await cache.get_many(['a', 'b', 'c']) == {'a': 1, 'b': 2}
+
+
+def make_async_cache(**kwargs):
+    return AsyncRedisCache(client=fakeredis.FakeAsyncRedis(decode_responses=True), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_worker_waits_for_lock_holder():
+    cache = make_async_cache(lock_timeout_ms=1000)
+    other_worker = AsyncRedisCache(client=cache.client)
+    # Another worker holds the lock and publishes its result shortly
+    await cache.client.set('lock:key', 'token', px=1000)
+
+    async def theirs():
+        return 'theirs'
+
+    async def ours():
+        return 'ours'
+
+    async def publish_later():
+        await asyncio.sleep(0.05)
+        await other_worker._load_locked('key', theirs, 3600, None, None)
+
+    publisher = asyncio.create_task(publish_later())
+    assert await cache.get_or_load('key', ours) == 'theirs'
+    await publisher
+    assert cache.metrics['lock_waits'] == 1 and cache.metrics['loads'] == 0
+
+
+@pytest.mark.asyncio
+async def test_negative_results_are_cached():
+    cache = make_async_cache()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return None
+
+    assert await cache.get_or_load('missing', loader, negative_ttl=30) is None
+    assert await cache.get_or_load('missing', loader, negative_ttl=30) is None
+    assert len(calls) == 1
+    assert cache.metrics['negative_hits'] == 1
+    assert 0 < await cache.client.ttl('missing') <= 30
+
+
+@pytest.mark.asyncio
+async def test_hot_key_is_refreshed_before_expiry():
+    # A huge beta makes XFetch refresh on every read
+    cache = make_async_cache(beta=1e9)
+    values = iter([1, 2])
+
+    async def loader():
+        await asyncio.sleep(0.01)
+        return next(values)
+
+    assert await cache.get_or_load('key', loader) == 1
+    assert await cache.get_or_load('key', loader) == 2
+    assert cache.metrics['early_refreshes'] == 1
+
+
+@pytest.mark.asyncio
+async def test_email_status_is_stored_and_published(monkeypatch):
+    from app.services import email as email_module
+
+    cache = AsyncRedisCache(client=fakeredis.FakeAsyncRedis(decode_responses=True))
+    monkeypatch.setattr(email_module, 'async_cache', cache)
+    monkeypatch.setattr(email_module.email_service, '_send_smtp', lambda msg: None)
+    pubsub = cache.client.pubsub()
+    await pubsub.subscribe('email_events')
+
+    result = await email_module.email_service.send_email('to@example.com', 'Hi', '<p>hi</p>')
+    assert result['success']
+    assert (await email_module.email_service.get_email_status(result['email_id']))['status'] == 'sent'
+
+    events = []
+    for _ in range(5):
+        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=0.05)
+        if message:
+            events.append(json.loads(message['data'])['type'])
+    assert events == ['email_send_attempt', 'email_sent']
@@ -0,0 +1,154 @@
+import asyncio
+from datetime import datetime
+
+import fakeredis
+import pytest
+from app.services.cache import AsyncRedisCache
+from app.services.checkpoints import INFLIGHT_KEY, JOBS_KEY, ExecutionCheckpointer, claim_key, heartbeat_key
+from app.services.execution_store import ExecutionStore, NullExecutionPersistence
+from app.services.executor import WorkflowExecutor
+from app.services.scheduler import JobScheduler
+
+DEFINITION = {
+    'nodes': [{'id': 'a'}, {'id': 'b'}, {'id': 'c'}],
+    'edges': [{'source': 'a', 'target': 'b'}, {'source': 'b', 'target': 'c'}],
+}
+
+
+@pytest.fixture
+def redis_cache():
+    return AsyncRedisCache(client=fakeredis.FakeAsyncRedis(decode_responses=True))
+
+
+def make_worker(monkeypatch, redis_cache, worker_id, ran, crash_at=None):
+    """An executor and scheduler as a freshly started process would have them"""
+    checkpointer = ExecutionCheckpointer(redis_cache, worker_id=worker_id, enabled=True, ttl=60, heartbeat_seconds=10)
+    executor = WorkflowExecutor(store=ExecutionStore(persistence=NullExecutionPersistence()), checkpoints=checkpointer)
+    scheduler = JobScheduler()
+
+    async def load_definition(workflow_id):
+        return DEFINITION
+
+    async def execute_step(step, context, user_id=None, priority=None):
+        if step['id'] == crash_at:
+            # The process dies while running this step
+            raise asyncio.CancelledError()
+        ran.append((step['id'], sorted(context['steps'])))
+        return {'status': 'completed'}
+
+    monkeypatch.setattr(executor, '_load_definition', load_definition)
+    monkeypatch.setattr(executor, 'execute_step', execute_step)
+    monkeypatch.setattr('app.services.executor.workflow_executor', executor)
+    monkeypatch.setattr('app.services.scheduler.job_scheduler', scheduler)
+    monkeypatch.setattr('app.services.scheduler.execution_checkpointer', checkpointer)
+    return checkpointer, executor, scheduler
+
+
+@pytest.mark.asyncio
+async def test_interrupted_execution_resumes_after_the_last_checkpointed_step(monkeypatch, redis_cache):
+    ran = []
+    _, executor, _ = make_worker(monkeypatch, redis_cache, 'web-1', ran, crash_at='b')
+    execution_id = executor._register(1, {'n': 1}, '7', None, DEFINITION)
+    await executor._persist_new([executor.store.get_local(execution_id)])
+    with pytest.raises(asyncio.CancelledError):
+        await executor.run_execution(execution_id)
+
+    # Restart: the same worker finds its unfinished execution and schedules it again
+    assert ran == [('a', [])]
+    ran = []
+    checkpointer, executor, scheduler = make_worker(monkeypatch, redis_cache, 'web-1', ran)
+    assert await checkpointer.recover_executions() == 1
+    assert [job['execution_id'] for job in scheduler.jobs.values()] == [execution_id]
+
+    execution = await executor.run_execution(execution_id)
+    assert execution['status'] == 'completed'
+    # a isn't run again, and b sees its result, restored from the checkpoint
+    assert ran == [('b', ['a']), ('c', ['a', 'b'])]
+    assert [step['node_id'] for step in execution['steps']] == ['a', 'b', 'c']
+    assert execution['payload'] == {'n': 1}
+    assert await redis_cache.client.hgetall(INFLIGHT_KEY) == {}
+    assert await redis_cache.client.keys('checkpoint:*') == []
+
+
+@pytest.mark.asyncio
+async def test_only_dead_workers_work_is_taken_over(monkeypatch, redis_cache):
+    other, executor, scheduler = make_worker(monkeypatch, redis_cache, 'web-2', ran=[])
+    execution_id = executor._register(1, {}, '7', None, DEFINITION)
+    await executor._persist_new([executor.store.get_local(execution_id)])
+    job_id = await scheduler.schedule_email_send({'to': 'a@example.com'}, scheduled_at=datetime.utcnow())
+    await other._heartbeat()
+
+    checkpointer, _, scheduler = make_worker(monkeypatch, redis_cache, 'web-1', ran=[])
+    assert await checkpointer.recover_executions() == 0
+    assert await checkpointer.recover_jobs() == 0
+
+    # web-2 stops sending heartbeats
+    await redis_cache.client.delete(heartbeat_key('web-2'))
+    assert await checkpointer.recover_executions() == 1
+    assert await checkpointer.recover_jobs() == 1
+    assert scheduler.jobs[job_id]['email_data'] == {'to': 'a@example.com'}
+    assert await redis_cache.client.hgetall(INFLIGHT_KEY) == {execution_id: 'web-1'}
+    assert job_id in await redis_cache.client.hgetall(JOBS_KEY)
+
+    # A second recovering worker doesn't get the same execution
+    third, _, _ = make_worker(monkeypatch, redis_cache, 'web-3', ran=[])
+    await redis_cache.client.hset(INFLIGHT_KEY, execution_id, 'web-2')
+    assert await third.recover_executions() == 0
+
+
+@pytest.mark.asyncio
+async def test_work_of_the_previous_deploy_is_taken_over_once_its_heartbeat_expires(monkeypatch, redis_cache):
+    old, executor, _ = make_worker(monkeypatch, redis_cache, 'deploy-1', ran=[])
+    execution_id = executor._register(1, {}, '7', None, DEFINITION)
+    await executor._persist_new([executor.store.get_local(execution_id)])
+    await old._heartbeat()
+
+    # The new deploy (another hostname) starts while the old heartbeat is still live
+    new, _, scheduler = make_worker(monkeypatch, redis_cache, 'deploy-2', ran=[])
+    new.recovery_interval = 0
+    await new.start()
+    try:
+        assert scheduler.jobs == {}
+
+        await redis_cache.client.delete(heartbeat_key('deploy-1'))
+        await new._tick()
+        assert [job['execution_id'] for job in scheduler.jobs.values()] == [execution_id]
+        # Its own in-flight work isn't picked up again on later passes
+        await new._tick()
+        assert len(scheduler.jobs) == 1
+    finally:
+        await new.stop()
+    assert not await redis_cache.client.exists(heartbeat_key('deploy-2'))
+
+
+@pytest.mark.asyncio
+async def test_sibling_workers_on_one_host_never_resume_each_others_live_work(monkeypatch, redis_cache):
+    monkeypatch.setattr('app.services.checkpoints.Settings.worker_id', '')
+    first = ExecutionCheckpointer(redis_cache, enabled=True, ttl=60, heartbeat_seconds=10)
+    second = ExecutionCheckpointer(redis_cache, enabled=True, ttl=60, heartbeat_seconds=10)
+    assert first.worker_id != second.worker_id
+
+    _, executor, _ = make_worker(monkeypatch, redis_cache, first.worker_id, ran=[])
+    execution_id = executor._register(1, {}, '7', None, DEFINITION)
+    await executor._persist_new([executor.store.get_local(execution_id)])
+    await first._heartbeat()
+
+    _, _, scheduler = make_worker(monkeypatch, redis_cache, second.worker_id, ran=[])
+    assert await second.recover_executions() == 0
+    assert scheduler.jobs == {}
+
+
+@pytest.mark.asyncio
+async def test_own_work_is_claimed_before_it_is_resumed(monkeypatch, redis_cache):
+    _, executor, _ = make_worker(monkeypatch, redis_cache, 'web-1', ran=[])
+    execution_id = executor._register(1, {}, '7', None, DEFINITION)
+    await executor._persist_new([executor.store.get_local(execution_id)])
+
+    # Another worker is already resuming it
+    await redis_cache.client.set(claim_key(execution_id), 'web-2')
+    checkpointer, _, scheduler = make_worker(monkeypatch, redis_cache, 'web-1', ran=[])
+    assert await checkpointer.recover_executions() == 0
+
+    # A claim left by this worker's own previous run doesn't block it
+    await redis_cache.client.set(claim_key(execution_id), 'web-1')
+    assert await checkpointer.recover_executions() == 1
@@ -0,0 +1,52 @@
+import pytest
+from app.services.executor import WorkflowExecutor
+from app.services.execution_events import ExecutionEvent, ExecutionEventStream, ExecutionEventType, execution_events
+
+DEFINITION = {
+    "nodes": [
+        {"id": "start", "action": "start", "params": {}},
+        {"id": "notify", "action": "notify", "params": {}},
+        {"id": "skipped", "action": "notify", "params": {}},
+    ],
+    "edges": [
+        {"source": "start", "target": "notify"},
+        {"source": "start", "target": "skipped", "condition": {"op": "eq", "path": "vip", "value": True}},
+    ],
+}
+
+
+@pytest.mark.asyncio
+async def test_run_execution_emits_step_events():
+    executor = WorkflowExecutor()
+    subscription = execution_events.subscribe('test', workflow_id=42)
+    try:
+        execution_id = await executor.execute_workflow(42, payload={"vip": False}, user_id='1', definition=DEFINITION)
+        execution = await executor.run_execution(execution_id)
+        events = await subscription.get_batch(timeout=1)
+    finally:
+        execution_events.unsubscribe(subscription)
+
+    assert execution['status'] == 'completed'
+    assert [(e.type, e.node_id) for e in events] == [
+        (ExecutionEventType.EXECUTION_STARTED, None),
+        (ExecutionEventType.STEP_STARTED, 'start'),
+        (ExecutionEventType.STEP_FINISHED, 'start'),
+        (ExecutionEventType.STEP_STARTED, 'notify'),
+        (ExecutionEventType.STEP_FINISHED, 'notify'),
+        (ExecutionEventType.EXECUTION_FINISHED, None),
+    ]
+    assert all(e.duration_ms is not None for e in events if e.type == ExecutionEventType.STEP_FINISHED)
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_drops_oldest_without_blocking_emit():
+    stream = ExecutionEventStream(buffer_size=2)
+    slow = stream.subscribe('slow')
+    fast = stream.subscribe('fast', maxsize=10)
+
+    for i in range(5):
+        stream.emit(ExecutionEvent(type=ExecutionEventType.STEP_STARTED, execution_id='e', workflow_id=1, node_id=str(i)))
+
+    assert [e.node_id for e in await slow.get_batch()] == ['3', '4']
+    assert slow.dropped == 3
+    assert len(await fast.get_batch()) == 5
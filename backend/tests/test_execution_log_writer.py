@@ -0,0 +1,139 @@
+from datetime import datetime
+
+import pytest
+from app.models import Execution, ExecutionLog, Workflow
+from app.services.execution_events import ExecutionEvent, ExecutionEventType, execution_events
+from app.services.checkpoints import ExecutionCheckpointer
+from app.services.execution_log import ExecutionLogWriter
+from app.services.execution_store import ExecutionStore, NullExecutionPersistence
+from app.services.executor import WorkflowExecutor
+from app.services.scheduler import JobScheduler
+
+
+@pytest.mark.asyncio
+async def test_writer_buffers_until_execution_ends(db_session, user):
+    wf = Workflow(user_id=user.id, name='wf', definition={})
+    db_session.add(wf)
+    db_session.commit()
+    execution = Execution(workflow_id=wf.id, status='pending')
+    db_session.add(execution)
+    db_session.commit()
+
+    writer = ExecutionLogWriter(batch_size=100, flush_interval=60, max_buffer=1000, end_flush_delay=0.01)
+
+    def event(event_type, node_id=None):
+        return ExecutionEvent(type=event_type, execution_id='exec', workflow_id=wf.id,
+                              db_execution_id=execution.id, node_id=node_id, action='notify', duration_ms=1.0)
+
+    writer.set_status(execution.id, 'running')
+    await writer.write_events([event(ExecutionEventType.STEP_STARTED, 'start'),
+                               event(ExecutionEventType.STEP_FINISHED, 'start')])
+    assert db_session.query(ExecutionLog).count() == 0
+    assert writer.get_metrics()['buffered_logs'] == 2
+
+    writer.set_status(execution.id, 'completed', datetime.utcnow())
+    writer.flush_soon()
+    # The end is written shortly after, together with whatever else ends meanwhile
+    assert db_session.query(ExecutionLog).count() == 0
+    await writer.pending_flush
+
+    db_session.expire_all()
+    assert db_session.query(ExecutionLog).count() == 2
+    refreshed = db_session.get(Execution, execution.id)
+    assert refreshed.status == 'completed'
+    assert refreshed.finished_at is not None
+    metrics = writer.get_metrics()
+    assert metrics['flushes'] == 1
+    assert metrics['last_batch_size'] == 2
+
+
+@pytest.mark.asyncio
+async def test_executor_records_status_without_the_event_stream(monkeypatch, db_session, user):
+    wf = Workflow(user_id=user.id, name='wf', definition={})
+    db_session.add(wf)
+    db_session.commit()
+    execution = Execution(workflow_id=wf.id, status='pending')
+    db_session.add(execution)
+    db_session.commit()
+
+    writer = ExecutionLogWriter(batch_size=100, flush_interval=60, end_flush_delay=0.01)
+    executor = WorkflowExecutor(store=ExecutionStore(persistence=NullExecutionPersistence()),
+                                checkpoints=ExecutionCheckpointer(enabled=False), log_writer=writer)
+    monkeypatch.setattr('app.services.executor.job_scheduler', JobScheduler())
+    # A sink that lags so far behind that every event is dropped
+    lagging = execution_events.subscribe('lagging', maxsize=1)
+
+    async def execute_step(step, context, user_id=None, priority=None):
+        return {'status': 'completed'}
+
+    monkeypatch.setattr(executor, 'execute_step', execute_step)
+    try:
+        execution_id = await executor.execute_workflow(wf.id, {}, str(user.id), db_execution_id=execution.id,
+                                                       definition={'nodes': [{'id': 'a'}, {'id': 'b'}]})
+        await executor.run_execution(execution_id)
+        await writer.pending_flush
+    finally:
+        execution_events.unsubscribe(lagging)
+
+    assert lagging.dropped > 0
+    db_session.expire_all()
+    refreshed = db_session.get(Execution, execution.id)
+    assert refreshed.status == 'completed'
+    assert refreshed.finished_at is not None
+
+
+def test_copy_threshold_never_exceeds_the_batch_size():
+    writer = ExecutionLogWriter(batch_size=100, flush_interval=60, copy_threshold=1000)
+    assert writer.copy_threshold == 100
+
+
+def test_buffer_is_bounded():
+    writer = ExecutionLogWriter(batch_size=10, flush_interval=60, max_buffer=3)
+    for i in range(5):
+        writer.add_log(1, str(i), 'completed', None, datetime.utcnow())
+
+    assert [row['node_id'] for row in writer.logs] == ['2', '3', '4']
+    assert writer.metrics['dropped'] == 2
+
+
+@pytest.mark.asyncio
+async def test_status_of_a_deleted_execution_does_not_block_the_writer(db_session, user):
+    wf = Workflow(user_id=user.id, name='wf', definition={})
+    db_session.add(wf)
+    db_session.commit()
+    kept, deleted = Execution(workflow_id=wf.id, status='running'), Execution(workflow_id=wf.id, status='running')
+    db_session.add_all([kept, deleted])
+    db_session.commit()
+    kept_id, deleted_id = kept.id, deleted.id
+    db_session.delete(deleted)
+    db_session.commit()
+
+    writer = ExecutionLogWriter(batch_size=100, flush_interval=60, max_buffer=1000)
+    writer.set_status(deleted_id, 'completed', datetime.utcnow())
+    writer.set_status(kept_id, 'failed', datetime.utcnow())
+    await writer.flush()
+
+    db_session.expire_all()
+    assert db_session.get(Execution, kept_id).status == 'failed'
+    metrics = writer.get_metrics()
+    assert metrics['errors'] == 0
+    assert metrics['flushes'] == 1
+    assert metrics['buffered_status_updates'] == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_that_keeps_failing_is_dropped():
+    def broken_session():
+        raise RuntimeError('database is down')
+
+    writer = ExecutionLogWriter(batch_size=100, flush_interval=60, max_buffer=1000, max_retries=2,
+                                session_factory=broken_session)
+    writer.add_log(1, 'start', 'completed', None, datetime.utcnow())
+    await writer.flush()
+    assert writer.get_metrics()['buffered_logs'] == 1
+
+    await writer.flush()
+    metrics = writer.get_metrics()
+    assert metrics['buffered_logs'] == 0
+    assert metrics['dropped_batches'] == 1
+    assert metrics['errors'] == 2
@@ -0,0 +1,101 @@
+import fakeredis
+import pytest
+from app.services.cache import AsyncRedisCache
+from app.services.checkpoints import ExecutionCheckpointer
+from app.services.execution_store import ExecutionStore, NullExecutionPersistence, RedisExecutionPersistence
+from app.services import executor as executor_module
+from app.services.executor import WorkflowExecutor
+from app.services.scheduler import JobScheduler
+
+
+def make_execution(n: int, workflow_id: int = 1, user_id: str = '7') -> dict:
+    return {
+        'id': f'exec_{workflow_id}_{n}',
+        'workflow_id': workflow_id,
+        'status': 'running',
+        'started_at': f'2024-01-01T00:00:{n:02d}',
+        'payload': {'n': n},
+        'steps': [],
+        'user_id': user_id,
+        'definition': {'nodes': [{'id': 'start'}]},
+    }
+
+
+@pytest.mark.asyncio
+async def test_finished_runs_are_bounded_by_count_and_bytes():
+    store = ExecutionStore(persistence=NullExecutionPersistence(), max_entries=2, max_bytes=10 ** 6)
+    executions = [make_execution(n) for n in range(3)]
+    for execution in executions:
+        store.add(execution)
+    assert store.active_count() == 3
+
+    for execution in executions:
+        execution['status'] = 'completed'
+        await store.finish(execution)
+
+    assert store.active_count() == 0
+    # The oldest finished run is evicted, and dropped from the indexes
+    assert store.get_local('exec_1_0') is None
+    assert 'definition' not in store.get_local('exec_1_2')
+    assert store.by_workflow[1] == {'exec_1_1', 'exec_1_2'}
+    assert [e['id'] for e in await store.list_by_user('7')] == ['exec_1_2', 'exec_1_1']
+
+    store.max_bytes = store.finished_bytes - 1
+    last = make_execution(3)
+    last['status'] = 'completed'
+    await store.finish(last)
+    assert list(store.finished) == ['exec_1_3']
+    assert store.metrics['evicted'] == 3
+
+
+@pytest.mark.asyncio
+async def test_status_and_history_are_shared_across_workers():
+    redis_cache = AsyncRedisCache(client=fakeredis.FakeAsyncRedis(decode_responses=True))
+    worker_a = ExecutionStore(persistence=RedisExecutionPersistence(redis_cache, ttl=60, index_size=2), max_entries=1)
+    worker_b = ExecutionStore(persistence=RedisExecutionPersistence(redis_cache, ttl=60, index_size=2))
+
+    first, second, other = make_execution(1), make_execution(2), make_execution(3, workflow_id=2, user_id='8')
+    for execution in (first, second, other):
+        worker_a.add(execution)
+    await worker_a.save([first, second, other])
+    assert (await worker_b.get('exec_1_1'))['status'] == 'running'
+
+    for execution in (first, second):
+        execution['status'] = 'completed'
+        await worker_a.finish(execution)
+
+    # Evicted from worker A's memory but still persisted
+    assert worker_a.get_local('exec_1_1') is None
+    assert (await worker_a.get('exec_1_1'))['status'] == 'completed'
+    assert [e['id'] for e in await worker_b.list_by_workflow(1)] == ['exec_1_2', 'exec_1_1']
+    assert [e['id'] for e in await worker_b.list_by_user('8')] == ['exec_2_3']
+    assert await worker_b.get('missing') is None
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    executor = WorkflowExecutor(store=ExecutionStore(persistence=NullExecutionPersistence()),
+                                checkpoints=ExecutionCheckpointer(enabled=False))
+    scheduler = JobScheduler()
+    monkeypatch.setattr('app.services.executor.workflow_executor', executor)
+    monkeypatch.setattr('app.services.executor.job_scheduler', scheduler)
+    return executor
+
+
+@pytest.mark.asyncio
+async def test_runs_that_error_or_are_cancelled_leave_the_active_set(monkeypatch, executor):
+    async def deleted_workflow(workflow_id):
+        return None
+
+    monkeypatch.setattr(executor, '_load_definition', deleted_workflow)
+    execution_id = await executor.execute_workflow(1, {}, '7')
+    execution = await executor.run_execution(execution_id)
+    assert execution['status'] == 'failed'
+    assert execution['error'] == 'Workflow 1 not found'
+    assert executor.store.active_count() == 0
+
+    execution_id = await executor.execute_workflow(1, {}, '7')
+    [job_id] = list(executor_module.job_scheduler.jobs)[1:]
+    assert await executor_module.job_scheduler.cancel_job(job_id)
+    assert (await executor.get_execution_status(execution_id))['status'] == 'cancelled'
+    assert executor.store.active_count() == 0
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+from app.config import Settings
+from app.models import Execution, User, Workflow
+from app.routers import events as events_router
+from app.services.admission import AdmissionController
+from app.services.event_bus import EventBus
+from app.services.triggers import trigger_dispatcher
+
+
+@pytest.fixture
+def bus(monkeypatch):
+    bus = EventBus(max_queue=3, batch_size=10)
+    monkeypatch.setattr(events_router, 'ingest_bus', bus)
+    return bus
+
+
+def queued(bus):
+    return [bus.queue.get_nowait() for _ in range(bus.queue.qsize())]
+
+
+def test_ingest_queues_events_and_returns_202(client, user, bus):
+    single = client.post('/events', json={'event': 'lead.created', 'data': {'score': 90}})
+    batch = client.post('/events', json=[{'event': 'lead.created'}, {'event': 'lead.updated', 'workflow_id': 7}])
+
+    assert single.status_code == 202
+    assert batch.status_code == 202
+    assert len(batch.json()['event_ids']) == 2
+    events = queued(bus)
+    assert [e.name for e in events] == ['lead.created', 'lead.created', 'lead.updated']
+    assert {e.owner_id for e in events} == {user.id}
+    assert events[0].payload == {'score': 90}
+    assert events[2].workflow_id == 7
+
+
+def test_ingest_rejects_invalid_oversized_and_overflowing_requests(client, bus, monkeypatch):
+    assert client.post('/events', json={'event': 'bad name!'}).status_code == 422
+
+    monkeypatch.setattr(Settings, 'ingest_max_events_per_request', 2)
+    assert client.post('/events', json=[{'event': 'a'}] * 3).status_code == 413
+
+    assert client.post('/events', json=[{'event': 'a'}, {'event': 'b'}]).status_code == 202
+    # Two more would overflow the queue of three, so none of them is accepted
+    response = client.post('/events', json=[{'event': 'c'}, {'event': 'd'}])
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert bus.queue.qsize() == 2
+
+
+def test_ingested_events_only_start_the_callers_workflows(client, user, bus, db_session):
+    other = User(email='other@example.com', password_hash='x')
+    db_session.add(other)
+    db_session.commit()
+    definition = {'triggers': [{'event': 'lead.created', 'condition': {'op': 'gt', 'path': 'score', 'value': 50}}], 'nodes': [], 'edges': []}
+    db_session.add(Workflow(user_id=other.id, name='theirs', definition=definition))
+    db_session.commit()
+    mine = client.post('/workflows', json={'name': 'mine', 'definition': definition}).json()['id']
+
+    client.post('/events', json=[{'event': 'lead.created', 'data': {'score': 90}}, {'event': 'lead.created', 'data': {'score': 10}}])
+    asyncio.run(trigger_dispatcher.dispatch(queued(bus)))
+
+    assert [(e.workflow_id, e.trigger_data) for e in db_session.query(Execution).all()] == [(mine, {'score': 90})]
+
+
+@pytest.mark.asyncio
+async def test_triggered_executions_wait_for_admission_capacity(client, bus, db_session, monkeypatch):
+    controller = AdmissionController(max_pending_jobs=1, max_inflight=5, retry_after=0.01)
+    controller.pending_jobs = 1
+    monkeypatch.setattr(controller, 'sample', lambda: None)
+    monkeypatch.setattr('app.services.triggers.admission_controller', controller)
+    monkeypatch.setattr(trigger_dispatcher, 'admission_retries', 2)
+    definition = {'triggers': [{'event': 'lead.created'}], 'nodes': [], 'edges': []}
+    client.post('/workflows', json={'name': 'w', 'definition': definition})
+    client.post('/events', json={'event': 'lead.created'})
+    events = queued(bus)
+
+    # Still full after every retry: the events are shed rather than overshooting the limit
+    assert await trigger_dispatcher.dispatch(events) == []
+    assert trigger_dispatcher.metrics['throttled'] == 2
+    assert trigger_dispatcher.metrics['shed'] == 1
+
+    # Room frees up while the dispatcher waits
+    asyncio.get_running_loop().call_later(0.005, setattr, controller, 'pending_jobs', 0)
+    assert len(await trigger_dispatcher.dispatch(events)) == 1
+    assert controller.pending_jobs == 1
+    assert db_session.query(Execution).count() == 1
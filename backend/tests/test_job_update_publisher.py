@@ -0,0 +1,79 @@
+import pytest
+from app.services import ably_service as ably_module
+from app.services.ably_service import JobUpdatePublisher
+
+
+@pytest.fixture
+def published(monkeypatch):
+    sent = []
+
+    async def fake_publish_batch(channel_name, event_name, messages):
+        sent.append((channel_name, messages))
+
+    monkeypatch.setattr(ably_module.AblyService, 'publish_batch', staticmethod(fake_publish_batch))
+    return sent
+
+
+@pytest.mark.asyncio
+async def test_updates_are_coalesced_per_job(published):
+    publisher = JobUpdatePublisher(flush_interval=0, batch_size=10, max_pending=10)
+    publisher.enqueue('job-1', {'status': 'pending', 'job_type': 'delay', 'function': print}, '1')
+    publisher.enqueue('job-1', {'status': 'running', 'job_type': 'delay', 'function': print}, '1')
+    publisher.enqueue('job-2', {'status': 'pending', 'job_type': 'delay'}, '1')
+
+    await publisher.flush()
+
+    messages = [m for _, batch in published for m in batch]
+    assert [(m['job_id'], m['status']) for m in messages] == [('job-1', 'running'), ('job-2', 'pending')]
+    assert 'function' not in messages[0]['data']
+    metrics = publisher.get_metrics()
+    assert metrics['coalesced'] == 1
+    assert metrics['queue_depth'] == 0
+
+
+@pytest.mark.asyncio
+async def test_only_changed_fields_are_sent(published):
+    publisher = JobUpdatePublisher(flush_interval=0, batch_size=10, max_pending=10)
+    publisher.enqueue('job-1', {'status': 'pending', 'job_type': 'delay', 'created_at': 'a', 'updated_at': 'a'})
+    await publisher.flush()
+    publisher.enqueue('job-1', {'status': 'running', 'job_type': 'delay', 'created_at': 'a', 'updated_at': 'b'})
+    await publisher.flush()
+
+    data = published[-1][1][0]['data']
+    assert 'created_at' not in data
+    assert data['status'] == 'running'
+    assert data['job_id'] == 'job-1'
+
+
+def test_oldest_update_is_dropped_when_full():
+    publisher = JobUpdatePublisher(flush_interval=0, batch_size=10, max_pending=2)
+    for i in range(3):
+        publisher.enqueue(f'job-{i}', {'status': 'pending'})
+
+    metrics = publisher.get_metrics()
+    assert metrics['dropped'] == 1
+    assert metrics['queue_depth'] == 2
+    assert list(publisher._pending) == ['job-1', 'job-2']
+
+
+@pytest.mark.asyncio
+async def test_updates_fan_out_to_owner_channels(monkeypatch):
+    from app.services.ably_service import AblyService
+    from app.services.local_realtime import LocalRealtime
+
+    realtime = LocalRealtime()
+    AblyService.set_client(realtime)
+    monkeypatch.setattr(ably_module.Settings, 'ably_workflow_channels', True)
+    try:
+        publisher = JobUpdatePublisher(flush_interval=0, batch_size=10, max_pending=10)
+        publisher.enqueue('job-1', {'status': 'pending', 'workflow_id': 7}, '1')
+        publisher.enqueue('job-2', {'status': 'pending'}, '2')
+        publisher.enqueue('job-3', {'status': 'pending'})
+        await publisher.flush()
+    finally:
+        AblyService.set_client(None)
+
+    assert [m.data['job_id'] for m in realtime.messages('user-1-job-updates')] == ['job-1']
+    assert [m.data['job_id'] for m in realtime.messages('user-1-workflow-7-job-updates')] == ['job-1']
+    assert [m.data['job_id'] for m in realtime.messages('user-2-job-updates')] == ['job-2']
+    assert [m.data['job_id'] for m in realtime.messages('refresh-jobs')] == ['job-3']
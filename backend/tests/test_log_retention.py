@@ -0,0 +1,27 @@
+import pytest
+from datetime import datetime, timedelta
+from app.models import Execution, ExecutionLog, Workflow
+from app.services.retention import LogRetention
+
+
+@pytest.mark.asyncio
+async def test_retention_deletes_old_logs_in_chunks(db_session, user):
+    wf = Workflow(user_id=user.id, name='wf', definition={})
+    db_session.add(wf)
+    db_session.commit()
+    execution = Execution(workflow_id=wf.id, status='completed')
+    db_session.add(execution)
+    db_session.commit()
+
+    now = datetime(2025, 6, 1)
+    for days_old in (40, 35, 31, 10, 1):
+        db_session.add(ExecutionLog(execution_id=execution.id, node_id='n', status='completed',
+                                    timestamp=now - timedelta(days=days_old)))
+    db_session.commit()
+
+    retention = LogRetention(retention_days=30, chunk_size=2, chunk_pause=0)
+    assert await retention.run_once(now=now) == 3
+
+    remaining = sorted((now - log.timestamp).days for log in db_session.query(ExecutionLog))
+    assert remaining == [1, 10]
+    assert retention.get_metrics()['deleted'] == 3
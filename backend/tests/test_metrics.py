@@ -0,0 +1,20 @@
+from fastapi.testclient import TestClient
+from app.main import app
+
+
+def test_metrics_require_authentication():
+    assert TestClient(app).get('/metrics').status_code == 401
+
+
+def test_metrics_for_signed_in_users(client):
+    r = client.get('/metrics')
+    assert r.status_code == 200
+    assert 'execution_log' in r.json()
+
+
+def test_websocket_metrics_require_authentication():
+    assert TestClient(app).get('/ws/metrics').status_code == 401
+
+
+def test_websocket_metrics_for_signed_in_users(client):
+    assert client.get('/ws/metrics').status_code == 200
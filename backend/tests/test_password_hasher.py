@@ -0,0 +1,67 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.models import User
+from app.services import password_hasher as hasher_module
+from app.services.password_hasher import HasherSaturated, PasswordHasher
+from app.utils.security import get_pwd_context
+
+
+@pytest.fixture
+def hasher(monkeypatch):
+    # Threads keep the tests fast; production uses a process pool
+    hasher = PasswordHasher(max_pending=2, rounds=4, executor=ThreadPoolExecutor(max_workers=2))
+    monkeypatch.setattr(hasher_module, 'password_hasher', hasher)
+    monkeypatch.setattr('app.routers.auth.password_hasher', hasher)
+    yield hasher
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify(hasher):
+    hashed = await hasher.hash('secret-pw')
+    assert hashed.startswith('$2b$04$')
+    assert await hasher.verify('secret-pw', hashed) == (True, None)
+    assert (await hasher.verify('wrong', hashed))[0] is False
+
+
+@pytest.mark.asyncio
+async def test_rejects_when_saturated(hasher):
+    release = threading.Event()
+    blocked = [asyncio.ensure_future(hasher._run(release.wait)) for _ in range(2)]
+    await asyncio.sleep(0.05)
+    with pytest.raises(HasherSaturated):
+        await hasher.hash('secret-pw')
+    release.set()
+    await asyncio.gather(*blocked)
+    assert hasher.get_metrics()['rejected'] == 1
+
+
+def test_login_upgrades_weak_hash(hasher, db_session):
+    weak = get_pwd_context(4).hash('secret-pw')
+    db_session.add(User(email='weak@example.com', password_hash=weak))
+    db_session.commit()
+    hasher.rounds = 5
+
+    response = TestClient(app).post('/auth/login', json={'email': 'weak@example.com', 'password': 'secret-pw'})
+
+    assert response.status_code == 200
+    db_session.expire_all()
+    stored = db_session.query(User).filter(User.email == 'weak@example.com').one().password_hash
+    assert stored.startswith('$2b$05$')
+    assert hasher.get_metrics()['rehashes'] == 1
+
+
+def test_login_returns_503_when_saturated(hasher, db_session, monkeypatch):
+    db_session.add(User(email='busy@example.com', password_hash=get_pwd_context(4).hash('secret-pw')))
+    db_session.commit()
+    monkeypatch.setattr(hasher, 'max_pending', 0)
+
+    response = TestClient(app).post('/auth/login', json={'email': 'busy@example.com', 'password': 'secret-pw'})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
@@ -0,0 +1,47 @@
+import fakeredis
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+from app.config import Settings
+from app.main import app
+from app.services.cache import AsyncRedisCache
+from app.services.invalidation import InProcessInvalidationBus
+from app.services.principal_cache import PrincipalCache, principal_cache
+from app.utils.security import create_access_token, decode_access_token
+
+
+def test_repeated_requests_authenticate_without_the_database(user):
+    token = create_access_token(subject=user.id)
+    assert decode_access_token(token)['jti']
+    loads_before = principal_cache.metrics['db_loads']
+
+    client = TestClient(app)
+    for _ in range(3):
+        assert client.get('/workflows', headers={'Authorization': f'Bearer {token}'}).status_code == 200
+    assert principal_cache.metrics['db_loads'] == loads_before + 1
+
+    forged = jwt.encode({'sub': str(user.id)}, 'wrong-secret', algorithm=Settings.jwt_algorithm)
+    assert client.get('/workflows', headers={'Authorization': f'Bearer {forged}'}).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_user_changes_invalidate_every_worker(db_session, user):
+    redis_cache = AsyncRedisCache(client=fakeredis.FakeAsyncRedis(decode_responses=True))
+    bus = InProcessInvalidationBus()
+    worker_a = PrincipalCache(redis_cache=redis_cache, bus=bus)
+    worker_b = PrincipalCache(redis_cache=redis_cache, bus=bus)
+    token = create_access_token(subject=user.id)
+    payload = decode_access_token(token)
+
+    principal = await worker_a.get_user(payload, token)
+    assert principal.id == user.id and principal.email == user.email
+    assert (await worker_b.get_user(payload, token)).id == user.id
+    assert worker_a.metrics['db_loads'] == 1 and worker_b.metrics['redis_hits'] == 1
+    assert 0 < await redis_cache.client.ttl(f"principal:{payload['jti']}") <= worker_a.ttl
+
+    db_session.delete(user)
+    db_session.commit()
+    await worker_a.invalidate_user(user.id)
+
+    assert worker_b.get_metrics()['local_entries'] == 0
+    assert await worker_b.get_user(payload, token) is None
@@ -0,0 +1,98 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from app.services.scheduler import FairQueue, JobScheduler, parse_weights
+
+
+def drain(queue, count):
+    return [queue.pop() for _ in range(count)]
+
+
+def test_small_tenant_is_not_stuck_behind_a_backlog():
+    queue = FairQueue({'interactive': 1})
+    for i in range(100):
+        queue.push('interactive', 'big', f'big-{i}')
+    for i in range(3):
+        queue.push('interactive', 'small', f'small-{i}')
+
+    served = [job_id for _, _, job_id in drain(queue, 6)]
+    assert served == ['big-0', 'small-0', 'big-1', 'small-1', 'big-2', 'small-2']
+    assert queue.size == 97
+
+
+def test_user_and_class_weights():
+    queue = FairQueue(parse_weights('interactive:4,bulk:1'), user_weights={'a': 3})
+    for i in range(10):
+        queue.push('interactive', 'a', f'a-{i}')
+        queue.push('interactive', 'b', f'b-{i}')
+        queue.push('bulk', 'c', f'c-{i}')
+
+    served = [(priority, user) for priority, user, _ in drain(queue, 10)]
+    assert served[:5] == [('interactive', 'a')] * 3 + [('interactive', 'b'), ('bulk', 'c')]
+    # Bulk gets one turn in five
+    assert sum(1 for priority, _ in served if priority == 'bulk') == 2
+
+
+def test_users_at_their_concurrency_cap_are_skipped():
+    queue = FairQueue({'interactive': 1}, user_concurrency=1)
+    queue.push('interactive', 'a', 'a-0')
+    queue.push('interactive', 'b', 'b-0')
+    queue.running['a'] = 1
+
+    assert queue.pop() == ('interactive', 'b', 'b-0')
+    assert queue.pop() is None
+    queue.running['a'] = 0
+    assert queue.pop() == ('interactive', 'a', 'a-0')
+
+
+@pytest.mark.asyncio
+async def test_scheduler_runs_jobs_fairly_within_limits():
+    scheduler = JobScheduler(max_concurrency=2, user_concurrency=1, class_weights={'interactive': 1, 'bulk': 1})
+    release = asyncio.Event()
+    started = []
+
+    async def work(name):
+        started.append(name)
+        await release.wait()
+
+    now = datetime.utcnow()
+    for name in ('a1', 'a2', 'a3'):
+        await scheduler.schedule_job('generic', now, function=work, args=[name], user_id='a', priority='bulk')
+    await scheduler.schedule_job('generic', now, function=work, args=['b1'], user_id='b')
+    later = await scheduler.schedule_job('generic', now + timedelta(hours=1), function=work, args=['late'], user_id='b')
+    assert scheduler.pending_count() == 5
+    assert await scheduler.cancel_job(later)
+
+    await scheduler.start()
+    await asyncio.sleep(0.05)
+    # One job per user at a time
+    assert sorted(started) == ['a1', 'b1']
+
+    release.set()
+    for _ in range(50):
+        if len(started) == 4 and not scheduler.running_tasks:
+            break
+        await asyncio.sleep(0.02)
+    await scheduler.stop()
+
+    assert started[2:] == ['a2', 'a3']
+    metrics = scheduler.get_metrics()
+    assert metrics['pending'] == 0
+    assert metrics['wait_by_user']['a']['jobs'] == 3
+    assert set(metrics['wait_by_class']) == {'interactive', 'bulk'}
+    assert scheduler.jobs[later]['status'] == 'cancelled'
+
+
+@pytest.mark.asyncio
+async def test_workflow_definition_selects_priority_class():
+    from app.services.executor import workflow_executor
+    from app.services.scheduler import job_scheduler
+
+    execution_id = await workflow_executor.execute_workflow(5, definition={'priority': 'bulk', 'nodes': [], 'edges': []})
+    job = next(job for job in job_scheduler.jobs.values() if job.get('execution_id') == execution_id)
+    assert job['priority'] == 'bulk'
+
+    execution_id = await workflow_executor.execute_workflow(5, definition={'priority': 'urgent!', 'nodes': [], 'edges': []})
+    job = next(job for job in job_scheduler.jobs.values() if job.get('execution_id') == execution_id)
+    assert job['priority'] == 'interactive'
@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+from app.services.search_index import TicketSearchIndex, tsquery
+
+
+def ticket(ticket_id, title, description='', status='open', assigned_to=None, user_id=1):
+    return SimpleNamespace(id=ticket_id, title=title, description=description, status=status,
+                           assigned_to=assigned_to, user_id=user_id)
+
+
+def loaded_index(*tickets):
+    index = TicketSearchIndex()
+    index.loaded = True
+    for t in tickets:
+        index.add(t)
+    return index
+
+
+def test_prefix_matching_requires_every_word():
+    index = loaded_index(
+        ticket(1, 'Printer jammed', 'paper stuck in tray'),
+        ticket(2, 'Printer offline'),
+        ticket(3, 'VPN drops', 'printing works'),
+    )
+
+    assert {i for i, _ in index.search('print')[0]} == {1, 2, 3}
+    assert [i for i, _ in index.search('print pap')[0]] == [1]
+    assert index.search('printer vpn') == ([], 0)
+
+
+def test_title_matches_rank_above_description_matches():
+    index = loaded_index(
+        ticket(1, 'Laptop slow', 'the printer in room 4 too'),
+        ticket(2, 'Printer broken', 'nothing prints'),
+    )
+
+    best, total = index.search('printer')
+    assert total == 2
+    assert [i for i, _ in best] == [2, 1]
+
+
+def test_updates_and_removals_are_reflected():
+    index = loaded_index(ticket(1, 'Printer jammed'), ticket(2, 'Printer offline', status='closed'))
+
+    index.add(ticket(1, 'Monitor flickers'))
+    index.remove(2)
+
+    assert index.search('printer') == ([], 0)
+    assert [i for i, _ in index.search('moni')[0]] == [1]
+    assert 'printer' not in index.terms
+
+
+def test_filters_apply_to_matches():
+    index = loaded_index(ticket(1, 'Printer jammed', status='open'), ticket(2, 'Printer offline', status='closed'))
+
+    best, total = index.search('printer', filters={'status': 'closed', 'assigned_to': None})
+    assert [i for i, _ in best] == [2]
+    assert total == 1
+
+
+def test_tsquery_prefixes_every_word():
+    assert tsquery("Printer, jam!") == 'printer:* & jam:*'
+    assert tsquery('  ') is None
+
+
+def test_search_endpoint_uses_index_kept_in_sync(client):
+    first = client.post('/tickets', json={'title': 'Printer jammed', 'description': 'Paper stuck'}).json()
+    client.post('/tickets', json={'title': 'VPN down', 'description': 'Cannot connect'})
+
+    # The first search builds the index from the database
+    results = client.get('/tickets/search', params={'q': 'print'}).json()
+    assert [t['id'] for t in results['items']] == [first['id']]
+    assert results['items'][0]['rank'] > 0
+
+    # Later changes are applied to the built index
+    third = client.post('/tickets', json={'title': 'Printer offline', 'description': 'No power'}).json()
+    client.put(f"/tickets/{first['id']}", json={'title': 'Scanner jammed'})
+    assert [t['id'] for t in client.get('/tickets/search', params={'q': 'printer'}).json()['items']] == [third['id']]
+
+    client.delete(f"/tickets/{third['id']}")
+    assert client.get('/tickets/search', params={'q': 'printer'}).json() == {'items': [], 'total': 0}
+    assert client.get('/tickets/search', params={'q': 'jam', 'status': 'closed'}).json()['total'] == 0
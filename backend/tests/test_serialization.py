@@ -0,0 +1,29 @@
+from datetime import datetime
+from enum import Enum
+import pytest
+from app.utils.serialization import FastJSONResponse, StdlibSerializer, create_serializer, dumps, loads
+from app.schemas import ExecutionOut
+
+
+class Color(Enum):
+    RED = 'red'
+
+
+@pytest.mark.parametrize('backend', ['auto', 'orjson', 'msgspec', 'json'])
+def test_backends_round_trip_the_same_payloads(backend):
+    serializer = create_serializer(backend)
+    payload = {'when': datetime(2025, 1, 1, 12, 30), 'color': Color.RED, 'ids': [1, 2], 'nested': {'ok': True}}
+    assert serializer.loads(serializer.dumps_bytes(payload)) == {
+        'when': '2025-01-01T12:30:00', 'color': 'red', 'ids': [1, 2], 'nested': {'ok': True}
+    }
+
+
+def test_stdlib_fallback_and_module_helpers():
+    assert StdlibSerializer().dumps_bytes({'a': 1}) == b'{"a":1}'
+    assert loads(dumps({'a': [1, None]})) == {'a': [1, None]}
+
+
+def test_fast_json_response_renders_models_and_dicts():
+    execution = ExecutionOut(id=1, workflow_id=2, status='completed', started_at=datetime(2025, 1, 1), finished_at=None)
+    assert loads(FastJSONResponse(execution).body)['started_at'] == '2025-01-01T00:00:00'
+    assert loads(FastJSONResponse([{'id': 1}]).body) == [{'id': 1}]
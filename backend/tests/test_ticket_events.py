@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+import pytest
+from app.models import Execution
+from app.services.event_bus import EventBus, event_bus
+from app.services.triggers import trigger_dispatcher
+
+
+def drain(bus):
+    events = []
+    while not bus.queue.empty():
+        events.append(bus.queue.get_nowait())
+    return events
+
+
+def workflow(client, name, *triggers):
+    definition = {'triggers': list(triggers), 'nodes': [{'id': 'start', 'type': 'start', 'action': 'start'}], 'edges': []}
+    return client.post('/workflows', json={'name': name, 'definition': definition}).json()['id']
+
+
+@pytest.mark.asyncio
+async def test_event_bus_delivers_in_batches_and_drops_when_full():
+    bus = EventBus(max_queue=2, batch_size=10)
+    received = []
+
+    async def handler(events):
+        received.append([event.name for event in events])
+
+    bus.add_handler('test', handler)
+    assert bus.publish('a', {}) is not None
+    assert bus.publish('b', {}) is not None
+    assert bus.publish('c', {}) is None
+
+    await bus.start()
+    await bus.stop()
+
+    assert received == [['a', 'b']]
+    assert bus.get_metrics()['dropped'] == 1
+    assert bus.get_metrics()['delivered'] == 2
+
+
+@pytest.mark.asyncio
+async def test_event_bus_stop_drains_and_stops_every_worker():
+    bus = EventBus(max_queue=100, batch_size=10, workers=4)
+    received = []
+
+    async def handler(events):
+        await asyncio.sleep(0.01)
+        received.extend(event.name for event in events)
+
+    bus.add_handler('test', handler)
+    await bus.start()
+    # Let every worker block on the empty queue, then give them work
+    await asyncio.sleep(0)
+    for i in range(50):
+        bus.publish(str(i), {})
+    await asyncio.sleep(0.05)
+
+    started = time.monotonic()
+    await bus.stop()
+    assert time.monotonic() - started < 1
+    assert sorted(received, key=int) == [str(i) for i in range(50)]
+    assert bus.background_tasks == []
+
+
+def test_ticket_events_start_matching_workflows(client, user, db_session):
+    drain(event_bus)
+    on_unassigned = workflow(client, 'ack', {'event': 'ticket.created', 'condition': {'op': 'eq', 'path': 'ticket_assigned', 'value': False}})
+    on_status = workflow(client, 'status', {'event': 'ticket.status_changed'})
+    workflow(client, 'other', {'event': 'lead.created'})
+
+    ticket = client.post('/tickets', json={'title': 'Printer', 'description': 'Out of toner'}).json()
+    client.put(f"/tickets/{ticket['id']}/status", json={'status': 'closed'})
+    client.put(f"/tickets/{ticket['id']}", json={'assigned_to': user.id, 'status': 'closed'})
+    # Nothing changed, so nothing is published
+    client.put(f"/tickets/{ticket['id']}", json={'title': 'Printer!'})
+
+    events = drain(event_bus)
+    assert [event.name for event in events] == ['ticket.created', 'ticket.status_changed', 'ticket.assigned']
+    assert events[0].payload['ticket_id'] == ticket['id']
+    assert events[0].payload['ticket_assigned'] is False
+    assert events[1].payload['previous_status'] == 'open'
+
+    execution_ids = asyncio.run(trigger_dispatcher.dispatch(events))
+
+    assert len(execution_ids) == 2
+    executions = db_session.query(Execution).order_by(Execution.id).all()
+    assert [e.workflow_id for e in executions] == [on_unassigned, on_status]
+    assert executions[0].trigger_data['ticket']['title'] == 'Printer'
+
+
+def test_trigger_index_follows_workflow_changes(client, user):
+    workflow_id = workflow(client, 'ack', {'event': 'ticket.created'})
+    assert [w for w, _, _ in asyncio.run(trigger_dispatcher.index.lookup('ticket.created'))] == [workflow_id]
+
+    client.put(f'/workflows/{workflow_id}', json={'name': 'ack', 'definition': {'triggers': [{'event': 'ticket.assigned'}], 'nodes': [], 'edges': []}})
+    assert asyncio.run(trigger_dispatcher.index.lookup('ticket.created')) == []
+    assert [w for w, _, _ in asyncio.run(trigger_dispatcher.index.lookup('ticket.assigned'))] == [workflow_id]
+
+    client.delete(f'/workflows/{workflow_id}')
+    assert asyncio.run(trigger_dispatcher.index.lookup('ticket.assigned')) == []
@@ -0,0 +1,67 @@
+def test_ticket_crud_uses_async_session(client, user):
+    created = client.post('/tickets', json={'title': 'Printer', 'description': 'Out of toner'})
+    assert created.status_code == 200
+    ticket = created.json()
+    assert ticket['user_id'] == user.id
+    assert ticket['status'] == 'open'
+
+    updated = client.put(f"/tickets/{ticket['id']}", json={'status': 'closed'})
+    assert updated.json()['status'] == 'closed'
+
+    assert [t['id'] for t in client.get('/tickets/filter/closed').json()['items']] == [ticket['id']]
+    assert client.get('/tickets/filter/open').json()['items'] == []
+
+    assert client.delete(f"/tickets/{ticket['id']}").status_code == 200
+    assert client.get(f"/tickets/{ticket['id']}").status_code == 404
+
+
+def test_ticket_pages_are_keyed_on_created_at_and_id(client, user, db_session):
+    from datetime import datetime
+    from app.models import Ticket
+
+    # Same timestamp for all rows, so the id breaks ties
+    created = datetime(2026, 1, 1)
+    db_session.add_all([
+        Ticket(title=f't{i}', description='d', status='open' if i % 2 else 'closed', user_id=user.id, created_at=created)
+        for i in range(5)
+    ])
+    db_session.commit()
+
+    first = client.get('/tickets', params={'limit': 2}).json()
+    assert first['total_estimate'] == 5
+    second = client.get('/tickets', params={'limit': 2, 'cursor': first['next_cursor']}).json()
+    third = client.get('/tickets', params={'limit': 2, 'cursor': second['next_cursor']}).json()
+    ids = [t['id'] for page in (first, second, third) for t in page['items']]
+    assert ids == [5, 4, 3, 2, 1]
+    assert second['total_estimate'] is None
+    assert third['next_cursor'] is None
+
+    opened = client.get('/tickets', params={'status': 'open', 'user_id': user.id}).json()
+    assert [t['id'] for t in opened['items']] == [4, 2]
+    assert opened['total_estimate'] == 2
+    assert client.get('/tickets', params={'cursor': 'nope'}).status_code == 400
+
+
+def test_ticket_export_streams_ndjson(client, user, db_session, monkeypatch):
+    import json
+    from app.models import Ticket
+    from app.routers import tickets
+
+    db_session.add_all([Ticket(title=f't{i}', description='d', user_id=user.id) for i in range(3)])
+    db_session.commit()
+    monkeypatch.setattr(tickets, 'EXPORT_BATCH_SIZE', 2)
+
+    response = client.get('/tickets/export')
+
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(row['title'] for row in rows) == ['t0', 't1', 't2']
+
+
+def test_list_users_excludes_current_user(client, user, db_session):
+    from app.models import User
+
+    db_session.add(User(email='agent@example.com', password_hash='x'))
+    db_session.commit()
+
+    assert [u['email'] for u in client.get('/users').json()] == ['agent@example.com']
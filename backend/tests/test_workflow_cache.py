@@ -0,0 +1,78 @@
+import asyncio
+import fakeredis
+import pytest
+from app.models import Workflow
+from app.services.cache import AsyncRedisCache
+from app.services.invalidation import InProcessInvalidationBus
+from app.services.workflow_cache import WorkflowCache
+
+
+def test_workflow_crud_goes_through_cache(client, user):
+    created = client.post('/workflows', json={'name': 'wf', 'definition': {'nodes': []}}).json()
+
+    fetched = client.get(f"/workflows/{created['id']}")
+    assert fetched.status_code == 200
+    assert fetched.json() == created
+    assert client.get('/workflows').json() == [created]
+
+    client.put(f"/workflows/{created['id']}", json={'name': 'renamed', 'definition': {'nodes': [{'id': 'start'}]}})
+    assert client.get(f"/workflows/{created['id']}").json()['name'] == 'renamed'
+
+    assert client.delete(f"/workflows/{created['id']}").status_code == 200
+    assert client.get(f"/workflows/{created['id']}").status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_update_on_one_worker_invalidates_the_other(db_session, user):
+    wf = Workflow(user_id=user.id, name='wf', definition={'nodes': []})
+    db_session.add(wf)
+    db_session.commit()
+
+    redis_cache = AsyncRedisCache(client=fakeredis.FakeAsyncRedis(decode_responses=True))
+    bus = InProcessInvalidationBus()
+    worker_a = WorkflowCache(redis_cache=redis_cache, bus=bus)
+    worker_b = WorkflowCache(redis_cache=redis_cache, bus=bus)
+
+    assert (await worker_a.get_owned(wf.id, user.id))['name'] == 'wf'
+    assert await worker_a.get_owned(wf.id, user.id + 1) is None
+    assert await worker_b.get(wf.id) is not None
+    assert worker_a.metrics['db_loads'] == 1 and worker_b.metrics['redis_hits'] == 1
+
+    wf.name = 'renamed'
+    db_session.commit()
+    await worker_b.put(wf)
+
+    assert (await worker_a.get(wf.id))['name'] == 'renamed'
+    assert worker_a.metrics['db_loads'] == 1
+
+    await worker_a.evict(wf.id)
+    assert worker_b.get_metrics()['local_entries'] == 0
+    assert await redis_cache.get_json(f'workflow:{wf.id}') is None
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_on_every_worker_load_once(db_session, user, monkeypatch):
+    wf = Workflow(user_id=user.id, name='wf', definition={'nodes': []})
+    db_session.add(wf)
+    db_session.commit()
+
+    redis_cache = AsyncRedisCache(client=fakeredis.FakeAsyncRedis(decode_responses=True))
+    bus = InProcessInvalidationBus()
+    workers = [WorkflowCache(redis_cache=redis_cache, bus=bus) for _ in range(3)]
+    queries = []
+    for worker in workers:
+        load_many = worker._load_many
+
+        async def slow_load_many(workflow_ids, load_many=load_many):
+            queries.append(workflow_ids)
+            await asyncio.sleep(0.05)
+            return await load_many(workflow_ids)
+
+        monkeypatch.setattr(worker, '_load_many', slow_load_many)
+
+    results = await asyncio.gather(*(worker.get(wf.id) for worker in workers for _ in range(10)))
+    assert {result['name'] for result in results} == {'wf'}
+    assert len(queries) == 1
+    assert sum(worker.metrics['db_loads'] for worker in workers) == 1
+    # Batch reads see the same entries
+    assert [data['id'] for data in await WorkflowCache(redis_cache=redis_cache, bus=bus).get_many([wf.id])] == [wf.id]
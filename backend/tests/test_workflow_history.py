@@ -0,0 +1,45 @@
+import json
+from datetime import datetime, timedelta
+from app.models import Execution, ExecutionLog, Workflow
+
+
+def seed_history(db_session, user, count=5):
+    wf = Workflow(user_id=user.id, name='wf', definition={'nodes': [], 'edges': []})
+    db_session.add(wf)
+    db_session.commit()
+    base = datetime(2025, 1, 1)
+    for i in range(count):
+        # Two executions share each timestamp so the id tie-breaker is exercised
+        ex = Execution(workflow_id=wf.id, status='completed', started_at=base + timedelta(minutes=i // 2))
+        db_session.add(ex)
+        db_session.flush()
+        db_session.add(ExecutionLog(execution_id=ex.id, node_id='start', status='completed', timestamp=base))
+    db_session.commit()
+    return wf
+
+
+def test_history_is_keyset_paginated(client, user, db_session):
+    wf = seed_history(db_session, user)
+
+    seen, cursor = [], None
+    while True:
+        params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+        page = client.get(f'/workflows/{wf.id}/history', params=params).json()
+        seen.extend(item['execution']['id'] for item in page['items'])
+        assert all(len(item['logs']) == 1 for item in page['items'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+
+    assert seen == [5, 4, 3, 2, 1]
+
+
+def test_history_without_logs_and_export(client, user, db_session):
+    wf = seed_history(db_session, user, count=3)
+
+    page = client.get(f'/workflows/{wf.id}/history', params={'include_logs': False}).json()
+    assert [item['logs'] for item in page['items']] == [[], [], []]
+
+    export = client.get(f'/workflows/{wf.id}/history/export')
+    lines = [json.loads(line) for line in export.text.splitlines()]
+    assert [line['execution']['id'] for line in lines] == [3, 2, 1]
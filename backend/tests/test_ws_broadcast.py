@@ -0,0 +1,81 @@
+import asyncio
+import json
+import pytest
+from app.routers.ws import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.sent = []
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.fail:
+            raise RuntimeError("socket closed")
+        await asyncio.sleep(self.delay)
+        self.sent.append(text)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+@pytest.mark.asyncio
+async def test_slow_and_dead_sockets_do_not_block_others():
+    manager = ConnectionManager(max_queue=2, policy='drop_oldest')
+    fast, slow, dead = FakeWebSocket(), FakeWebSocket(delay=10), FakeWebSocket(fail=True)
+    for ws in (fast, slow, dead):
+        await manager.connect(1, ws)
+
+    for i in range(5):
+        await manager.broadcast(1, {'type': 'step', 'n': i})
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.01)
+
+    assert len(fast.sent) == 5
+    assert [w.websocket for w in manager.active_connections[1]] == [fast, slow]
+    slow_metrics = next(c for c in manager.get_metrics()['connections'] if c['queue_depth'])
+    assert slow_metrics['dropped'] > 0
+    for ws in (fast, slow):
+        manager.disconnect(1, ws)
+
+
+@pytest.mark.asyncio
+async def test_disconnect_policy_evicts_slow_consumer():
+    manager = ConnectionManager(max_queue=1, policy='disconnect')
+    slow = FakeWebSocket(delay=10)
+    await manager.connect(1, slow)
+
+    for i in range(3):
+        await manager.broadcast(1, {'type': 'step', 'n': i})
+    await asyncio.sleep(0)
+
+    assert 1 not in manager.active_connections
+    assert manager.evicted == 1
+    assert slow.closed_with == 1013
+
+
+@pytest.mark.asyncio
+async def test_broadcast_reaches_sockets_on_other_workers():
+    from app.services.fanout import InProcessBroker, InProcessFanoutBus
+
+    broker = InProcessBroker()
+    worker_a = ConnectionManager(max_queue=10, policy='drop_oldest', bus=InProcessFanoutBus(broker))
+    worker_b = ConnectionManager(max_queue=10, policy='drop_oldest', bus=InProcessFanoutBus(broker))
+    dashboard = FakeWebSocket()
+    await worker_b.connect(5, dashboard)
+
+    await worker_a.broadcast(5, {'type': 'step_started', 'node_id': 'start'})
+    await worker_a.broadcast(6, {'type': 'step_started', 'node_id': 'start'})
+    await asyncio.sleep(0.01)
+
+    assert [json.loads(text) for text in dashboard.sent] == [{"type": "step_started", "node_id": "start"}]
+    assert set(broker.subscriptions) == {5}
+
+    worker_b.disconnect(5, dashboard)
+    await asyncio.sleep(0)
+    assert broker.subscriptions == {}